@@ -0,0 +1,379 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import socket
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import system_health_monitor as shm  # noqa: E402
+
+# Timed repetitions per measurement, and how much slower (relative, and in
+# milliseconds) a median may get before it counts as a regression
+BENCHMARK_RUNS = 20
+BENCHMARK_TOLERANCE = 0.25
+BENCHMARK_MIN_DELTA_MS = 0.1
+
+_StubCpuTimes = namedtuple('scputimes', 'user nice system idle iowait irq softirq steal guest guest_nice')
+_StubProcessCpu = namedtuple('pcputimes', 'user system')
+_StubProcessMemory = namedtuple('pmem', 'rss vms')
+_StubProcessIo = namedtuple('pio', 'read_count write_count read_bytes write_bytes')
+_StubDiskIo = namedtuple('sdiskio', 'read_count write_count read_bytes write_bytes read_time write_time busy_time')
+_StubNetIo = namedtuple('snetio', 'bytes_sent bytes_recv packets_sent packets_recv errin errout dropin dropout')
+
+class _StubProcess:
+    __slots__ = ('pid', 'info', '_created')
+
+    def __init__(self, pid, info, created):
+        self.pid = pid
+        self.info = info
+        self._created = created
+
+    def create_time(self):
+        return self._created
+
+class _StubPsutil:
+    """
+    A deterministic stand-in for the parts of psutil the monitor uses. Every call
+    advances the counters by fixed amounts, so rates are non-zero and repeatable.
+    """
+    Error = Exception
+    CPUS = 8
+    PARTITIONS = 6
+    DISKS = 4
+    INTERFACES = 16
+    PROCESSES = 300
+
+    def __init__(self):
+        self._ticks = 0
+
+    def _tick(self):
+        self._ticks += 1
+        return self._ticks
+
+    def cpu_times(self, percpu=False):
+        tick = self._tick()
+        times = _StubCpuTimes(30.0 * tick, 0.0, 10.0 * tick, 60.0 * tick, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+        return [times] * self.CPUS if percpu else times
+
+    def cpu_freq(self):
+        return namedtuple('scpufreq', 'current min max')(2400.0, 800.0, 3600.0)
+
+    def cpu_count(self, logical=True):
+        return self.CPUS
+
+    def virtual_memory(self):
+        return namedtuple('svmem', 'total available percent used free')(16 << 30, 10 << 30, 37.5, 6 << 30, 10 << 30)
+
+    def boot_time(self):
+        return 1700000000.0
+
+    def sensors_temperatures(self):
+        return {'coretemp': [namedtuple('shwtemp', 'label current high critical')('Package id 0', 55.0, 90.0, 100.0)]}
+
+    def sensors_battery(self):
+        return namedtuple('sbattery', 'percent secsleft power_plugged')(80, 7200, True)
+
+    def disk_partitions(self, all=False):
+        partition = namedtuple('sdiskpart', 'device mountpoint fstype opts')
+        return [partition(f"/dev/stub{index}", f"/stub/{index}", 'ext4', 'rw') for index in range(self.PARTITIONS)]
+
+    def disk_usage(self, path):
+        return namedtuple('sdiskusage', 'total used free percent')(500 << 30, 200 << 30, 300 << 30, 40.0)
+
+    def disk_io_counters(self, perdisk=False):
+        tick = self._tick()
+        return {f"stub{index}": _StubDiskIo(100 * tick, 50 * tick, 4096 * 100 * tick, 4096 * 50 * tick,
+                                             2 * tick, 3 * tick, 5 * tick) for index in range(self.DISKS)}
+
+    def net_io_counters(self, pernic=False):
+        tick = self._tick()
+        return {f"eth{index}": _StubNetIo(1500 * 80 * tick, 1500 * 120 * tick, 80 * tick, 120 * tick, 0, 0, 0, 0)
+                for index in range(self.INTERFACES)}
+
+    def net_if_addrs(self):
+        address = namedtuple('snicaddr', 'family address netmask broadcast ptp')
+        return {f"eth{index}": [address(socket.AF_INET, f"10.0.{index}.1", "255.255.255.0", None, None),
+                                address(-1, f"02:00:00:00:00:{index:02x}", None, None, None)]
+                for index in range(self.INTERFACES)}
+
+    def net_if_stats(self):
+        stats = namedtuple('snicstats', 'isup duplex speed mtu flags')
+        return {f"eth{index}": stats(True, 2, 1000, 1500, 'up') for index in range(self.INTERFACES)}
+
+    def process_iter(self, attrs=None, ad_value=None):
+        tick = self._tick()
+        for pid in range(1, self.PROCESSES + 1):
+            yield _StubProcess(pid, {
+                'name': f"process-{pid}",
+                'cpu_times': _StubProcessCpu(0.01 * pid * tick, 0.005 * pid * tick),
+                'memory_info': _StubProcessMemory(pid << 20, pid << 21),
+                'io_counters': _StubProcessIo(pid * tick, pid * tick, 4096 * pid * tick, 4096 * pid * tick),
+            }, 1700000000.0 + pid)
+
+class _StubGPUtil:
+    """
+    A stand-in for GPUtil reporting two fixed GPUs without spawning nvidia-smi.
+    """
+    GPU = namedtuple('GPU', 'id name memoryTotal memoryUsed temperature load')
+
+    @classmethod
+    def getGPUs(cls):
+        return [cls.GPU(index, f"Stub GPU {index}", 8192.0, 2048.0, 60.0, 0.35) for index in range(2)]
+
+class _StubNvml:
+    """
+    A fake pynvml module reporting two fixed GPUs, for machines without an NVIDIA driver.
+    """
+    class NVMLError(Exception):
+        pass
+
+    class NVMLError_NotSupported(NVMLError):
+        pass
+
+    NVML_TEMPERATURE_GPU = 0
+    NVML_CLOCK_GRAPHICS = 0
+    NVML_CLOCK_MEM = 2
+    Utilization = namedtuple('c_nvmlUtilization_t', 'gpu memory')
+    Memory = namedtuple('c_nvmlMemory_t', 'total free used')
+
+    def nvmlInit(self):
+        pass
+
+    def nvmlShutdown(self):
+        pass
+
+    def nvmlDeviceGetCount(self):
+        return 2
+
+    def nvmlDeviceGetHandleByIndex(self, index):
+        return index
+
+    def nvmlDeviceGetName(self, handle):
+        return f"Stub GPU {handle}"
+
+    def nvmlDeviceGetUtilizationRates(self, handle):
+        return self.Utilization(35, 10)
+
+    def nvmlDeviceGetMemoryInfo(self, handle):
+        return self.Memory(8 << 30, 6 << 30, 2 << 30)
+
+    def nvmlDeviceGetTemperature(self, handle, sensor):
+        return 60
+
+    def nvmlDeviceGetPowerUsage(self, handle):
+        return 120000
+
+    def nvmlDeviceGetClockInfo(self, handle, clock):
+        if handle == 1:
+            raise self.NVMLError_NotSupported("Not Supported")
+        return 1800 if clock == self.NVML_CLOCK_GRAPHICS else 7000
+
+class _StubWmi:
+    """
+    A stand-in for the wmi module returning fixed Windows hardware facts.
+    """
+    class WMI:
+        def __getattr__(self, name):
+            row = type(name, (), {
+                'Manufacturer': "Stub", 'Product': "Board", 'SMBIOSBIOSVersion': "1.0", 'Name': "Stub Adapter",
+                'DriverVersion': "1.0", 'ScreenWidth': 1920, 'ScreenHeight': 1080, 'SecureBoot': True,
+                'SpecVersion': "2.0",
+            })
+            return lambda *args, **kwargs: [row()]
+
+class BenchmarkStubs:
+    """
+    Replaces psutil, GPUtil, pynvml and wmi with deterministic in-process stubs while active.
+    Platform shell-outs (PowerShell on Windows) still run for real.
+    """
+    def __enter__(self):
+        self._saved = shm.psutil, dict(shm._optional_modules)
+        shm.psutil = _StubPsutil()
+        shm._optional_modules['GPUtil'] = _StubGPUtil
+        shm._optional_modules['pynvml'] = _StubNvml()
+        shm._optional_modules['wmi'] = _StubWmi
+        return self
+
+    def __exit__(self, *exc_info):
+        shm.psutil, saved_modules = self._saved
+        shm._optional_modules.clear()
+        shm._optional_modules.update(saved_modules)
+
+def _latency_stats(samples_ns):
+    """
+    Summarizes nanosecond durations as milliseconds.
+    """
+    ordered = sorted(ns / 1e6 for ns in samples_ns)
+    return {
+        'runs': len(ordered),
+        'min_ms': ordered[0],
+        'p50_ms': shm.interpolated_percentile(ordered, 50),
+        'p95_ms': shm.interpolated_percentile(ordered, 95),
+        'max_ms': ordered[-1],
+        'mean_ms': sum(ordered) / len(ordered),
+    }
+
+def run_benchmarks(runs=BENCHMARK_RUNS, stubs=True, cold_start_runs=5):
+    """
+    Measures the latency distribution of every collector, the memory allocated by a
+    daemon tick, the end-to-end run_all_checks time and the cold-start time.
+    Returns the results as a JSON-serializable dict.
+    """
+    results = {
+        'meta': {
+            'created': time.time(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'stubs': stubs,
+            'runs': runs,
+        },
+    }
+    quiet = shm.ResultPipeline([])
+
+    def monitor():
+        # No minimum intervals, so every call measures a full sample
+        instance = shm.SystemHealthMonitor(quiet, cpu_sample_interval=0, history=shm.MetricStore(runs * 4),
+                                       inventory_cache=shm.InventoryCache(), cpu_sample_window=0)
+        instance.process_tracker.min_interval = 0
+        return instance
+
+    with (BenchmarkStubs() if stubs else contextlib.nullcontext()):
+        subject = monitor()
+        results['collectors'] = {}
+        for check in subject.checks():
+            check()
+            durations = []
+            for _ in range(runs):
+                start = time.perf_counter_ns()
+                check()
+                durations.append(time.perf_counter_ns() - start)
+            results['collectors'][check.__name__] = _latency_stats(durations)
+
+        daemon = shm.MonitorDaemon(subject)
+        ticks = []
+        for _ in range(runs):
+            start = time.perf_counter_ns()
+            for name in daemon.collectors:
+                daemon.sample(name)
+            ticks.append(time.perf_counter_ns() - start)
+        results['tick'] = _latency_stats(ticks)
+        tracemalloc.start()
+        try:
+            peaks, retained = [], []
+            for _ in range(runs):
+                before = tracemalloc.get_traced_memory()[0]
+                blocks = sys.getallocatedblocks()
+                tracemalloc.reset_peak()
+                for name in daemon.collectors:
+                    daemon.sample(name)
+                peaks.append(tracemalloc.get_traced_memory()[1] - before)
+                retained.append(sys.getallocatedblocks() - blocks)
+        finally:
+            tracemalloc.stop()
+        results['tick'].update(
+            peak_kib=statistics.median(peaks) / 1024,
+            retained_blocks=statistics.median(retained),
+        )
+
+        results['run_all_checks'] = {}
+        for mode in ('sequential', 'concurrent'):
+            durations = []
+            for _ in range(max(runs // 4, 3)):
+                subject = monitor()
+                start = time.perf_counter_ns()
+                subject.run_all_checks(concurrent=mode == 'concurrent')
+                durations.append(time.perf_counter_ns() - start)
+            results['run_all_checks'][mode] = _latency_stats(durations)
+
+    if cold_start_runs:
+        results['cold_start'] = _latency_stats([ms * 1e6 for ms in shm.measure_cold_start(cold_start_runs)])
+    return results
+
+def compare_benchmarks(results, baseline, tolerance=BENCHMARK_TOLERANCE, min_delta_ms=BENCHMARK_MIN_DELTA_MS):
+    """
+    Returns a description of every median that got slower than the baseline by more
+    than `tolerance` (relative) and `min_delta_ms`.
+    """
+    regressions = []
+
+    def walk(current, previous, path):
+        for key, value in current.items():
+            if key not in previous:
+                continue
+            if isinstance(value, dict) and isinstance(previous[key], dict):
+                walk(value, previous[key], path + (key,))
+            elif key == 'p50_ms':
+                base = previous[key]
+                if value > base * (1 + tolerance) and value - base > min_delta_ms:
+                    regressions.append(f"{'/'.join(path)}: median {value:.2f} ms vs {base:.2f} ms baseline "
+                                       f"(+{(value / base - 1) * 100:.0f}%)")
+
+    for section in ('collectors', 'tick', 'run_all_checks', 'cold_start'):
+        if isinstance(results.get(section), dict) and isinstance(baseline.get(section), dict):
+            walk(results[section], baseline[section], (section,))
+    return regressions
+
+def print_benchmarks(results):
+    """
+    Prints the benchmark results as a table.
+    """
+    rows = [(f"collector {name}", stats) for name, stats in results.get('collectors', {}).items()]
+    if 'tick' in results:
+        rows.append(("daemon tick", results['tick']))
+    rows.extend((f"run_all_checks ({mode})", stats) for mode, stats in results.get('run_all_checks', {}).items())
+    if 'cold_start' in results:
+        rows.append(("cold start", results['cold_start']))
+    print(f"{'Measurement':<40}{'p50':>10}{'p95':>10}{'max':>10}")
+    for label, stats in rows:
+        print(f"{label:<40}{stats['p50_ms']:>8.2f}ms{stats['p95_ms']:>8.2f}ms{stats['max_ms']:>8.2f}ms")
+    if 'tick' in results:
+        tick = results['tick']
+        print(f"Daemon tick allocations: peak {tick['peak_kib']:.1f} KiB, "
+              f"{tick['retained_blocks']:+.0f} blocks retained")
+
+def main(argv=None):
+    """
+    Runs the benchmark suite and returns the process exit code.
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark the collectors, a daemon tick, run_all_checks and the cold start of the "
+                    "system health monitor.")
+    parser.add_argument("runs", type=int, nargs='?', default=BENCHMARK_RUNS,
+                        help=f"timed repetitions per measurement (default: {BENCHMARK_RUNS})")
+    parser.add_argument("--live", action="store_true",
+                        help="benchmark against the real psutil/GPUtil/NVML/WMI instead of deterministic stubs")
+    parser.add_argument("--output", metavar="PATH",
+                        help="save the benchmark results as a JSON baseline")
+    parser.add_argument("--baseline", metavar="PATH",
+                        help="fail when a benchmark median regressed against this JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=BENCHMARK_TOLERANCE, metavar="RATIO",
+                        help=f"allowed relative slowdown against the baseline (default: {BENCHMARK_TOLERANCE})")
+    args = parser.parse_args(argv)
+    if args.live and shm.psutil is None:
+        print("❌ psutil is not installed. Run the monitor with --install-deps first.")
+        return 1
+
+    results = run_benchmarks(args.runs, stubs=not args.live)
+    print_benchmarks(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare_benchmarks(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"{shm.Fore.RED}❌ Regression: {regression}{shm.Style.RESET_ALL}")
+        if regressions:
+            return 1
+        print(f"{shm.Fore.GREEN}✅ No regression against {args.baseline}.{shm.Style.RESET_ALL}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,107 +1,3484 @@
 import subprocess
 import sys
 import importlib
+import importlib.util
+import functools
 import platform
-import shutil
 import socket
 import logging
+import logging.handlers
+import time
+import threading
+import queue
+import json
+import argparse
+import heapq
+import signal
+import mmap
+import struct
+import http.client
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+import statistics
+import re
+from array import array
+from bisect import bisect_left, insort
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, TimeoutError as FutureTimeoutError, wait
+from dataclasses import dataclass, field, asdict
 from datetime import datetime
 import os
-import wmi
-import psutil
-import GPUtil
-from colorama import Fore, Style
+
+# psutil is the only hard dependency; a missing install is reported by main() so
+# that `--install-deps` keeps working without it
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    from colorama import Fore, Style
+except ImportError:
+    class _NoColor:
+        def __getattr__(self, name):
+            return ""
+    Fore = Style = _NoColor()
 
 # Author Information
 AUTHOR_INFO = "Created by Mohammad Darudi"
 
-# Install required libraries if they are not already present
-def install_and_import(lib_name):
+# pip packages installed by --install-deps, with the platforms that need them
+REQUIRED_LIBRARIES = {
+    'psutil': None,
+    'GPUtil': None,
+    'colorama': None,
+    'wmi': 'Windows',
+}
+
+# Maximum acceptable median cold-start time (in milliseconds) of the module import
+COLD_START_BUDGET_MS = 250
+
+def install_dependencies():
     """
-    Installs and imports a Python library if it's not already installed.
+    Installs the required libraries that are missing for this platform.
+    Returns True when everything is installed.
     """
-    try:
-        importlib.import_module(lib_name)
-    except ImportError:
+    missing = [
+        lib for lib, system in REQUIRED_LIBRARIES.items()
+        if (system is None or system == platform.system()) and importlib.util.find_spec(lib) is None
+    ]
+    if not missing:
+        print("✅ All required libraries are already installed.")
+        return True
+    for lib_name in missing:
         print(f"Installing {lib_name}...")
         try:
             subprocess.check_call([sys.executable, "-m", "pip", "install", lib_name])
         except subprocess.CalledProcessError as e:
             print(f"Error installing {lib_name}: {e}")
-            sys.exit(1)
+            return False
+    return True
+
+_optional_modules = {}
+
+def optional_module(name):
+    """
+    Imports an optional backend (GPUtil, pynvml, wmi) on first use.
+    Returns None when it is not installed or fails to import.
+    """
+    if name not in _optional_modules:
+        try:
+            _optional_modules[name] = importlib.import_module(name)
+        except Exception:
+            _optional_modules[name] = None
+    return _optional_modules[name]
+
+def require_module(name):
+    """
+    Imports an optional backend on first use, raising ImportError when it is unavailable.
+    """
+    module = optional_module(name)
+    if module is None:
+        raise ImportError(f"{name} is not installed (run with --install-deps)")
+    return module
+
+def measure_cold_start(runs=5):
+    """
+    Imports this module in fresh interpreters and returns the wall-clock times in milliseconds.
+    """
+    module_dir = os.path.dirname(os.path.abspath(__file__))
+    module_name = os.path.splitext(os.path.basename(__file__))[0]
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, "-c", f"import {module_name}"], cwd=module_dir)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+# Minimum time window (in seconds) between two CPU utilization samples
+CPU_SAMPLE_MIN_INTERVAL = 0.05
+
+# Window (in seconds) of the dedicated CPU sample a one-shot run takes before any other
+# check, while the monitor is idle, so the reported usage excludes its own startup work
+CPU_SAMPLE_WINDOW = 0.25
+
+# Default number of worker threads and per-check timeout (in seconds) for concurrent runs
+MAX_CHECK_WORKERS = 8
+CHECK_TIMEOUT = 30
+
+# Upper bounds (in seconds) of the duration histogram kept for every check, and how
+# many of its most recent durations the reported percentiles are computed from
+CHECK_DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+CHECK_DURATION_WINDOW = 300
+
+# Worker threads and per-mount timeout (in seconds) used to probe disk partitions
+PARTITION_PROBE_WORKERS = 16
+MOUNT_TIMEOUT = 2.0
+
+# Filesystem types that do not store data on a disk and are never probed
+PSEUDO_FILESYSTEMS = {
+    'autofs', 'binfmt_misc', 'bpf', 'cgroup', 'cgroup2', 'configfs', 'debugfs', 'devpts', 'devtmpfs',
+    'efivarfs', 'fusectl', 'hugetlbfs', 'mqueue', 'nsfs', 'proc', 'pstore', 'ramfs', 'rpc_pipefs',
+    'securityfs', 'squashfs', 'sysfs', 'tmpfs', 'tracefs', 'fuse.gvfsd-fuse', 'fuse.portal',
+}
+
+# Default sampling intervals (in seconds) of the daemon mode collectors
+DAEMON_INTERVALS = {
+    'cpu': 0.5,
+    'ram': 1.0,
+    'network': 1.0,
+    'gpu': 5.0,
+    'battery': 30.0,
+    'disk': 60.0,
+    'processes': 5.0,
+    'report': 60.0,
+}
+
+# In daemon mode, a series that has not been updated for this many intervals of its
+# collector (an interface or disk that went away or went idle) is dropped from the
+# history at the next report; the collector is found by the metric name prefix
+SERIES_EXPIRY_INTERVALS = 10
+METRIC_COLLECTORS = {'cpu': 'cpu', 'ram': 'ram', 'net': 'network', 'disk': 'disk', 'gpu': 'gpu',
+                     'battery': 'battery'}
+
+# Adaptive sampling (--adaptive): the collectors whose interval adapts, how far it may
+# move from its configured value (divided or multiplied by ADAPTIVE_RANGE), the
+# standard deviation (as a fraction of the alert level) that counts as fully volatile,
+# how fast the urgency of a collector decays, and the monitor's CPU budget as a
+# fraction of one core, measured over ADAPTIVE_BUDGET_WINDOW seconds
+ADAPTIVE_COLLECTORS = ('cpu', 'ram', 'disk', 'network')
+ADAPTIVE_RANGE = 4.0
+ADAPTIVE_VOLATILITY = 0.1
+ADAPTIVE_DECAY = 0.8
+ADAPTIVE_CPU_BUDGET = 0.005
+ADAPTIVE_BUDGET_WINDOW = 10.0
+
+# Number of samples kept per metric series by the in-memory history
+HISTORY_CAPACITY = 3600
+
+# Samples covered by the rolling statistics of each series, and the EWMA smoothing factor
+STATS_WINDOW = 300
+EWMA_ALPHA = 0.2
+
+# Approximate memory (in bytes) of the rolling statistics: per sample in the window
+# (two floats plus deque and sorted-list references), and per entry of the min/max
+# deques (a (sequence, value) tuple). Measured with tracemalloc on CPython 3.10-3.12.
+STATS_BYTES_PER_SAMPLE = 80
+STATS_BYTES_PER_EXTREMUM = 96
+
+# Metrics summarized in the health report once they have more than one sample
+TREND_METRICS = {
+    'cpu.usage': "CPU usage",
+    'ram.percent': "RAM usage",
+    'disk.percent': "Disk usage",
+    'disk.utilization': "Disk utilization",
+    'net.utilization': "Network utilization",
+    'gpu.load': "GPU load",
+    'gpu.temperature': "GPU temperature",
+}
+
+# Fleet mode: aggregator port, agent reporting interval (in seconds), samples kept
+# per host and metric, age (in seconds) after which a silent host is stale, number
+# of worst hosts listed, the largest accepted snapshot (in bytes) and how long (in
+# seconds) the server waits for a client that stops sending
+FLEET_PORT = 9102
+FLEET_REPORT_INTERVAL = 10
+FLEET_HISTORY_CAPACITY = 180
+FLEET_STALE_AFTER = 60
+FLEET_WORST_HOSTS = 10
+FLEET_MAX_SNAPSHOT_BYTES = 64 * 1024
+FLEET_REQUEST_TIMEOUT = 10
+
+# Binary snapshot files: magic number, format version, file name suffix, seconds
+# between two snapshots, seconds covered by one segment file and the longest delay
+# (in seconds) before written snapshots are flushed
+SNAPSHOT_MAGIC = b"SHMSNAP\0"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = ".snap"
+SNAPSHOT_INTERVAL = 1.0
+SNAPSHOT_SEGMENT_SECONDS = 3600
+SNAPSHOT_FLUSH_INTERVAL = 5.0
+
+# Retention of the raw snapshots (in seconds), and the rollup tiers kept next to them:
+# sub-directory, resolution, retention and time covered by one segment file (seconds)
+SNAPSHOT_RETENTION = 24 * 3600
+ROLLUP_TIERS = (
+    ('1m', 60, 30 * 86400, 86400),
+    ('1h', 3600, 365 * 86400, 30 * 86400),
+)
+
+# Statistics stored per rollup bucket, the metrics that are rolled up (by name
+# prefix) and how often (in seconds) expired segments are deleted
+ROLLUP_STATS = ('min', 'max', 'mean', 'p95', 'count')
+ROLLUP_METRICS = ('score', 'cpu.', 'ram.', 'disk.', 'net.', 'gpu.')
+COMPACTION_INTERVAL = 600
+
+# Subsystems of the health score with their display names and default weights: the
+# decayed penalty points of a subsystem are multiplied by its weight before they are
+# subtracted from 100. The half-life (in seconds) sets how fast penalties decay.
+SCORE_SUBSYSTEMS = {
+    'cpu': "CPU",
+    'memory': "Memory",
+    'disk': "Disk",
+    'network': "Network",
+    'gpu': "GPU",
+    'battery': "Battery",
+    'system': "System",
+}
+SCORE_WEIGHTS = {name: 1.0 for name in SCORE_SUBSYSTEMS}
+SCORE_HALF_LIFE = 120
+
+# Built-in alert rules, used unless a --rules file replaces them (see RuleEngine).
+# Levels are compared with the median of the metric over a fixed time window, so the
+# alert latency does not depend on the sampling interval of each collector. Like the
+# original checks, a GPU that is overloaded and/or too hot costs a single penalty
+DEFAULT_RULES = [
+    {'name': 'cpu-temperature', 'metric': 'cpu.temperature', 'warn': 85, 'hysteresis': 5, 'penalty': 15,
+     'window': '2m', 'message': "High CPU temperature detected ({stat:.1f}°C)."},
+    {'name': 'cpu-usage', 'metric': 'cpu.usage', 'warn': 85, 'hysteresis': 5, 'penalty': 10,
+     'window': '2m', 'message': "High CPU usage detected ({stat:.1f}%).{top_cpu}"},
+    {'name': 'ram-usage', 'metric': 'ram.percent', 'warn': 85, 'hysteresis': 5, 'penalty': 10,
+     'window': '2m', 'message': "High RAM usage detected ({stat:.1f}%).{top_memory}"},
+    {'name': 'disk-full', 'metric': 'disk.percent', 'warn': 90, 'hysteresis': 2, 'penalty': 10,
+     'window': '5m', 'message': "Drive {mountpoint} is nearly full ({stat:.1f}%)."},
+    {'name': 'disk-saturated', 'metric': 'disk.utilization', 'warn': 90, 'hysteresis': 10, 'penalty': 10,
+     'window': '5m', 'message': "Disk {device} is saturated ({stat:.1f}% busy)."},
+    {'name': 'disk-slow', 'metric': 'disk.await_ms', 'warn': 100, 'hysteresis': 20, 'penalty': 5,
+     'window': '5m', 'message': "Slow I/O on disk {device} ({stat:.1f} ms average wait)."},
+    {'name': 'battery-low', 'metric': 'battery.percent', 'below': True, 'warn': 30, 'stat': 'value',
+     'hysteresis': 5, 'when': {'battery.plugged': 0}, 'penalty': 10,
+     'message': "Low battery level and not plugged in."},
+    {'name': 'gpu-load', 'metric': 'gpu.load', 'warn': 90, 'hysteresis': 10, 'group': 'gpu', 'penalty': 10,
+     'window': '2m', 'message': "High load on GPU {gpu} ({name}, {stat:.0f}%)."},
+    {'name': 'gpu-temperature', 'metric': 'gpu.temperature', 'warn': 85, 'hysteresis': 5, 'group': 'gpu',
+     'penalty': 10,
+     'window': '2m', 'message': "High temperature on GPU {gpu} ({name}, {stat:.1f}°C)."},
+    {'name': 'net-saturated', 'metric': 'net.utilization', 'warn': 90, 'hysteresis': 10, 'penalty': 5,
+     'window': '2m', 'message': "Interface {interface} is saturated ({stat:.1f}% of link speed)."},
+    {'name': 'net-errors', 'metric': 'net.errors_per_sec', 'warn': 1, 'penalty': 5,
+     'window': '2m', 'message': "Interface {interface} reports errors ({stat:.1f}/s)."},
+]
+
+# Prefix of the metric names served by the OpenMetrics exporter, and the sampled
+# metrics that are monotonically increasing counters rather than gauges
+EXPORTER_PREFIX = "system_health"
+EXPORTER_COUNTERS = {'net.bytes_sent', 'net.bytes_recv', 'log.dropped'}
+METRICS_PORT = 9101
+
+# How long (in seconds) a persisted hardware inventory stays valid within the same boot
+INVENTORY_TTL = 24 * 3600
+
+# Limits of the asynchronous report log: queued records before dropping, rotation
+# size and age (0 disables), kept backups and the longest delay before a flush
+LOG_QUEUE_SIZE = 10000
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_ROTATE_INTERVAL = 0
+LOG_BACKUP_COUNT = 5
+LOG_FLUSH_INTERVAL = 1.0
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    A QueueHandler that never blocks the caller: when the queue is full, because the
+    writer cannot keep up with a slow disk, the record is dropped and counted.
+    """
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class BatchingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    Rotates the log by size and, optionally, by age, and flushes once per batch.
+
+    While more records are waiting in the queue the writes stay in the file buffer,
+    so a burst of records costs one flush instead of one per record; the buffer is
+    flushed at the latest every `flush_interval` seconds.
+    """
+    def __init__(self, filename, pending, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT,
+                 rotate_interval=LOG_ROTATE_INTERVAL, flush_interval=LOG_FLUSH_INTERVAL):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        self.pending = pending
+        self.rotate_interval = rotate_interval
+        self.flush_interval = flush_interval
+        self._rollover_at = time.time() + rotate_interval
+        self._last_flush = time.monotonic()
+
+    def shouldRollover(self, record):
+        if self.rotate_interval and time.time() >= self._rollover_at:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self._rollover_at = time.time() + self.rotate_interval
+
+    def flush(self):
+        now = time.monotonic()
+        if self.pending.empty() or now - self._last_flush >= self.flush_interval:
+            super().flush()
+            self._last_flush = now
+
+class DrainingQueueListener(logging.handlers.QueueListener):
+    """
+    A QueueListener whose stop() waits for room in a full queue instead of failing.
+    """
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+class AsyncLogWriter:
+    """
+    Routes the root logger through a bounded queue to a background writer thread.
+
+    Collectors only pay for a put_nowait() on the sampling thread; the QueueListener
+    thread does the file I/O and rotation.
+    """
+    def __init__(self, log_file, queue_size=LOG_QUEUE_SIZE, max_bytes=LOG_MAX_BYTES,
+                 backup_count=LOG_BACKUP_COUNT, rotate_interval=LOG_ROTATE_INTERVAL):
+        self.log_file = log_file
+        records = queue.Queue(queue_size)
+        self.file_handler = BatchingRotatingFileHandler(
+            log_file, records, max_bytes, backup_count, rotate_interval
+        )
+        self.file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        self.queue_handler = DroppingQueueHandler(records)
+        self.listener = DrainingQueueListener(records, self.file_handler)
+
+        root = logging.getLogger()
+        root.setLevel(logging.INFO)
+        root.addHandler(self.queue_handler)
+        self.listener.start()
+
+    @property
+    def dropped(self):
+        return self.queue_handler.dropped
+
+    def close(self):
+        """
+        Writes the queued records and detaches the handlers from the root logger.
+        """
+        logging.getLogger().removeHandler(self.queue_handler)
+        self.listener.stop()
+        if self.dropped:
+            self.file_handler.handle(logging.makeLogRecord({
+                'msg': f"{self.dropped} log records were dropped because the log queue was full.",
+                'levelno': logging.WARNING, 'levelname': 'WARNING',
+            }))
+        self.file_handler.close()
+
+# Number of top resource consumers listed per category, and the minimum time (in
+# seconds) between two scans of the process table
+TOP_PROCESSES = 5
+PROCESS_SCAN_MIN_INTERVAL = 1.0
+
+def configure_logging(queue_size=LOG_QUEUE_SIZE, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT,
+                      rotate_interval=LOG_ROTATE_INTERVAL):
+    """
+    Configures logging to save the report to a file through an AsyncLogWriter.
+    """
+    log_file = f"system_health_report_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.log"
+    return AsyncLogWriter(log_file, queue_size, max_bytes, backup_count, rotate_interval)
+
+def print_section(title, file=None):
+    """
+    Prints a formatted section title to the console.
+    """
+    section_title = f"\n{Fore.CYAN}{'='*10} {title.upper()} {'='*10}{Style.RESET_ALL}"
+    print(section_title, file=file)
+
+def _cpu_busy_and_total(times):
+    """
+    Returns the (busy, total) CPU time of a cpu_times() snapshot.
+    """
+    total = sum(times)
+    # On Linux guest time is already accounted for in user/nice time
+    total -= getattr(times, 'guest', 0) + getattr(times, 'guest_nice', 0)
+    idle = times.idle + getattr(times, 'iowait', 0)
+    return total - idle, total
+
+def _busy_percent(previous, current):
+    """
+    Computes the utilization percentage between two (busy, total) pairs.
+    """
+    busy_delta = current[0] - previous[0]
+    total_delta = current[1] - previous[1]
+    if total_delta <= 0:
+        return 0.0
+    return round(min(max(busy_delta / total_delta * 100, 0.0), 100.0), 1)
+
+class PsutilBackend:
+    """
+    Reads the volatile CPU, memory, network and temperature counters through psutil.
+    """
+    name = "psutil"
+
+    def __init__(self):
+        self.sensors_supported = hasattr(psutil, 'sensors_temperatures')
+
+    def cpu_times(self):
+        """
+        Returns the overall and per-core (busy, total) CPU times.
+        """
+        return (
+            _cpu_busy_and_total(psutil.cpu_times()),
+            [_cpu_busy_and_total(t) for t in psutil.cpu_times(percpu=True)],
+        )
+
+    def virtual_memory(self):
+        """
+        Returns the (total, used, percent) physical memory usage.
+        """
+        mem = psutil.virtual_memory()
+        return mem.total, mem.used, mem.percent
+
+    def net_io_counters(self):
+        """
+        Returns {interface: (bytes_sent, bytes_recv, packets_sent, packets_recv,
+        errin, errout, dropin, dropout)}.
+        """
+        return psutil.net_io_counters(pernic=True)
+
+    def cpu_temperature(self):
+        """
+        Returns the CPU temperature in °C, or None when it is not available.
+        """
+        if not self.sensors_supported:
+            return None
+        temps = psutil.sensors_temperatures()
+        if 'coretemp' in temps:
+            return temps['coretemp'][0].current
+        return None
+
+    def close(self):
+        pass
+
+class _ProcFile:
+    """
+    A procfs/sysfs file kept open and re-read with pread into a reusable buffer.
+
+    Files that must be read whole grow the buffer until their contents fit. With
+    whole=False a read is a single bounded pread that returns at most len(buffer)
+    bytes, for files of which only the leading lines are parsed.
+    """
+    __slots__ = ('path', 'fd', 'buffer', 'whole')
+
+    def __init__(self, path, size=4096, whole=True):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY)
+        self.buffer = bytearray(size)
+        self.whole = whole
+
+    def read(self):
+        """
+        Returns the current contents as a memoryview of the buffer, which is only
+        valid until the next read. For whole files the buffer doubles whenever it
+        fills up; otherwise the contents are truncated at the buffer size.
+        """
+        while True:
+            size = os.preadv(self.fd, [self.buffer], 0)
+            if size < len(self.buffer) or not self.whole:
+                return memoryview(self.buffer)[:size]
+            self.buffer = bytearray(len(self.buffer) * 2)
+
+    def grow(self):
+        """
+        Doubles the buffer, for bounded reads that turned out too small.
+        """
+        self.buffer = bytearray(len(self.buffer) * 2)
+
+    def close(self):
+        os.close(self.fd)
+
+class ProcfsBackend:
+    """
+    Linux backend reading /proc/stat, /proc/meminfo, /proc/net/dev and the thermal
+    zones directly.
+
+    The files are opened once and re-read with os.preadv into preallocated buffers,
+    and only the lines that are needed are split, which avoids psutil's per-call
+    open/close and namedtuple allocations.
+    """
+    name = "procfs"
+    sensors_supported = True
+    # /proc/stat only needs to be read up to the last "cpuN" line, so it is read with
+    # a single bounded pread of this many bytes per CPU (plus the aggregate line)
+    STAT_BYTES_PER_CPU = 192
+    THERMAL_ROOT = "/sys/class/thermal"
+    CPU_THERMAL_TYPES = (b'x86_pkg_temp', b'cpu-thermal', b'cpu_thermal', b'k10temp', b'coretemp')
+
+    def __init__(self):
+        self._stat = _ProcFile('/proc/stat', self.STAT_BYTES_PER_CPU * ((os.cpu_count() or 1) + 1),
+                               whole=False)
+        self._meminfo = _ProcFile('/proc/meminfo', 8192)
+        self._net_dev = _ProcFile('/proc/net/dev', 8192)
+        self._thermal = self._open_thermal_zone()
+
+    @staticmethod
+    def available():
+        return sys.platform.startswith('linux') and os.access('/proc/stat', os.R_OK)
+
+    def _open_thermal_zone(self):
+        zones = []
+        try:
+            names = sorted(os.listdir(self.THERMAL_ROOT))
+        except OSError:
+            return None
+        for name in names:
+            if not name.startswith('thermal_zone'):
+                continue
+            try:
+                with open(os.path.join(self.THERMAL_ROOT, name, 'type'), 'rb') as f:
+                    zone_type = f.read().strip()
+                zones.append((zone_type not in self.CPU_THERMAL_TYPES, name))
+            except OSError:
+                continue
+        if not zones:
+            return None
+        # Prefer a CPU package sensor, then the first zone
+        _, name = min(zones)
+        try:
+            return _ProcFile(os.path.join(self.THERMAL_ROOT, name, 'temp'), 32)
+        except OSError:
+            return None
+
+    def cpu_times(self):
+        while True:
+            data = self._stat.read()
+            overall = None
+            per_core = []
+            lines = data.tobytes().split(b'\n')
+            # The last line is dropped: the bounded read normally cuts it off
+            for line in lines[:-1]:
+                if not line.startswith(b'cpu'):
+                    break
+                fields = line.split(None, 9)
+                # user nice system idle iowait irq softirq steal; guest time is part of user/nice
+                user, nice, system, idle, iowait, irq, softirq, steal = map(int, fields[1:9])
+                idle_all = idle + iowait
+                total = user + nice + system + idle_all + irq + softirq + steal
+                if fields[0] == b'cpu':
+                    overall = (total - idle_all, total)
+                else:
+                    per_core.append((total - idle_all, total))
+            else:
+                # Every complete line was a cpu line: the cpu block is only cut short
+                # if the dropped fragment is (or may become) a cpu line itself
+                fragment = lines[-1][:3]
+                if len(data) == len(self._stat.buffer) and b'cpu'.startswith(fragment):
+                    self._stat.grow()
+                    continue
+            return overall, per_core
+
+    def virtual_memory(self):
+        data = self._meminfo.read().tobytes()
+        total = _meminfo_field(data, b'MemTotal:')
+        available = _meminfo_field(data, b'MemAvailable:')
+        used = total - available
+        return total, used, round(used / total * 100, 1) if total else 0.0
+
+    def net_io_counters(self):
+        counters = {}
+        lines = self._net_dev.read().tobytes().split(b'\n')
+        for line in lines[2:]:
+            name, _, values = line.partition(b':')
+            if not values:
+                continue
+            fields = values.split()
+            # Receive: bytes packets errs drop ...; transmit starts at the 9th column
+            counters[name.strip().decode()] = (
+                int(fields[8]), int(fields[0]), int(fields[9]), int(fields[1]),
+                int(fields[2]), int(fields[10]), int(fields[3]), int(fields[11]),
+            )
+        return counters
+
+    def cpu_temperature(self):
+        if self._thermal is None:
+            return None
+        try:
+            return int(self._thermal.read().tobytes()) / 1000
+        except (OSError, ValueError):
+            return None
+
+    def close(self):
+        for proc_file in (self._stat, self._meminfo, self._net_dev, self._thermal):
+            if proc_file is not None:
+                proc_file.close()
+
+def _meminfo_field(data, key):
+    """
+    Returns a /proc/meminfo value in bytes.
+    """
+    start = data.index(key) + len(key)
+    return int(data[start:data.index(b'kB', start)]) * 1024
+
+def select_backend(name="psutil"):
+    """
+    Returns the metrics backend for 'psutil', 'procfs' or 'auto' (procfs when available).
+    """
+    if name == "procfs" or (name == "auto" and ProcfsBackend.available()):
+        return ProcfsBackend()
+    return PsutilBackend()
+
+def benchmark_backends(iterations=1000):
+    """
+    Times every operation of the psutil and procfs backends.
+    Returns {operation: {backend: microseconds per call}}.
+    """
+    backends = [PsutilBackend(), ProcfsBackend()]
+    results = {}
+    try:
+        for operation in ('cpu_times', 'virtual_memory', 'net_io_counters', 'cpu_temperature'):
+            results[operation] = {}
+            for backend in backends:
+                method = getattr(backend, operation)
+                method()
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    method()
+                results[operation][backend.name] = (time.perf_counter() - start) / iterations * 1e6
+    finally:
+        for backend in backends:
+            backend.close()
+    return results
+
+class GputilGpuBackend:
+    """
+    Reads the NVIDIA GPUs through GPUtil, which runs nvidia-smi and parses its CSV
+    output on every call.
+    """
+    name = "GPUtil"
+
+    def devices(self):
+        """
+        Returns a GpuDevice for every GPU.
+        """
+        return [
+            GpuDevice(gpu.name, gpu.memoryTotal, gpu.memoryUsed, gpu.temperature, gpu.load * 100, index=gpu.id)
+            for gpu in require_module('GPUtil').getGPUs()
+        ]
+
+    def close(self):
+        pass
+
+class NvmlGpuBackend:
+    """
+    Reads the NVIDIA GPUs in-process through one long-lived NVML session (pynvml).
+
+    NVML is initialized once and the device handles and names are cached, so a
+    sample costs one pass of driver calls per device: utilization, memory,
+    temperature, power and clocks. A reading the device reports as not supported
+    is not attempted again. Any other NVML error (GPU lost, driver unloaded, ...)
+    is raised, and the next sample re-initializes the session. `nvml` replaces the
+    pynvml module, e.g. with a fake one on machines without a GPU.
+    """
+    name = "NVML"
+    READINGS = ('load', 'memory', 'temperature', 'power', 'clocks')
+
+    def __init__(self, nvml=None):
+        self.nvml = nvml or optional_module('pynvml')
+        if self.nvml is None:
+            raise ImportError("pynvml is not installed (pip install nvidia-ml-py)")
+        self._devices = None
+        self._open()
+
+    def _open(self):
+        """
+        Initializes NVML and caches the device handles and names.
+        """
+        self.nvml.nvmlInit()
+        devices = []
+        for index in range(self.nvml.nvmlDeviceGetCount()):
+            handle = self.nvml.nvmlDeviceGetHandleByIndex(index)
+            name = self.nvml.nvmlDeviceGetName(handle)
+            # Older pynvml releases return bytes
+            devices.append((handle, name.decode() if isinstance(name, bytes) else name, set()))
+        self._devices = devices
+
+    def _reset(self):
+        self._devices = None
+        try:
+            self.nvml.nvmlShutdown()
+        except self.nvml.NVMLError:
+            pass
+
+    def devices(self):
+        """
+        Returns a GpuDevice for every GPU.
+        """
+        nvml = self.nvml
+        if self._devices is None:
+            try:
+                self._open()
+            except nvml.NVMLError as e:
+                self._reset()
+                raise RuntimeError(f"NVML could not be re-initialized: {e}") from e
+        not_supported = getattr(nvml, 'NVMLError_NotSupported', ())
+        devices = []
+        for index, (handle, name, unsupported) in enumerate(self._devices):
+            device = GpuDevice(name, index=index)
+            for reading in self.READINGS:
+                if reading in unsupported:
+                    continue
+                try:
+                    getattr(self, f'_read_{reading}')(handle, device)
+                except nvml.NVMLError as e:
+                    if not isinstance(e, not_supported):
+                        self._reset()
+                        raise RuntimeError(f"NVML error on GPU {index} ({name}): {e}") from e
+                    unsupported.add(reading)
+            devices.append(device)
+        return devices
+
+    def _read_load(self, handle, device):
+        device.load = float(self.nvml.nvmlDeviceGetUtilizationRates(handle).gpu)
+
+    def _read_memory(self, handle, device):
+        memory = self.nvml.nvmlDeviceGetMemoryInfo(handle)
+        device.memory_total = memory.total / (1024**2)
+        device.memory_used = memory.used / (1024**2)
+
+    def _read_temperature(self, handle, device):
+        device.temperature = self.nvml.nvmlDeviceGetTemperature(handle, self.nvml.NVML_TEMPERATURE_GPU)
+
+    def _read_power(self, handle, device):
+        device.power = self.nvml.nvmlDeviceGetPowerUsage(handle) / 1000
+
+    def _read_clocks(self, handle, device):
+        device.clock = self.nvml.nvmlDeviceGetClockInfo(handle, self.nvml.NVML_CLOCK_GRAPHICS)
+        device.memory_clock = self.nvml.nvmlDeviceGetClockInfo(handle, self.nvml.NVML_CLOCK_MEM)
+
+    def close(self):
+        if self._devices is not None:
+            self._reset()
+
+def select_gpu_backend(name="auto"):
+    """
+    Returns the GPU backend for 'nvml', 'gputil' or 'auto' (NVML when pynvml is
+    installed and a driver answers, GPUtil otherwise).
+    """
+    if name == "gputil":
+        return GputilGpuBackend()
+    if name == "nvml":
+        return NvmlGpuBackend()
+    try:
+        return NvmlGpuBackend()
+    except Exception:
+        return GputilGpuBackend()
+
+class ProcessTracker:
+    """
+    Tracks every process between scans to find the top CPU, memory and I/O consumers.
+
+    Entries are keyed by (pid, create_time), so a reused PID starts a new entry.
+    Each scan reads a process once through psutil.process_iter() with an attribute
+    list, which batches the reads with oneshot(). CPU and I/O rates are computed
+    incrementally from the previous scan's totals, or from the process lifetime on
+    its first scan, and the top N are selected with a heap instead of a full sort.
+    """
+    ATTRS = ['name', 'cpu_times', 'memory_info', 'io_counters']
+
+    def __init__(self, min_interval=PROCESS_SCAN_MIN_INTERVAL):
+        self.min_interval = min_interval
+        self._totals = {}
+        self._last_scan = None
+        self._rows = []
+        self.process_count = 0
+        self._lock = threading.Lock()
+
+    def scan(self):
+        """
+        Refreshes the process table unless it was scanned less than min_interval ago.
+        Returns the rows as (pid, name, cpu_percent, rss, io_bytes_per_sec) tuples.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._last_scan is not None and now - self._last_scan < self.min_interval:
+                return self._rows
+            elapsed = now - self._last_scan if self._last_scan is not None else None
+            wall_clock = time.time()
+            previous = self._totals
+            totals = {}
+            rows = []
+            for process in psutil.process_iter(self.ATTRS, ad_value=None):
+                info = process.info
+                cpu = info['cpu_times']
+                memory = info['memory_info']
+                if cpu is None or memory is None:
+                    continue
+                try:
+                    key = (process.pid, process.create_time())
+                except psutil.Error:
+                    continue
+                cpu_total = cpu.user + cpu.system
+                io = info['io_counters']
+                io_total = io.read_bytes + io.write_bytes if io is not None else 0
+                totals[key] = (cpu_total, io_total)
+
+                last = previous.get(key)
+                if last is not None and elapsed:
+                    cpu_percent = (cpu_total - last[0]) / elapsed * 100
+                    io_rate = (io_total - last[1]) / elapsed
+                else:
+                    # First time this process is seen: average over its lifetime
+                    lifetime = max(wall_clock - key[1], 1e-3)
+                    cpu_percent = cpu_total / lifetime * 100
+                    io_rate = io_total / lifetime
+                rows.append((process.pid, info['name'], round(cpu_percent, 1), memory.rss, io_rate))
+
+            self._totals = totals
+            self._rows = rows
+            self.process_count = len(rows)
+            self._last_scan = now
+            return rows
+
+    def top(self, count=TOP_PROCESSES, rescan=True):
+        """
+        Returns the top consumers by CPU, RSS and I/O, leaving out the monitor's own
+        process. With rescan=False the rows of the last scan are used, and the table is
+        only scanned if it never was.
+        """
+        rows = self.scan() if rescan or self._last_scan is None else self._rows
+        pid = os.getpid()
+        rows = [row for row in rows if row[0] != pid]
+        return (
+            heapq.nlargest(count, rows, key=lambda row: row[2]),
+            heapq.nlargest(count, rows, key=lambda row: row[3]),
+            heapq.nlargest(count, rows, key=lambda row: row[4]),
+        )
+
+class DiskIoSampler:
+    """
+    Computes per-device disk throughput, IOPS, await time and utilization from the
+    deltas between successive disk_io_counters(perdisk=True) snapshots.
+
+    Like CpuSampler, the first sample waits for at most `min_interval` seconds and
+    calls within `min_interval` of the previous snapshot return the last rates. All
+    devices are processed in a single pass over the snapshot.
+
+    Only whole disks are kept: on Linux the counters also list partitions and
+    device-mapper/md volumes, whose I/O is already counted on the disks below them.
+    The device set is re-classified only when the counters list changes.
+    """
+    # Virtual devices whose I/O is already accounted for on the backing disks
+    IGNORED_PREFIXES = ('loop', 'ram', 'zram')
+    SYSFS_BLOCK = "/sys/class/block"
+    # Linux partition and volume names, for devices sysfs does not show (e.g. in containers)
+    LINUX_NOT_DISKS = re.compile(r'(?:[shv]d[a-z]+|xvd[a-z]+)\d+|(?:nvme\d+n\d+|mmcblk\d+)p\d+|dm-\d+|md\d+')
+
+    def __init__(self, min_interval=CPU_SAMPLE_MIN_INTERVAL):
+        self.min_interval = min_interval
+        self._last_stamp = None
+        self._last_counters = None
+        self._listed = ()
+        self._disks = set()
+        self.rates = None
+
+    @classmethod
+    def is_whole_disk(cls, device):
+        """
+        Tells whether a device is a disk rather than a partition or virtual volume.
+        """
+        if device.startswith(cls.IGNORED_PREFIXES):
+            return False
+        entry = os.path.join(cls.SYSFS_BLOCK, device)
+        if not os.path.exists(entry):
+            return not (sys.platform.startswith('linux') and cls.LINUX_NOT_DISKS.fullmatch(device))
+        # Partitions have a "partition" file, and only hardware-backed disks a "device" link
+        return not os.path.exists(os.path.join(entry, 'partition')) and os.path.exists(os.path.join(entry, 'device'))
+
+    def _snapshot(self):
+        counters = psutil.disk_io_counters(perdisk=True) or {}
+        if counters.keys() != self._listed:
+            self._listed = set(counters)
+            self._disks = {device for device in counters if self.is_whole_disk(device)}
+        disks = self._disks
+        return {device: counter for device, counter in counters.items() if device in disks}
+
+    def prime(self):
+        """
+        Takes the baseline snapshot without computing rates.
+        """
+        self._last_stamp = time.monotonic()
+        self._last_counters = self._snapshot()
+
+    def sample(self):
+        """
+        Returns a list of DiskIoRate, one per device, since the previous snapshot.
+        """
+        if self._last_stamp is None:
+            self.prime()
+        elapsed = time.monotonic() - self._last_stamp
+        if elapsed < self.min_interval:
+            if self.rates is not None:
+                return self.rates
+            time.sleep(self.min_interval - elapsed)
+
+        now = time.monotonic()
+        counters = self._snapshot()
+        elapsed = now - self._last_stamp
+        previous = self._last_counters
+        rates = []
+        for device, current in counters.items():
+            last = previous.get(device)
+            if last is None:
+                continue
+            reads = current.read_count - last.read_count
+            writes = current.write_count - last.write_count
+            operations = reads + writes
+            wait_ms = (current.read_time - last.read_time) + (current.write_time - last.write_time)
+            busy_ms = getattr(current, 'busy_time', None)
+            rates.append(DiskIoRate(
+                device=device,
+                read_bytes_per_sec=(current.read_bytes - last.read_bytes) / elapsed,
+                write_bytes_per_sec=(current.write_bytes - last.write_bytes) / elapsed,
+                iops=operations / elapsed,
+                await_ms=wait_ms / operations if operations else 0.0,
+                utilization=(
+                    min((busy_ms - last.busy_time) / (elapsed * 1000) * 100, 100.0)
+                    if busy_ms is not None else None
+                ),
+            ))
+        self._last_stamp = now
+        self._last_counters = counters
+        self.rates = rates
+        return rates
+
+def _counter_delta(current, previous):
+    """
+    Returns the increase of a monotonic counter, allowing for 32-bit wrap-around and
+    for counters that were reset (e.g. an interface that was re-created). A decrease
+    only counts as a wrap when the previous value was in the upper half of the 32-bit
+    range; procfs counters are 64-bit, so any other decrease is a reset.
+    """
+    if current >= previous:
+        return current - previous
+    if 2**31 < previous < 2**32:
+        return current + 2**32 - previous
+    return current
+
+class NetIoSampler:
+    """
+    Computes per-interface throughput, packet, error and drop rates and link
+    utilization from successive net_io_counters snapshots of a metrics backend.
+
+    Every interface is handled in one pass over a single counters snapshot and a
+    single net_if_stats() call, so hosts with hundreds of virtual interfaces stay
+    cheap. Like CpuSampler, calls within `min_interval` return the last rates.
+    Interfaces without traffic are marked idle from their second quiet interval
+    on, so their series get one sample of zeros and are then left alone.
+    """
+    def __init__(self, backend, min_interval=CPU_SAMPLE_MIN_INTERVAL):
+        self.backend = backend
+        self.min_interval = min_interval
+        self._last_stamp = None
+        self._quiet = set()
+        self.counters = {}
+        self.rates = None
+
+    def prime(self):
+        """
+        Takes the baseline snapshot without computing rates.
+        """
+        self._last_stamp = time.monotonic()
+        self.counters = self.backend.net_io_counters()
+
+    def sample(self):
+        """
+        Returns {interface: InterfaceRate} since the previous snapshot.
+        """
+        if self._last_stamp is None:
+            self.prime()
+        elapsed = time.monotonic() - self._last_stamp
+        if elapsed < self.min_interval:
+            if self.rates is not None:
+                return self.rates
+            time.sleep(self.min_interval - elapsed)
+
+        now = time.monotonic()
+        counters = self.backend.net_io_counters()
+        link_stats = psutil.net_if_stats()
+        elapsed = now - self._last_stamp
+        previous = self.counters
+        rates = {}
+        quiet = set()
+        for name, current in counters.items():
+            last = previous.get(name)
+            if last is None:
+                continue
+            deltas = [_counter_delta(new, old) for new, old in zip(current[:8], last[:8])]
+            sent, recv, packets_sent, packets_recv, errin, errout, dropin, dropout = deltas
+            if not any(deltas):
+                quiet.add(name)
+            stats = link_stats.get(name)
+            speed = stats.speed if stats is not None else 0
+            rate = InterfaceRate(
+                sent_bytes_per_sec=sent / elapsed,
+                recv_bytes_per_sec=recv / elapsed,
+                packets_per_sec=(packets_sent + packets_recv) / elapsed,
+                errors_per_sec=(errin + errout) / elapsed,
+                drops_per_sec=(dropin + dropout) / elapsed,
+                is_up=stats.isup if stats is not None else None,
+                speed_mbps=speed or None,
+                idle=name in quiet and name in self._quiet,
+            )
+            if speed:
+                # Full duplex: the busier direction determines the utilization
+                rate.utilization = min(max(sent, recv) * 8 / elapsed / (speed * 1e6) * 100, 100.0)
+            rates[name] = rate
+        self._last_stamp = now
+        self._quiet = quiet
+        self.counters = counters
+        self.rates = rates
+        return rates
+
+class CpuSampler:
+    """
+    Computes CPU utilization from the deltas between successive CPU time snapshots.
+
+    The first call waits for at most `min_interval` seconds to get a baseline; every
+    later call returns immediately, either with a fresh value or, when less than
+    `min_interval` seconds passed since the previous snapshot, with the last one.
+    A value taken with measure() is returned by the next call as is.
+    """
+    def __init__(self, min_interval=CPU_SAMPLE_MIN_INTERVAL, backend=None):
+        self.min_interval = min_interval
+        self.backend = backend or PsutilBackend()
+        self._last_stamp = None
+        self._last_total = None
+        self._last_per_core = None
+        self._held = False
+        self.usage = None
+        self.per_core = []
+
+    def prime(self):
+        """
+        Takes the baseline snapshot without computing utilization.
+        """
+        self._last_stamp = time.monotonic()
+        self._last_total, self._last_per_core = self.backend.cpu_times()
+
+    def measure(self, window=CPU_SAMPLE_WINDOW):
+        """
+        Samples over a fresh window of `window` seconds (at least `min_interval`) during
+        which the caller stays idle, and holds the result for the next sample() call.
+        """
+        self.prime()
+        time.sleep(window)
+        self._held = False
+        self.sample()
+        self._held = True
+        return self.usage
+
+    def sample(self):
+        """
+        Returns the overall CPU utilization percentage since the previous snapshot.
+        """
+        if self._held:
+            self._held = False
+            return self.usage
+        if self._last_stamp is None:
+            self.prime()
+        elapsed = time.monotonic() - self._last_stamp
+        if elapsed < self.min_interval:
+            if self.usage is not None:
+                return self.usage
+            time.sleep(self.min_interval - elapsed)
+
+        total, per_core = self.backend.cpu_times()
+        self.usage = _busy_percent(self._last_total, total)
+        self.per_core = [_busy_percent(old, new) for old, new in zip(self._last_per_core, per_core)]
+        self._last_stamp = time.monotonic()
+        self._last_total = total
+        self._last_per_core = per_core
+        return self.usage
+
+class DaemonThreadPool:
+    """
+    A bounded pool of daemon worker threads returning concurrent.futures.Future objects.
+
+    Unlike ThreadPoolExecutor, a worker stuck in a hung system call (a stale network
+    mount, a frozen WMI query) never keeps the interpreter from exiting.
+    """
+    def __init__(self, max_workers=MAX_CHECK_WORKERS, name="worker"):
+        self.max_workers = max_workers
+        self.name = name
+        self._tasks = queue.SimpleQueue()
+        self._threads = []
+        self._idle = threading.Semaphore(0)
+
+    def submit(self, fn, *args):
+        """
+        Schedules fn(*args) and returns a Future for its result.
+        """
+        future = Future()
+        self._tasks.put((future, fn, args))
+        if not self._idle.acquire(blocking=False) and len(self._threads) < self.max_workers:
+            self._spawn()
+        return future
+
+    def abandon_worker(self):
+        """
+        Replaces a worker that is stuck in a task the caller gave up on.
+        """
+        self.max_workers += 1
+        self._spawn()
+
+    def _spawn(self):
+        thread = threading.Thread(
+            target=self._work, name=f"{self.name}-{len(self._threads)}", daemon=True
+        )
+        self._threads.append(thread)
+        thread.start()
+
+    def _work(self):
+        while True:
+            future, fn, args = self._tasks.get()
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args))
+                except BaseException as e:
+                    future.set_exception(e)
+            del future, fn, args
+            self._idle.release()
+
+class PartitionProber:
+    """
+    Reads the usage of every real, distinct disk partition concurrently, giving each
+    mount at most `timeout` seconds once its probe has started.
+
+    Bind mounts are deduplicated by device and pseudo-filesystems are skipped by type.
+    A mount whose probe hung keeps its abandoned worker; until that worker returns,
+    the mount is reported as timed out straight away instead of being probed again.
+    """
+    def __init__(self, timeout=MOUNT_TIMEOUT, max_workers=PARTITION_PROBE_WORKERS):
+        self.timeout = timeout
+        self.pool = DaemonThreadPool(max_workers, name="mount-probe")
+        self._hung = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def partitions():
+        """
+        Returns the mounted partitions worth probing, one per underlying device.
+        """
+        seen = set()
+        selected = []
+        for partition in psutil.disk_partitions(all=True):
+            if not partition.fstype or partition.fstype in PSEUDO_FILESYSTEMS:
+                continue
+            if partition.device in seen:
+                continue
+            seen.add(partition.device)
+            selected.append(partition)
+        return selected
+
+    def probe(self):
+        """
+        Returns a PartitionUsage for every partition, in mount order.
+        """
+        entries = []
+        futures = {}
+        started = {}
+        for partition in self.partitions():
+            entry = PartitionUsage(partition.device, partition.mountpoint)
+            entries.append(entry)
+            with self._lock:
+                hung = partition.mountpoint in self._hung
+            if hung:
+                entry.timed_out = True
+                entry.error = f"a previous probe is still hung after {self.timeout:g} s"
+            else:
+                futures[self.pool.submit(self._usage, partition.mountpoint, started)] = entry
+
+        pending = set(futures)
+        while pending:
+            now = time.monotonic()
+            deadlines = [started[futures[future].mountpoint] + self.timeout
+                         for future in pending if futures[future].mountpoint in started]
+            wait_for = max(min(deadlines) - now, 0) if deadlines else self.timeout
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                self._fill(futures[future], future)
+            now = time.monotonic()
+            for future in list(pending):
+                entry = futures[future]
+                start = started.get(entry.mountpoint)
+                if start is not None and now - start >= self.timeout and not future.done():
+                    pending.discard(future)
+                    entry.timed_out = True
+                    entry.error = f"timed out after {self.timeout:g} s"
+                    with self._lock:
+                        self._hung.add(entry.mountpoint)
+                    future.add_done_callback(lambda _, mountpoint=entry.mountpoint: self._recovered(mountpoint))
+                    self.pool.abandon_worker()
+        return entries
+
+    @staticmethod
+    def _usage(mountpoint, started):
+        started[mountpoint] = time.monotonic()
+        return psutil.disk_usage(mountpoint)
+
+    @staticmethod
+    def _fill(entry, future):
+        try:
+            usage = future.result()
+            entry.total = usage.total
+            entry.used = usage.used
+            entry.free = usage.free
+            entry.percent = usage.percent
+        except PermissionError:
+            entry.access_denied = True
+        except Exception as e:
+            entry.error = str(e)
+
+    def _recovered(self, mountpoint):
+        with self._lock:
+            self._hung.discard(mountpoint)
+
+def interpolated_percentile(ordered, p):
+    """
+    Returns the p-th percentile (0-100) of a sorted sequence with linear interpolation
+    between ranks, or None when it is empty.
+    """
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * p / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+class RollingStats:
+    """
+    Incrementally maintained statistics over the last `window` samples of a series.
+
+    Every push is O(1) amortized for the mean, min/max (monotonic deques), EWMA and
+    rate of change, and O(log n) comparisons plus one contiguous memmove for the
+    sorted copy used by the percentiles; nothing rescans the window.
+    """
+    __slots__ = ('window', 'alpha', 'ewma', '_values', '_stamps', '_sorted', '_sum',
+                 '_min', '_max', '_seq')
+
+    def __init__(self, window=STATS_WINDOW, alpha=EWMA_ALPHA):
+        self.window = window
+        self.alpha = alpha
+        self.ewma = None
+        self._values = deque()
+        self._stamps = deque()
+        self._sorted = []
+        self._sum = 0.0
+        self._min = deque()
+        self._max = deque()
+        self._seq = 0
+
+    def __len__(self):
+        return len(self._values)
+
+    def push(self, timestamp, value):
+        """
+        Adds a sample, evicting the oldest one once the window is full.
+        """
+        if len(self._values) == self.window:
+            old = self._values.popleft()
+            self._stamps.popleft()
+            self._sum -= old
+            del self._sorted[bisect_left(self._sorted, old)]
+        self._values.append(value)
+        self._stamps.append(timestamp)
+        self._sum += value
+        insort(self._sorted, value)
+        self.ewma = value if self.ewma is None else self.ewma + self.alpha * (value - self.ewma)
+
+        seq = self._seq = self._seq + 1
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((seq, value))
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((seq, value))
+        expired = seq - self.window
+        if self._min[0][0] <= expired:
+            self._min.popleft()
+        if self._max[0][0] <= expired:
+            self._max.popleft()
+
+    @property
+    def mean(self):
+        return self._sum / len(self._values) if self._values else None
+
+    @property
+    def min(self):
+        return self._min[0][1] if self._min else None
+
+    @property
+    def max(self):
+        return self._max[0][1] if self._max else None
+
+    @property
+    def rate(self):
+        """
+        Change per second between the oldest and newest samples of the window.
+        """
+        if len(self._values) < 2 or self._stamps[-1] == self._stamps[0]:
+            return 0.0
+        return (self._values[-1] - self._values[0]) / (self._stamps[-1] - self._stamps[0])
+
+    def percentile(self, p):
+        """
+        Returns the p-th percentile (0-100) with linear interpolation between ranks.
+        """
+        return interpolated_percentile(self._sorted, p)
+
+    @property
+    def nbytes(self):
+        """
+        Approximate memory held by the window.
+        """
+        return (len(self._values) * STATS_BYTES_PER_SAMPLE
+                + (len(self._min) + len(self._max)) * STATS_BYTES_PER_EXTREMUM)
+
+    def summary(self):
+        """
+        Returns every statistic as a dict.
+        """
+        return {
+            'count': len(self._values),
+            'mean': self.mean,
+            'min': self.min,
+            'max': self.max,
+            'ewma': self.ewma,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'rate': self.rate,
+        }
+
+class MetricSeries:
+    """
+    A fixed-capacity ring buffer of (timestamp, value) samples.
+
+    Timestamps and values live in two preallocated array('d') buffers, so appending
+    the sample itself is O(1) and never allocates: the buffers take exactly 16 bytes
+    per slot (12 with typecode 'f' for the values). Windows are returned as
+    memoryview segments of the underlying buffers rather than copies. The optional
+    RollingStats are updated on every append and hold Python floats: about 80 bytes
+    per sample of their window, up to 176 (see MetricStore.estimate_bytes()).
+    """
+    __slots__ = ('capacity', 'timestamps', 'values', 'count', 'stats', '_next')
+
+    def __init__(self, capacity=HISTORY_CAPACITY, typecode='d', stats_window=STATS_WINDOW):
+        self.capacity = capacity
+        self.stats = RollingStats(stats_window) if stats_window else None
+        self.timestamps = array('d', bytes(8 * capacity))
+        self.values = array(typecode, bytes(array(typecode).itemsize * capacity))
+        self.count = 0
+        self._next = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, timestamp, value):
+        """
+        Stores a sample, overwriting the oldest one once the buffer is full.
+        """
+        index = self._next
+        self.timestamps[index] = timestamp
+        self.values[index] = value
+        if self.stats is not None:
+            self.stats.push(timestamp, value)
+        self._next = index + 1 if index + 1 < self.capacity else 0
+        if self.count < self.capacity:
+            self.count += 1
+
+    def latest(self):
+        """
+        Returns the most recent (timestamp, value) sample, or None when empty.
+        """
+        if not self.count:
+            return None
+        index = self._next - 1
+        return self.timestamps[index], self.values[index]
+
+    def window(self, size=None):
+        """
+        Returns the last `size` values (all by default), oldest first, as a tuple of
+        one or two zero-copy memoryview segments.
+        """
+        return self._segments(self.values, size)
+
+    def timestamp_window(self, size=None):
+        """
+        Returns the timestamps matching window(size).
+        """
+        return self._segments(self.timestamps, size)
+
+    def count_since(self, timestamp):
+        """
+        Returns how many of the stored samples were taken at or after timestamp.
+        """
+        low, high = 0, self.count
+        oldest = self._next - self.count
+        # Binary search over the logical (oldest-first) order of the ring
+        while low < high:
+            middle = (low + high) // 2
+            if self.timestamps[(oldest + middle) % self.capacity] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return self.count - low
+
+    @property
+    def nbytes(self):
+        """
+        Memory of the buffers plus the approximate size of the rolling statistics.
+        """
+        return (len(self.timestamps) * self.timestamps.itemsize
+                + len(self.values) * self.values.itemsize
+                + (self.stats.nbytes if self.stats is not None else 0))
+
+    def _segments(self, buffer, size):
+        size = self.count if size is None else min(size, self.count)
+        start = (self._next - size) % self.capacity
+        view = memoryview(buffer)
+        if start + size <= self.capacity:
+            return (view[start:start + size],)
+        return (view[start:], view[:self._next])
+
+class MetricStore:
+    """
+    Keeps a MetricSeries per metric name and label set.
+
+    Series are created on their first sample and dropped by evict(); memory is
+    predictable from the number of series (see estimate_bytes()). `generation`
+    changes whenever the set of series does.
+    """
+    def __init__(self, capacity=HISTORY_CAPACITY, typecode='d', stats_window=STATS_WINDOW):
+        self.capacity = capacity
+        self.typecode = typecode
+        self.stats_window = stats_window
+        self.series = {}
+        self.generation = 0
+
+    def append(self, name, value, timestamp=None, labels=()):
+        """
+        Stores one sample of a metric, creating its series if needed.
+        """
+        key = (name, labels)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = MetricSeries(self.capacity, self.typecode, self.stats_window)
+            self.generation += 1
+        series.append(time.time() if timestamp is None else timestamp, value)
+        return series
+
+    def get(self, name, labels=()):
+        """
+        Returns the series of a metric, or None if it was never sampled.
+        """
+        return self.series.get((name, labels))
+
+    def stats(self, name, labels=()):
+        """
+        Returns the rolling statistics of a metric, or None if it was never sampled.
+        """
+        series = self.series.get((name, labels))
+        return series.stats if series is not None else None
+
+    def series_names(self):
+        """
+        Returns the names of the sampled metrics.
+        """
+        return {name for name, _ in self.series}
+
+    def find(self, name):
+        """
+        Yields the (labels, series) pairs of every series of a metric.
+        """
+        for (series_name, labels), series in self.series.items():
+            if series_name == name:
+                yield labels, series
+
+    def evict(self, cutoffs):
+        """
+        Drops the series whose latest sample is older than the cutoff timestamp of
+        their metric, given as {metric name: cutoff}; returns the dropped (name, labels)
+        keys.
+        """
+        stale = []
+        for key, series in self.series.items():
+            cutoff = cutoffs.get(key[0])
+            if cutoff is not None:
+                latest = series.latest()
+                if latest is None or latest[0] < cutoff:
+                    stale.append(key)
+        for key in stale:
+            del self.series[key]
+        if stale:
+            self.generation += 1
+        return stale
+
+    def ingest(self, record, timestamp=None):
+        """
+        Stores every metric reported by a check result.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        for name, labels, value in record.metrics():
+            if value is not None:
+                self.append(name, float(value), timestamp, labels)
+
+    def memory_bytes(self):
+        return sum(series.nbytes for series in self.series.values())
+
+    @staticmethod
+    def estimate_bytes(capacity, series_count, typecode='d', stats_window=STATS_WINDOW):
+        """
+        Returns the memory needed for series_count series of the given capacity,
+        including full rolling statistics windows. The statistics are counted at their
+        upper bound, with one min/max deque holding the whole window (a steadily
+        rising or falling metric).
+        """
+        stats = stats_window * (STATS_BYTES_PER_SAMPLE + STATS_BYTES_PER_EXTREMUM) if stats_window else 0
+        return series_count * (capacity * (8 + array(typecode).itemsize) + stats)
+
+# Segment header: magic, version, flags, column count and schema length in bytes
+_SNAPSHOT_HEADER = struct.Struct('<8sHHII')
+# Header flag set when the records were written by a big-endian host
+_SNAPSHOT_BIG_ENDIAN = 0x1
+
+class SnapshotWriter:
+    """
+    Streams complete health snapshots into versioned binary segment files.
+
+    A segment starts with a fixed-width header and a JSON schema naming its columns,
+    followed by fixed-size records: the timestamp and one float64 per column, with
+    NaN for a value that is missing. A new segment is started when the columns
+    change or after `segment_seconds`, so every file has a single record layout.
+    Segments are named after their first timestamp; a writer never appends to an
+    existing file, and a name that is taken (e.g. by an earlier run that wrote the
+    same rollup bucket) gets a "-N" sequence suffix instead.
+    """
+    def __init__(self, directory, segment_seconds=SNAPSHOT_SEGMENT_SECONDS,
+                 flush_interval=SNAPSHOT_FLUSH_INTERVAL):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_seconds = segment_seconds
+        self.flush_interval = flush_interval
+        self.columns = None
+        self.path = None
+        self._file = None
+        self._segment_end = 0.0
+        self._flushed = 0.0
+
+    def append(self, timestamp, columns, values):
+        """
+        Writes one snapshot; columns is a tuple of (name, labels) keys matching values.
+        """
+        if columns != self.columns or timestamp >= self._segment_end:
+            self._open_segment(timestamp, columns)
+        record = array('d', (timestamp,))
+        record.extend(float('nan') if value is None else value for value in values)
+        self._file.write(record)
+        now = time.monotonic()
+        if now - self._flushed >= self.flush_interval:
+            self._file.flush()
+            self._flushed = now
+
+    def _open_segment(self, timestamp, columns):
+        self.close()
+        stamp = datetime.fromtimestamp(timestamp).strftime('%Y%m%dT%H%M%S%f')
+        schema = json.dumps({
+            'host': socket.gethostname(),
+            'created': timestamp,
+            'columns': [[name, [list(pair) for pair in labels]] for name, labels in columns],
+        }).encode('utf-8')
+        flags = _SNAPSHOT_BIG_ENDIAN if sys.byteorder == 'big' else 0
+        header = _SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, flags, len(columns), len(schema))
+        # Records start on an 8-byte boundary so they can be cast to float64 in place
+        padding = -(len(header) + len(schema)) % 8
+        sequence = 0
+        while True:
+            name = f"{stamp}-{sequence}" if sequence else stamp
+            self.path = os.path.join(self.directory, name + SNAPSHOT_SUFFIX)
+            try:
+                self._file = open(self.path, 'xb')
+                break
+            except FileExistsError:
+                sequence += 1
+        self._file.write(header + schema + bytes(padding))
+        self.columns = tuple(columns)
+        self._segment_end = timestamp + self.segment_seconds
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self.columns = None
+
+class SnapshotSegment:
+    """
+    A read-only, memory-mapped view of one snapshot segment file.
+
+    Columns are exposed as strided memoryview slices of the mapping, so scanning a
+    column neither copies the file nor creates a Python object per record until a
+    value is read. A record cut short by a crash is ignored.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, flags, column_count, schema_length = _SNAPSHOT_HEADER.unpack_from(self._mmap)
+        except struct.error:
+            self._mmap.close()
+            raise ValueError(f"{path} is too short to be a snapshot segment")
+        if magic != SNAPSHOT_MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a snapshot segment")
+        if version > SNAPSHOT_VERSION:
+            self._mmap.close()
+            raise ValueError(f"{path} uses snapshot format version {version}, newer than {SNAPSHOT_VERSION}")
+        if bool(flags & _SNAPSHOT_BIG_ENDIAN) != (sys.byteorder == 'big'):
+            self._mmap.close()
+            raise ValueError(f"{path} was written with a different byte order")
+
+        offset = _SNAPSHOT_HEADER.size
+        schema = json.loads(self._mmap[offset:offset + schema_length])
+        self.host = schema.get('host')
+        self.created = schema['created']
+        self.columns = [(name, tuple(tuple(pair) for pair in labels)) for name, labels in schema['columns']]
+        self._index = {key: position for position, key in enumerate(self.columns)}
+        self.stride = column_count + 1
+        offset += schema_length
+        offset += -offset % 8
+        record_size = 8 * self.stride
+        self.count = max(len(self._mmap) - offset, 0) // record_size
+        self._data = memoryview(self._mmap)[offset:offset + self.count * record_size].cast('d')
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def timestamps(self):
+        return self._data[0::self.stride]
+
+    def column(self, name, labels=()):
+        """
+        Returns the values of a column as a strided memoryview, or None if the segment
+        does not have it.
+        """
+        position = self._index.get((name, labels))
+        if position is None:
+            return None
+        return self._data[position + 1::self.stride]
+
+    def find(self, name):
+        """
+        Yields the (labels, values) pairs of every column of a metric.
+        """
+        for (column_name, labels), position in self._index.items():
+            if column_name == name:
+                yield labels, self._data[position + 1::self.stride]
+
+    def bisect(self, timestamp):
+        """
+        Returns the index of the first record taken at or after timestamp.
+        """
+        return bisect_left(self.timestamps, timestamp)
+
+    def record(self, index):
+        """
+        Returns (timestamp, {(name, labels): value}) for one record.
+        """
+        start = index * self.stride
+        row = self._data[start:start + self.stride]
+        return row[0], dict(zip(self.columns, row[1:].tolist()))
+
+    def close(self):
+        self._data.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # A caller still holds a column view; the mapping is released with it
+            pass
+
+class SnapshotStore:
+    """
+    A directory of snapshot segment files, ordered by the time they were started.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+
+    def paths(self):
+        """
+        Returns the (start timestamp, path) of every segment, oldest first.
+        """
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        segments = []
+        for name in names:
+            if name.endswith(SNAPSHOT_SUFFIX):
+                stamp, _, sequence = name[:-len(SNAPSHOT_SUFFIX)].partition('-')
+                try:
+                    started = datetime.strptime(stamp, '%Y%m%dT%H%M%S%f').timestamp()
+                    sequence = int(sequence) if sequence else 0
+                except ValueError:
+                    continue
+                segments.append((started, sequence, os.path.join(self.directory, name)))
+        segments.sort()
+        return [(started, path) for started, _, path in segments]
+
+    def segments(self, start=None, end=None):
+        """
+        Yields an open SnapshotSegment for every segment that may hold records between
+        start and end; each one is closed when the caller moves on to the next.
+        Segments of different writers can overlap in time, so a segment is skipped by
+        its last record rather than by the start of the next one.
+        """
+        for started, path in self.paths():
+            if end is not None and started > end:
+                break
+            with SnapshotSegment(path) as segment:
+                if start is not None and (not segment.count or segment.timestamps[-1] < start):
+                    continue
+                yield segment
+
+    def writer(self, **options):
+        return SnapshotWriter(self.directory, **options)
+
+    def tier(self, name):
+        """
+        Returns the store of a rollup tier kept in a sub-directory of this one.
+        """
+        return SnapshotStore(os.path.join(self.directory, name))
+
+    def expire(self, retention, now=None):
+        """
+        Deletes the segments whose records are all older than `retention` seconds and
+        returns how many were deleted. The newest segment is always kept.
+        """
+        cutoff = (time.time() if now is None else now) - retention
+        deleted = 0
+        for started, path in self.paths()[:-1]:
+            if started > cutoff:
+                break
+            try:
+                with SnapshotSegment(path) as segment:
+                    newest = segment.timestamps[-1] if segment.count else started
+            except (OSError, ValueError):
+                newest = started
+            if newest > cutoff:
+                continue
+            try:
+                os.remove(path)
+                deleted += 1
+            except OSError as e:
+                logging.warning(f"Could not delete the expired snapshot segment {path}: {e}")
+        return deleted
+
+class _RollupBucket:
+    """
+    The values of the rollup bucket a tier is currently accumulating.
+    """
+    __slots__ = ('resolution', 'index', 'values', 'writer', 'store', 'retention')
+
+    def __init__(self, store, resolution, retention, segment_seconds):
+        self.store = store
+        self.resolution = resolution
+        self.retention = retention
+        self.writer = store.writer(segment_seconds=segment_seconds)
+        self.index = None
+        self.values = []
+
+class SnapshotCompactor:
+    """
+    Maintains the rollup tiers of a SnapshotStore and enforces its retention.
+
+    Every snapshot is added to the open bucket of each tier as it is recorded, which
+    only appends one float per rolled-up column. Finished buckets are reduced to
+    min/max/mean/p95/count and written by a background thread, which also deletes
+    the segments that outlived their tier's retention every `interval` seconds.
+    """
+    def __init__(self, store, tiers=ROLLUP_TIERS, raw_retention=SNAPSHOT_RETENTION,
+                 interval=COMPACTION_INTERVAL):
+        self.store = store
+        self.raw_retention = raw_retention
+        self.interval = interval
+        self.buckets = [_RollupBucket(store.tier(name), resolution, retention, segment_seconds)
+                        for name, resolution, retention, segment_seconds in tiers]
+        self._columns = None
+        self._positions = ()
+        self._rollup_columns = ()
+        self._tasks = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="snapshot-compactor", daemon=True)
+        self._thread.start()
+
+    def add(self, timestamp, columns, values):
+        """
+        Adds one snapshot to the open bucket of every tier.
+        """
+        if columns is not self._columns and columns != self._columns:
+            for bucket in self.buckets:
+                self._hand_off(bucket)
+            self._columns = columns
+            self._positions = [position for position, (name, _) in enumerate(columns)
+                               if name.startswith(ROLLUP_METRICS)]
+            self._rollup_columns = tuple(
+                (columns[position][0], columns[position][1] + (('stat', stat),))
+                for position in self._positions for stat in ROLLUP_STATS
+            )
+        for bucket in self.buckets:
+            index = int(timestamp // bucket.resolution)
+            if index != bucket.index:
+                self._hand_off(bucket)
+                bucket.index = index
+                bucket.values = [array('d') for _ in self._positions]
+            for column, position in zip(bucket.values, self._positions):
+                value = values[position]
+                if value is not None and value == value:
+                    column.append(value)
+
+    def _hand_off(self, bucket):
+        if bucket.index is not None and bucket.values:
+            self._tasks.put((bucket, bucket.index * bucket.resolution, self._rollup_columns, bucket.values))
+        bucket.index = None
+        bucket.values = []
+
+    def _run(self):
+        expire_due = time.monotonic()
+        while True:
+            if time.monotonic() >= expire_due:
+                self.expire()
+                expire_due = time.monotonic() + self.interval
+            try:
+                task = self._tasks.get(timeout=self.interval)
+            except queue.Empty:
+                continue
+            if task is None:
+                return
+            bucket, started, columns, values = task
+            try:
+                bucket.writer.append(started, columns, self.reduce(values))
+            except OSError as e:
+                logging.warning(f"Could not write a snapshot rollup: {e}")
+
+    @staticmethod
+    def reduce(values):
+        """
+        Returns the ROLLUP_STATS of every column of a bucket, flattened in column order.
+        """
+        nan = float('nan')
+        row = []
+        for column in values:
+            if not column:
+                row.extend((nan, nan, nan, nan, 0.0))
+                continue
+            ordered = sorted(column)
+            row.extend((ordered[0], ordered[-1], sum(ordered) / len(ordered),
+                        interpolated_percentile(ordered, 95), float(len(ordered))))
+        return row
+
+    def expire(self, now=None):
+        """
+        Deletes the raw and rollup segments that are past their retention.
+        """
+        self.store.expire(self.raw_retention, now)
+        for bucket in self.buckets:
+            bucket.store.expire(bucket.retention, now)
+
+    def close(self):
+        # The open buckets are written as they are; a later run that writes the same
+        # bucket starts its own segment for it, and queries merge the records of both
+        for bucket in self.buckets:
+            self._hand_off(bucket)
+        self._tasks.put(None)
+        self._thread.join()
+        for bucket in self.buckets:
+            bucket.writer.close()
+
+# Units accepted in query durations, in seconds
+_DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+_QUERY_STATS = ('mean', 'min', 'max', 'count', 'latest', 'p50', 'p90', 'p95', 'p99')
+_QUERY_METRIC = re.compile(r'([\w.]+)(?:\{([^}]*)\})?(?=\s|$)')
+
+def parse_duration(text):
+    """
+    Parses a duration such as 90s, 15m, 6h, 30d or 2w into seconds.
+    """
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([smhdw])', text.strip())
+    if not match or float(match.group(1)) <= 0:
+        raise ValueError(f"invalid duration '{text}', expected a number followed by s, m, h, d or w")
+    return float(match.group(1)) * _DURATION_UNITS[match.group(2)]
+
+@dataclass(slots=True)
+class HistoryQuery:
+    """
+    A parsed query: METRIC[{label=value,...}] [STAT] [last DURATION] [by DURATION].
+    """
+    metric: str
+    labels: tuple = ()
+    stat: str = 'mean'
+    window: float = 3600.0
+    bucket: float = None
+
+    def __str__(self):
+        labels = "{" + ",".join(f"{key}={value}" for key, value in self.labels) + "}" if self.labels else ""
+        text = f"{self.metric}{labels} {self.stat} over the last {self.window:g} s"
+        return text + (f" by {self.bucket:g} s" if self.bucket else "")
+
+def parse_query(text):
+    """
+    Parses a query such as "cpu.usage p95 last 6h by 1m"; raises ValueError.
+    """
+    text = text.strip()
+    if not text:
+        raise ValueError("empty query")
+    # The label filter may contain spaces, so the metric is matched before splitting
+    match = _QUERY_METRIC.match(text)
+    if not match:
+        raise ValueError(f"invalid metric '{text.split()[0]}'")
+    tokens = [match.group(0)] + text[match.end():].split()
+    labels = []
+    for pair in filter(None, (match.group(2) or "").split(',')):
+        key, separator, value = pair.partition('=')
+        if not separator:
+            raise ValueError(f"invalid label filter '{pair}', expected KEY=VALUE")
+        labels.append((key.strip(), value.strip()))
+    query = HistoryQuery(match.group(1), tuple(labels))
+
+    position = 1
+    if position < len(tokens) and tokens[position] in _QUERY_STATS:
+        query.stat = tokens[position]
+        position += 1
+    while position < len(tokens):
+        keyword = tokens[position]
+        if keyword not in ('last', 'by') or position + 1 == len(tokens):
+            raise ValueError(f"unexpected '{keyword}' in query (stats: {', '.join(_QUERY_STATS)}; "
+                             "clauses: last DURATION, by DURATION)")
+        duration = parse_duration(tokens[position + 1])
+        if keyword == 'last':
+            query.window = duration
+        else:
+            query.bucket = duration
+        position += 2
+    return query
+
+# How each query statistic is answered from a rollup tier: the stored statistic that
+# is read and how it is reduced per bucket. Other percentiles use the bucket means.
+_ROLLUP_QUERIES = {
+    'min': ('min', 'min'),
+    'max': ('max', 'max'),
+    'mean': ('mean', 'mean'),
+    'count': ('count', 'sum'),
+    'latest': ('mean', 'latest'),
+    'p95': ('p95', 'p95'),
+}
+
+def _aggregate(values, stat):
+    if stat == 'count':
+        return float(len(values))
+    if stat == 'sum':
+        return sum(values)
+    if stat == 'latest':
+        return values[-1]
+    if stat == 'mean':
+        return sum(values) / len(values)
+    if stat == 'min':
+        return min(values)
+    if stat == 'max':
+        return max(values)
+    values.sort()
+    return interpolated_percentile(values, float(stat[1:]))
+
+def _query_source(store, query):
+    """
+    Returns the store a query reads, the rollup statistic it selects (None for raw
+    snapshots) and the reduction applied per bucket.
+    """
+    if query.window > SNAPSHOT_RETENTION:
+        for name, _, retention, _ in ROLLUP_TIERS:
+            if query.window <= retention or name == ROLLUP_TIERS[-1][0]:
+                tier = store.tier(name)
+                if tier.paths():
+                    column_stat, reduction = _ROLLUP_QUERIES.get(query.stat, ('mean', query.stat))
+                    return tier, column_stat, reduction
+                break
+    return store, None, query.stat
+
+def run_query(store, query, now=None):
+    """
+    Evaluates a HistoryQuery over a SnapshotStore.
+
+    Returns {labels: [(bucket start, value), ...]} for every matching series. Windows
+    longer than the raw retention are answered from the finest rollup tier that
+    covers them. Record ranges are found by binary search over the memory-mapped
+    timestamp column and each bucket is read as one strided slice of the value
+    column, so only the values inside the window become Python floats. Buckets are
+    merged across segments, which may overlap when several processes wrote them.
+    """
+    store, column_stat, reduction = _query_source(store, query)
+    wanted = query.labels + ((('stat', column_stat),) if column_stat else ())
+    end = time.time() if now is None else now
+    start = end - query.window
+    bucket = query.bucket or query.window
+    # Buckets are aligned to multiples of their width, like most time series databases
+    origin = start - start % bucket if query.bucket else start
+
+    buckets = {}
+    for segment in store.segments(start, end):
+        timestamps = segment.timestamps
+        low = bisect_left(timestamps, start)
+        high = bisect_left(timestamps, end + 1e-6)
+        if low >= high:
+            continue
+        first = int((timestamps[low] - origin) // bucket)
+        last = int((timestamps[high - 1] - origin) // bucket)
+        for labels, column in segment.find(query.metric):
+            if not all(pair in labels for pair in wanted):
+                continue
+            series = buckets.setdefault(labels, {})
+            begin = low
+            for index in range(first, last + 1):
+                stop = bisect_left(timestamps, origin + (index + 1) * bucket, begin, high)
+                if stop > begin:
+                    series.setdefault(index, []).extend(
+                        value for value in column[begin:stop].tolist() if value == value
+                    )
+                begin = stop
+
+    results = {}
+    for labels, series in buckets.items():
+        rows = [(origin + index * bucket, _aggregate(values, reduction))
+                for index, values in sorted(series.items()) if values]
+        if rows:
+            if column_stat:
+                labels = tuple(pair for pair in labels if pair[0] != 'stat')
+            results[labels] = rows
+    return results
+
+@dataclass(slots=True)
+class Alert:
+    """
+    A health warning raised by a check, with the points it costs the health score.
+    """
+    message: str
+    penalty: int = 0
+    severity: str = 'warning'
+
+@dataclass(slots=True)
+class CheckResult:
+    """
+    Base class of the records returned by the checks.
+
+    Records only hold data; the text describing them is produced by lines(), a
+    generator that sinks consume, so nothing is formatted unless a sink needs it.
+    """
+    TITLE = None
+    SUBJECT = "information"
+    SUBSYSTEM = 'system'
+
+    alerts: list = field(default_factory=list, kw_only=True)
+    error: str = field(default=None, kw_only=True)
+
+    @property
+    def title(self):
+        return self.TITLE
+
+    def lines(self):
+        """
+        Yields the (tone, text) pairs describing the record.
+        """
+        return iter(())
+
+    def metrics(self):
+        """
+        Yields the (name, labels, value) numeric samples of the record.
+        """
+        return iter(())
+
+    @property
+    def timeouts(self):
+        """
+        Number of probes within the check that gave up on a timeout.
+        """
+        return 0
+
+@dataclass(slots=True)
+class Notice(CheckResult):
+    """
+    A free-form message that is not the result of a check.
+    """
+    text: str
+    tone: str = 'info'
+
+    def lines(self):
+        yield self.tone, self.text
+
+@dataclass(slots=True)
+class SystemInfo(CheckResult):
+    """
+    General operating system and host information.
+    """
+    TITLE = "System Information"
+    SUBJECT = "system information"
+
+    operating_system: str = None
+    architecture: str = None
+    processor: str = None
+    hostname: str = None
+    current_time: datetime = None
+
+    def lines(self):
+        yield 'info', f"Operating System: {self.operating_system}"
+        yield 'info', f"Architecture: {self.architecture}"
+        yield 'info', f"Processor: {self.processor}"
+        yield 'info', f"Hostname: {self.hostname}"
+        yield 'info', f"Current Time: {self.current_time:%Y-%m-%d %H:%M:%S}"
+
+@dataclass(slots=True)
+class WindowsUpdateInfo(CheckResult):
+    """
+    The most recently installed Windows update.
+    """
+    SUBJECT = "update info"
+
+    supported: bool = True
+    details: str = None
+
+    @property
+    def title(self):
+        return "Last Windows Update" if self.supported else None
+
+    def lines(self):
+        if not self.supported:
+            yield 'fail', "❌ This feature is only available for Windows."
+        elif self.details:
+            yield 'info', self.details
+        elif not self.error:
+            yield 'info', "✅ No update information found. Your system may be up-to-date."
+
+@dataclass(slots=True)
+class CpuInfo(CheckResult):
+    """
+    Processor usage, frequency and temperature.
+    """
+    TITLE = "Processor (CPU) Information"
+    SUBJECT = "CPU information"
+    SUBSYSTEM = 'cpu'
+
+    core_count: int = None
+    freq_max: float = None
+    freq_current: float = None
+    usage: float = None
+    per_core: list = field(default_factory=list)
+    temperature: float = None
+    sensors_supported: bool = True
+
+    def lines(self):
+        if self.usage is None:
+            return
+        yield 'info', f"Core Count: {self.core_count}"
+        yield 'info', f"Max Frequency: {self.freq_max:.2f} MHz"
+        yield 'info', f"Current Frequency: {self.freq_current:.2f} MHz"
+        yield 'info', f"CPU Usage: {self.usage}%"
+        if not self.sensors_supported:
+            yield 'fail', "❌ psutil.sensors_temperatures() is not available on this system."
+        elif self.temperature is None:
+            yield 'info', "❕ CPU temperature information not available for this platform."
+        else:
+            yield 'info', f"CPU Temperature: {self.temperature}°C"
+
+    def metrics(self):
+        yield 'cpu.usage', (), self.usage
+        for core, usage in enumerate(self.per_core):
+            yield 'cpu.core.usage', (('core', str(core)),), usage
+        yield 'cpu.frequency', (), self.freq_current
+        yield 'cpu.temperature', (), self.temperature
+
+@dataclass(slots=True)
+class RamInfo(CheckResult):
+    """
+    Physical memory usage.
+    """
+    TITLE = "Memory (RAM) Information"
+    SUBJECT = "RAM information"
+    SUBSYSTEM = 'memory'
+
+    total: int = None
+    used: int = None
+    percent: float = None
+
+    def lines(self):
+        if self.percent is None:
+            return
+        yield 'info', f"Total Memory: {self.total / (1024**3):.2f} GB"
+        yield 'info', f"Used Memory: {self.used / (1024**3):.2f} GB"
+        yield 'info', f"Memory Usage: {self.percent}%"
+
+    def metrics(self):
+        yield 'ram.percent', (), self.percent
+        yield 'ram.used', (), self.used
+
+@dataclass(slots=True)
+class PartitionUsage:
+    """
+    Capacity of a single disk partition.
+    """
+    device: str
+    mountpoint: str
+    total: int = None
+    used: int = None
+    free: int = None
+    percent: float = None
+    access_denied: bool = False
+    timed_out: bool = False
+    error: str = None
+
+@dataclass(slots=True)
+class DiskIoRate:
+    """
+    Throughput, IOPS, average wait and utilization of a single block device.
+    """
+    device: str
+    read_bytes_per_sec: float = 0.0
+    write_bytes_per_sec: float = 0.0
+    iops: float = 0.0
+    await_ms: float = 0.0
+    utilization: float = None
+
+@dataclass(slots=True)
+class DiskInfo(CheckResult):
+    """
+    Capacity of every mounted disk partition and I/O rates of every block device.
+    """
+    TITLE = "Disk Information"
+    SUBJECT = "disk information"
+    SUBSYSTEM = 'disk'
+
+    partitions: list = field(default_factory=list)
+    io: list = field(default_factory=list)
+
+    @property
+    def timeouts(self):
+        return sum(1 for partition in self.partitions if partition.timed_out)
+
+    def lines(self):
+        for partition in self.partitions:
+            if partition.access_denied:
+                yield 'fail', f"  ❌ Access denied for drive {partition.device}."
+            elif partition.error:
+                yield 'fail', f"  ❌ Failed to get disk information for {partition.device}: {partition.error}"
+            else:
+                yield 'info', f"🔹 Drive: {partition.device}"
+                yield 'info', f"  Total Space: {partition.total / (1024**3):.2f} GB"
+                yield 'info', f"  Used Space: {partition.used / (1024**3):.2f} GB"
+                yield 'info', f"  Free Space: {partition.free / (1024**3):.2f} GB"
+                yield 'info', f"  Usage Percentage: {partition.percent}%"
+        for rate in self.io:
+            utilization = f", Utilization: {rate.utilization:.1f}%" if rate.utilization is not None else ""
+            yield 'info', (
+                f"🔹 I/O on {rate.device}: Read {rate.read_bytes_per_sec / (1024**2):.2f} MB/s, "
+                f"Write {rate.write_bytes_per_sec / (1024**2):.2f} MB/s, {rate.iops:.0f} IOPS, "
+                f"Await {rate.await_ms:.1f} ms{utilization}"
+            )
+
+    def metrics(self):
+        for partition in self.partitions:
+            yield 'disk.percent', (('mountpoint', partition.mountpoint),), partition.percent
+        for rate in self.io:
+            labels = (('device', rate.device),)
+            yield 'disk.read_bytes_per_sec', labels, rate.read_bytes_per_sec
+            yield 'disk.write_bytes_per_sec', labels, rate.write_bytes_per_sec
+            yield 'disk.iops', labels, rate.iops
+            yield 'disk.await_ms', labels, rate.await_ms
+            yield 'disk.utilization', labels, rate.utilization
+
+@dataclass(slots=True)
+class BatteryInfo(CheckResult):
+    """
+    Battery charge level and power source.
+    """
+    TITLE = "Battery Information"
+    SUBJECT = "battery information"
+    SUBSYSTEM = 'battery'
+
+    percent: float = None
+    power_plugged: bool = None
+
+    def lines(self):
+        if self.percent is None:
+            if not self.error:
+                yield 'info', "❕ Battery information not available."
+            return
+        yield 'info', f"Charge Level: {self.percent}%"
+        yield 'info', f"Status: {'Plugged In' if self.power_plugged else 'On Battery'}"
+
+    def metrics(self):
+        yield 'battery.percent', (), self.percent
+        if self.power_plugged is not None:
+            yield 'battery.plugged', (), float(self.power_plugged)
+
+@dataclass(slots=True)
+class GpuDevice:
+    """
+    Load, memory, temperature, power draw (W) and clocks (MHz) of a single GPU.
+    The index tells apart GPUs of the same model.
+    """
+    name: str
+    memory_total: float = None
+    memory_used: float = None
+    temperature: float = None
+    load: float = None
+    power: float = None
+    clock: float = None
+    memory_clock: float = None
+    index: int = None
+
+@dataclass(slots=True)
+class DisplayAdapters:
+    """
+    Graphics cards and displays identified through WMI.
+    """
+    supported: bool = True
+    adapters: list = field(default_factory=list)
+    displays: list = field(default_factory=list)
+    error: str = None
+
+    def lines(self):
+        if not self.supported:
+            yield 'info', "🔍 WMI is only available on Windows. No fallback detection available."
+            return
+        if self.error:
+            yield 'fail', f"❌ GPU or display detection via WMI failed. Error: {self.error}"
+            return
+        if self.adapters:
+            yield 'info', "🔍 Identified Graphics Cards:"
+            for name, driver_version in self.adapters:
+                yield 'info', f"  - {name}"
+                yield 'info', f"    Driver Version: {driver_version}"
+        if self.displays:
+            yield 'info', "🔍 Connected Displays:"
+            for name, width, height in self.displays:
+                yield 'info', f"  - {name}"
+                yield 'info', f"    Resolution: {width}x{height}"
+        if not self.adapters and not self.displays:
+            yield 'info', "🔍 No graphics cards or displays identified via WMI."
+
+@dataclass(slots=True)
+class GpuInfo(CheckResult):
+    """
+    NVIDIA GPUs reported by the GPU backend, or the WMI fallback when there are none.
+    """
+    TITLE = "Graphics Card (GPU) Information"
+    SUBJECT = "GPU information"
+    SUBSYSTEM = 'gpu'
+
+    devices: list = field(default_factory=list)
+    fallback: DisplayAdapters = None
+    backend: str = "GPUtil"
+
+    def lines(self):
+        for gpu in self.devices:
+            yield 'info', f"🔹 NVIDIA GPU {gpu.index}: {gpu.name}"
+            if gpu.memory_total is not None:
+                yield 'info', f"  Total Memory: {gpu.memory_total:.0f} MB"
+                yield 'info', f"  Used Memory: {gpu.memory_used:.0f} MB"
+            if gpu.temperature is not None:
+                yield 'info', f"  Temperature: {gpu.temperature} °C"
+            if gpu.load is not None:
+                yield 'info', f"  Load: {gpu.load:.1f}%"
+            if gpu.power is not None:
+                yield 'info', f"  Power Draw: {gpu.power:.1f} W"
+            if gpu.clock is not None:
+                yield 'info', f"  Clocks: {gpu.clock} MHz (memory {gpu.memory_clock} MHz)"
+        if self.fallback is not None:
+            if not self.error:
+                yield 'info', f"❕ No NVIDIA GPU found using {self.backend}."
+            yield from self.fallback.lines()
+
+    def metrics(self):
+        for position, gpu in enumerate(self.devices):
+            labels = (('gpu', str(position if gpu.index is None else gpu.index)), ('name', gpu.name))
+            yield 'gpu.load', labels, gpu.load
+            yield 'gpu.temperature', labels, gpu.temperature
+            yield 'gpu.memory_used', labels, gpu.memory_used
+            yield 'gpu.power_watts', labels, gpu.power
+            yield 'gpu.clock_mhz', labels, gpu.clock
+
+@dataclass(slots=True)
+class InterfaceRate:
+    """
+    Traffic rates and link utilization of a single network interface.
+    """
+    sent_bytes_per_sec: float = 0.0
+    recv_bytes_per_sec: float = 0.0
+    packets_per_sec: float = 0.0
+    errors_per_sec: float = 0.0
+    drops_per_sec: float = 0.0
+    is_up: bool = None
+    speed_mbps: int = None
+    utilization: float = None
+    # No traffic in this interval nor in the previous one
+    idle: bool = False
+
+@dataclass(slots=True)
+class InterfaceInfo:
+    """
+    Addresses and traffic of a single network interface.
+    """
+    name: str
+    mac: str = None
+    ipv4: list = field(default_factory=list)
+    bytes_sent: int = None
+    bytes_recv: int = None
+    traffic: InterfaceRate = None
+
+@dataclass(slots=True)
+class NetworkInfo(CheckResult):
+    """
+    Network interfaces and their addresses.
+    """
+    TITLE = "Network Information"
+    SUBJECT = "network information"
+    SUBSYSTEM = 'network'
+
+    interfaces: list = field(default_factory=list)
+
+    def lines(self):
+        for interface in self.interfaces:
+            yield 'info', f"🔹 Interface: {interface.name}"
+            if interface.mac:
+                yield 'info', f"  MAC Address: {interface.mac}"
+            for address in interface.ipv4:
+                yield 'info', f"  IP Address: {address}"
+            traffic = interface.traffic
+            if traffic is not None:
+                yield 'info', (
+                    f"  Traffic: ↓ {traffic.recv_bytes_per_sec / 1024:.1f} KB/s, "
+                    f"↑ {traffic.sent_bytes_per_sec / 1024:.1f} KB/s, {traffic.packets_per_sec:.0f} packets/s"
+                )
+                if traffic.errors_per_sec or traffic.drops_per_sec:
+                    yield 'info', (
+                        f"  Errors: {traffic.errors_per_sec:.1f}/s, Drops: {traffic.drops_per_sec:.1f}/s"
+                    )
+                if traffic.speed_mbps:
+                    yield 'info', f"  Link: {traffic.speed_mbps} Mb/s ({traffic.utilization:.1f}% utilized)"
+
+    def metrics(self):
+        # Down and idle interfaces (e.g. unused veths) would only add flat series
+        for interface in self.interfaces:
+            traffic = interface.traffic
+            if traffic is not None and (traffic.idle or traffic.is_up is False):
+                continue
+            labels = (('interface', interface.name),)
+            yield 'net.bytes_sent', labels, interface.bytes_sent
+            yield 'net.bytes_recv', labels, interface.bytes_recv
+            if traffic is not None:
+                yield 'net.sent_bytes_per_sec', labels, traffic.sent_bytes_per_sec
+                yield 'net.recv_bytes_per_sec', labels, traffic.recv_bytes_per_sec
+                yield 'net.packets_per_sec', labels, traffic.packets_per_sec
+                yield 'net.errors_per_sec', labels, traffic.errors_per_sec
+                yield 'net.drops_per_sec', labels, traffic.drops_per_sec
+                yield 'net.utilization', labels, traffic.utilization
+
+@dataclass(slots=True)
+class HardwareInfo(CheckResult):
+    """
+    Motherboard and BIOS details.
+    """
+    TITLE = "Advanced Hardware Information"
+    SUBJECT = "advanced hardware information"
+
+    supported: bool = True
+    board_manufacturer: str = None
+    board_model: str = None
+    bios_manufacturer: str = None
+    bios_version: str = None
+
+    def lines(self):
+        if not self.supported:
+            yield 'fail', "❌ This feature is only available for Windows."
+        elif not self.error:
+            yield 'info', f"Motherboard Manufacturer: {self.board_manufacturer}"
+            yield 'info', f"Motherboard Model: {self.board_model}"
+            yield 'info', f"BIOS Manufacturer: {self.bios_manufacturer}"
+            yield 'info', f"BIOS Version: {self.bios_version}"
+
+@dataclass(slots=True)
+class RequirementCheck:
+    """
+    The outcome of one upgrade requirement, with the details shown before it.
+    """
+    passed: bool
+    verdict: str
+    details: list = field(default_factory=list)
+
+@dataclass(slots=True)
+class UpgradeCompatibility(CheckResult):
+    """
+    Whether the system meets the requirements of the next Windows version.
+    """
+    SUBJECT = "upgrade compatibility"
+
+    target: str = None
+    notice: str = None
+    notice_tone: str = 'info'
+    requirements: list = field(default_factory=list)
+
+    @property
+    def title(self):
+        if self.target and not self.notice:
+            return f"Upgrade Compatibility Check for {self.target}"
+        return "Windows Upgrade Compatibility"
+
+    @property
+    def compatible(self):
+        return all(requirement.passed for requirement in self.requirements)
+
+    def lines(self):
+        if self.notice:
+            yield self.notice_tone, self.notice
+            return
+        for requirement in self.requirements:
+            for detail in requirement.details:
+                yield 'info', detail
+            if requirement.passed:
+                yield 'ok', f"✅ PASSED: {requirement.verdict}"
+            else:
+                yield 'fail', f"❌ FAILED: {requirement.verdict}"
+        yield 'info', "\n" + "="*30
+        if self.compatible:
+            yield 'ok', f"✅ Your PC can be upgraded to {self.target}."
+        else:
+            yield 'fail', f"❌ Your PC does not meet the minimum requirements for {self.target}."
+        yield 'info', "="*30
+
+@dataclass(slots=True)
+class ProcessInfo(CheckResult):
+    """
+    The processes using the most CPU, memory and disk I/O.
+    """
+    TITLE = "Top Processes"
+    SUBJECT = "process information"
+
+    process_count: int = 0
+    top_cpu: list = field(default_factory=list)
+    top_memory: list = field(default_factory=list)
+    top_io: list = field(default_factory=list)
+
+    def lines(self):
+        if not self.process_count:
+            return
+        yield 'info', f"Running Processes: {self.process_count}"
+        yield 'info', "🔹 By CPU:"
+        for pid, name, cpu_percent, _, _ in self.top_cpu:
+            yield 'info', f"  {name} (PID {pid}): {cpu_percent}%"
+        yield 'info', "🔹 By Memory:"
+        for pid, name, _, rss, _ in self.top_memory:
+            yield 'info', f"  {name} (PID {pid}): {rss / (1024**2):.1f} MB"
+        yield 'info', "🔹 By Disk I/O:"
+        for pid, name, _, _, io_rate in self.top_io:
+            yield 'info', f"  {name} (PID {pid}): {io_rate / 1024:.1f} KB/s"
+
+@dataclass(slots=True)
+class HealthReport(CheckResult):
+    """
+    The final health score.
+    """
+    TITLE = "System Health Report"
+
+    score: int = 100
+    sub_scores: dict = field(default_factory=dict)
+    trends: list = field(default_factory=list)
+    checks: dict = field(default_factory=dict)
+
+    @property
+    def message(self):
+        if self.score >= 80:
+            return "✅ The system is in good condition."
+        if self.score >= 50:
+            return "⚠️ Some areas need attention."
+        return "❌ The system is in poor condition. Professional inspection is recommended."
+
+    def lines(self):
+        tone = 'ok' if self.score >= 80 else 'attention' if self.score >= 50 else 'fail'
+        yield tone, f"🩺 System Health Score: {self.score}%"
+        yield 'info', self.message
+        if self.sub_scores:
+            yield 'info', "🔹 Sub-scores: " + ", ".join(
+                f"{SCORE_SUBSYSTEMS.get(name, name)} {score:.0f}%" for name, score in self.sub_scores.items()
+            )
+        if self.trends:
+            yield 'info', "📈 Recent trends:"
+            for label, stats in self.trends:
+                yield 'info', (
+                    f"  {label}: mean {stats['mean']:.1f}, min {stats['min']:.1f}, max {stats['max']:.1f}, "
+                    f"p95 {stats['p95']:.1f}, p99 {stats['p99']:.1f}, EWMA {stats['ewma']:.1f}, "
+                    f"rate {stats['rate']:+.2f}/s over {stats['count']} samples"
+                )
+        if self.checks:
+            slowest = sorted(self.checks.items(), key=lambda item: item[1]['p95_ms'] or 0, reverse=True)
+            yield 'info', "⏱️ Slowest checks (p95): " + ", ".join(
+                f"{name} {stats['p95_ms']:.1f} ms" for name, stats in slowest[:3] if stats['count']
+            )
+            for name, stats in self.checks.items():
+                if stats['errors'] or stats['exceptions'] or stats['timeouts']:
+                    yield 'attention', (
+                        f"  {name}: {stats['errors']} errors, {stats['exceptions']} exceptions, "
+                        f"{stats['timeouts']} timeouts in {stats['count']} runs"
+                    )
+
+@dataclass(slots=True)
+class FleetReport(CheckResult):
+    """
+    Fleet-wide distribution of the health score and trend metrics, and the worst hosts.
+    """
+    TITLE = "Fleet Health Report"
+
+    hosts: int = 0
+    stale: int = 0
+    distributions: dict = field(default_factory=dict)
+    worst: list = field(default_factory=list)
+
+    def lines(self):
+        yield 'info', f"🛰️ Reporting hosts: {self.hosts} ({self.stale} stale)"
+        for name, stats in self.distributions.items():
+            label = TREND_METRICS.get(name, "Health score")
+            yield 'info', (
+                f"  {label}: p50 {stats['p50']:.1f}, p90 {stats['p90']:.1f}, p99 {stats['p99']:.1f}, "
+                f"min {stats['min']:.1f}, max {stats['max']:.1f} over {stats['hosts']} hosts"
+            )
+        if self.worst:
+            yield 'info', "📉 Lowest health scores:"
+            for host in self.worst:
+                tone = 'ok' if host['score'] >= 80 else 'attention' if host['score'] >= 50 else 'fail'
+                yield tone, f"  {host['host']}: {host['score']:.0f}% (last seen {host['age']:.0f} s ago)"
+
+    def metrics(self):
+        yield 'fleet.hosts', (), self.hosts
+        yield 'fleet.stale', (), self.stale
+        for name, stats in self.distributions.items():
+            for stat in ('p50', 'p90', 'p99'):
+                yield 'fleet.distribution', (('metric', name), ('stat', stat)), stats[stat]
+
+@dataclass(slots=True)
+class CheckFailure(CheckResult):
+    """
+    A check that raised an exception instead of returning a result.
+    """
+    check: str = None
+
+    @property
+    def title(self):
+        return self.check.replace('_', ' ').title()
+
+    def lines(self):
+        yield 'fail', f"❌ {self.check} failed: {self.error}"
+
+@dataclass(slots=True)
+class CheckTimeout(CheckResult):
+    """
+    A check that did not finish within its timeout.
+    """
+    check: str = None
+    timeout: float = None
+
+    @property
+    def title(self):
+        return self.check.replace('_', ' ').title()
+
+    def lines(self):
+        yield 'fail', f"⏱️ Check timed out after {self.timeout} seconds."
+
+class ConsoleSink:
+    """
+    Renders records as colored sections on the console.
+    """
+    COLORS = {
+        'ok': Fore.GREEN,
+        'fail': Fore.RED,
+        'attention': Fore.YELLOW,
+        'accent': Fore.MAGENTA,
+        'credit': Fore.YELLOW,
+    }
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def handle(self, record):
+        out = self.stream or sys.stdout
+        if record.title:
+            print_section(record.title, out)
+        for tone, text in record.lines():
+            color = self.COLORS.get(tone)
+            print(f"{color}{text}{Style.RESET_ALL}" if color else text, file=out)
+        if record.error:
+            print(f"❌ Failed to get {record.SUBJECT}: {record.error}", file=out)
+        for alert in record.alerts:
+            if alert.severity == 'critical':
+                print(f"{Fore.RED}🚨 CRITICAL: {alert.message}{Style.RESET_ALL}", file=out)
+            else:
+                print(f"{Fore.RED}⚠️ WARNING: {alert.message}{Style.RESET_ALL}", file=out)
+
+    def close(self):
+        pass
+
+class LogSink:
+    """
+    Writes records to the report log file.
+    """
+    def __init__(self, logger=None):
+        self.logger = logger or logging.getLogger()
+
+    def handle(self, record):
+        logger = self.logger
+        if record.error:
+            logger.error(f"Failed to get {record.SUBJECT}: {record.error}")
+        for alert in record.alerts:
+            if alert.severity == 'critical':
+                logger.error(alert.message)
+            else:
+                logger.warning(alert.message)
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        if record.title:
+            logger.info(f"--- {record.title} ---")
+        for _, text in record.lines():
+            logger.info(text.strip())
+
+    def close(self):
+        pass
+
+class JsonExportSink:
+    """
+    Appends every check result to a JSON Lines file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def handle(self, record):
+        if isinstance(record, Notice):
+            return
+        entry = {'check': type(record).__name__, 'timestamp': time.time()}
+        entry.update(asdict(record))
+        self._file.write(json.dumps(entry, default=str) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class ResultPipeline:
+    """
+    Hands every record to a list of sinks, in order.
+    """
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+
+    def emit(self, record):
+        for sink in self.sinks:
+            sink.handle(record)
+
+    def without(self, sink_type):
+        """
+        Returns a pipeline with the same sinks except those of sink_type.
+        """
+        return ResultPipeline(sink for sink in self.sinks if not isinstance(sink, sink_type))
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+@dataclass(slots=True)
+class HardwareInventory:
+    """
+    Hardware and platform facts that do not change while the system is running.
+    """
+    system: str = None
+    release: str = None
+    version: str = None
+    architecture: str = None
+    processor: str = None
+    hostname: str = None
+    cpu_count: int = None
+    cpu_freq_max: float = None
+    total_memory: int = None
+    system_drive_total: int = None
+    board_manufacturer: str = None
+    board_model: str = None
+    bios_manufacturer: str = None
+    bios_version: str = None
+    adapters: list = field(default_factory=list)
+    displays: list = field(default_factory=list)
+    secure_boot: bool = None
+    tpm_version: str = None
+    wmi_error: str = None
+    security_error: str = None
+    boot_id: str = None
+    collected_at: float = None
+
+def current_boot_id():
+    """
+    Returns an identifier that changes on every boot of the system.
+    """
+    try:
+        with open('/proc/sys/kernel/random/boot_id') as f:
+            return f.read().strip()
+    except OSError:
+        return str(int(psutil.boot_time()))
+
+def collect_inventory():
+    """
+    Queries the static hardware facts, using a single WMI connection on Windows.
+    """
+    freq = psutil.cpu_freq()
+    inventory = HardwareInventory(
+        system=platform.system(),
+        release=platform.release(),
+        version=platform.version(),
+        architecture=platform.machine(),
+        processor=platform.processor(),
+        hostname=platform.node(),
+        cpu_count=psutil.cpu_count(logical=True),
+        cpu_freq_max=freq.max if freq else None,
+        total_memory=psutil.virtual_memory().total,
+        boot_id=current_boot_id(),
+        collected_at=time.time(),
+    )
+    if inventory.system != "Windows":
+        return inventory
+
+    try:
+        inventory.system_drive_total = psutil.disk_usage('C:\\').total
+    except Exception:
+        pass
+    try:
+        c = require_module('wmi').WMI()
+        motherboard_info = c.Win32_BaseBoard()[0]
+        bios_info = c.Win32_BIOS()[0]
+        inventory.board_manufacturer = motherboard_info.Manufacturer
+        inventory.board_model = motherboard_info.Product
+        inventory.bios_manufacturer = bios_info.Manufacturer
+        inventory.bios_version = bios_info.SMBIOSBIOSVersion
+        inventory.adapters = [(gpu.Name, gpu.DriverVersion) for gpu in c.Win32_VideoController()]
+        inventory.displays = [
+            (monitor.Name, monitor.ScreenWidth, monitor.ScreenHeight)
+            for monitor in c.Win32_DesktopMonitor()
+        ]
+    except Exception as e:
+        inventory.wmi_error = str(e)
+        return inventory
+    try:
+        inventory.secure_boot = bool(c.Win32_OperatingSystem()[0].SecureBoot)
+        inventory.tpm_version = c.Win32_Tpm()[0].SpecVersion
+    except Exception as e:
+        inventory.security_error = str(e)
+    return inventory
+
+class InventoryCache:
+    """
+    Collects the hardware inventory once and shares it between every check.
+
+    When a path is given the inventory is also persisted as JSON and reused by later
+    runs until the system reboots or `ttl` seconds pass.
+    """
+    def __init__(self, path=None, ttl=INVENTORY_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._inventory = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        Returns the cached inventory, loading or collecting it on first use.
+        """
+        with self._lock:
+            if self._inventory is None:
+                self._inventory = self._load() or self._collect()
+            return self._inventory
+
+    def invalidate(self):
+        with self._lock:
+            self._inventory = None
+
+    def _load(self):
+        if not self.path:
+            return None
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                inventory = HardwareInventory(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+        if inventory.boot_id != current_boot_id() or time.time() - (inventory.collected_at or 0) > self.ttl:
+            return None
+        return inventory
+
+    def _collect(self):
+        inventory = collect_inventory()
+        if self.path:
+            try:
+                directory = os.path.dirname(os.path.abspath(self.path))
+                os.makedirs(directory, exist_ok=True)
+                temporary = f"{self.path}.tmp"
+                with open(temporary, 'w', encoding='utf-8') as f:
+                    json.dump(asdict(inventory), f)
+                os.replace(temporary, self.path)
+            except OSError as e:
+                logging.warning(f"Could not persist the hardware inventory to {self.path}: {e}")
+        return inventory
+
+# Statistics a rule can compare against its levels
+_RULE_STATS = ('value', 'mean', 'min', 'max', 'ewma', 'p50', 'p90', 'p95', 'p99')
+_SEVERITIES = (None, 'warning', 'critical')
+
+class _AlertFields(dict):
+    """
+    Message template fields; names that are not set are looked up in `providers`,
+    a {name: callable} dict, only when a template uses them.
+    """
+    def __init__(self, providers, **fields):
+        super().__init__(**fields)
+        self.providers = providers
+
+    def __missing__(self, name):
+        provider = self.providers.get(name)
+        if provider is None:
+            return "{" + name + "}"
+        value = self[name] = provider()
+        return value
+
+class _TemplateProbe(dict):
+    """
+    Message template fields for checking a template when its rule is compiled.
+    """
+    def __missing__(self, name):
+        return 0.0
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _seconds(value, field_name, rule_name):
+    if value is None:
+        return None
+    if _is_number(value):
+        return float(value)
+    try:
+        return parse_duration(str(value))
+    except ValueError as e:
+        raise ValueError(f"rule '{rule_name}': invalid '{field_name}': {e}")
+
+def compile_rule(spec):
+    """
+    Validates a rule definition and compiles it into an evaluate(store, labels, value,
+    now, state) function returning the alert level: 0 (clear), 1 (warn) or 2 (crit).
+    The statistic that was compared is left in state[3].
+
+    Rule keys: name, metric, warn and/or crit levels (a level is reached when the stat
+    is above it, or below it with below), below (alert on low values), stat compared
+    with the levels (default: p50), window (time window of the stat, default: the
+    rolling statistics), for (how long a level must hold before it fires), hysteresis
+    (how far the stat must move back before a level clears), labels (series filter),
+    when ({metric: value} conditions on the same series labels), group (rules of a
+    group charge one penalty per series), penalty (number or {warn, crit}) and message
+    (str.format template with value, stat, severity, the series labels, top_cpu and
+    top_memory).
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("a rule must be an object")
+    name = spec.get('name')
+    if not isinstance(name, str) or not name:
+        raise ValueError("a rule needs a name")
+    unknown = set(spec) - {'name', 'metric', 'warn', 'crit', 'below', 'stat', 'window', 'for', 'hysteresis',
+                           'labels', 'when', 'group', 'penalty', 'message'}
+    if unknown:
+        raise ValueError(f"rule '{name}': unknown keys {', '.join(sorted(unknown))}")
+    if not isinstance(spec.get('metric'), str):
+        raise ValueError(f"rule '{name}': missing metric")
+    levels = []
+    for key in ('warn', 'crit'):
+        level = spec.get(key)
+        if level is not None and not _is_number(level):
+            raise ValueError(f"rule '{name}': '{key}' must be a number")
+        levels.append(level)
+    if levels == [None, None]:
+        raise ValueError(f"rule '{name}': needs a warn or crit level")
+    below = bool(spec.get('below', False))
+    if None not in levels and (levels[0] > levels[1] if not below else levels[0] < levels[1]):
+        raise ValueError(f"rule '{name}': the crit level must be {'below' if below else 'above'} the warn level")
+    stat = spec.get('stat', 'p50')
+    if stat not in _RULE_STATS:
+        raise ValueError(f"rule '{name}': unknown stat '{stat}' (choose from {', '.join(_RULE_STATS)})")
+    window = _seconds(spec.get('window'), 'window', name)
+    hold = _seconds(spec.get('for'), 'for', name) or 0.0
+    hysteresis = spec.get('hysteresis', 0)
+    if not _is_number(hysteresis):
+        raise ValueError(f"rule '{name}': 'hysteresis' must be a number")
+    hysteresis = float(hysteresis)
+    group = spec.get('group')
+    if group is not None and not isinstance(group, str):
+        raise ValueError(f"rule '{name}': 'group' must be a string")
+    labels = spec.get('labels') or {}
+    if not isinstance(labels, dict):
+        raise ValueError(f"rule '{name}': 'labels' must be an object")
+    wanted = tuple((str(key), str(value)) for key, value in labels.items())
+    when = spec.get('when') or {}
+    if not isinstance(when, dict) or not all(isinstance(value, (int, float)) for value in when.values()):
+        raise ValueError(f"rule '{name}': 'when' must be an object of numbers")
+    conditions = tuple((metric, float(value)) for metric, value in when.items())
+    penalty = spec.get('penalty', 5)
+    if isinstance(penalty, dict):
+        if set(penalty) - {'warn', 'crit'} or not all(_is_number(value) for value in penalty.values()):
+            raise ValueError(f"rule '{name}': 'penalty' must be a number or an object of warn/crit numbers")
+        penalties = (0, penalty.get('warn', 0), penalty.get('crit', penalty.get('warn', 0)))
+    elif _is_number(penalty):
+        penalties = (0, penalty, penalty)
+    else:
+        raise ValueError(f"rule '{name}': 'penalty' must be a number or an object of warn/crit numbers")
+    message = spec.get('message', f"{name}: {spec['metric']} is {{stat:g}} ({{severity}}).")
+    if not isinstance(message, str):
+        raise ValueError(f"rule '{name}': 'message' must be a string")
+    try:
+        message.format_map(_TemplateProbe(severity=_SEVERITIES[1], top_cpu="", top_memory=""))
+    except (ValueError, TypeError, KeyError, IndexError, AttributeError) as e:
+        raise ValueError(f"rule '{name}': invalid message template: {e}")
+
+    # Work with "higher is worse" internally by negating levels of below-rules
+    sign = -1.0 if below else 1.0
+    thresholds = tuple(sign * level if level is not None else None for level in levels)
+
+    if stat == 'value':
+        def read(series, value, now):
+            return value
+    elif window is None:
+        percentile = float(stat[1:]) if stat.startswith('p') else None
+
+        def read(series, value, now):
+            stats = series.stats if series is not None else None
+            if stats is None or len(stats) < 2:
+                return value
+            if percentile is not None:
+                return stats.percentile(percentile)
+            return getattr(stats, stat)
+    else:
+        def read(series, value, now):
+            if series is None:
+                return value
+            values = [sample for segment in series.window(series.count_since(now - window)) for sample in segment]
+            if not values:
+                return value
+            if stat == 'ewma':
+                smoothed = values[0]
+                for sample in values[1:]:
+                    smoothed += EWMA_ALPHA * (sample - smoothed)
+                return smoothed
+            return _aggregate(values, stat)
+
+    def evaluate(store, labels, value, now, state):
+        if wanted and not all(pair in labels for pair in wanted):
+            return 0
+        for metric, expected in conditions:
+            series = store.get(metric, labels)
+            latest = series.latest() if series is not None else None
+            if latest is None or latest[1] != expected:
+                state[:] = (0, None, None, None)
+                return 0
+        current = sign * read(store.get(spec['metric'], labels), value, now)
+        state[3] = sign * current
+        level = state[0]
+        target = 0
+        for index, threshold in enumerate(thresholds, 1):
+            if threshold is None:
+                continue
+            # A level that is already active only clears once the stat falls past the hysteresis band
+            active = threshold - hysteresis if level >= index else threshold
+            if current > active:
+                target = index
+                if state[index] is None:
+                    state[index] = now
+            else:
+                state[index] = None
+        if target < level:
+            level = target
+        while target > level:
+            since = state[target]
+            if since is not None and now - since >= hold:
+                level = target
+                break
+            target -= 1
+        state[0] = level
+        return level
+
+    evaluate.name = name
+    evaluate.metric = spec['metric']
+    evaluate.labels = wanted
+    evaluate.sign = sign
+    evaluate.thresholds = thresholds
+    evaluate.penalties = penalties
+    evaluate.group = group
+    evaluate.message = message
+    return evaluate
+
+class RuleEngine:
+    """
+    Evaluates compiled alert rules against every sample a check reports.
+
+    Rules are indexed by metric name, so a sample costs one dict lookup plus the
+    rules of its metric. Each (rule, series) pair keeps its level and the time each
+    level started to hold, which implements hysteresis and "for" durations.
+    """
+    def __init__(self, rules=None):
+        self.rules = [compile_rule(spec) for spec in (DEFAULT_RULES if rules is None else rules)]
+        names = [rule.name for rule in self.rules]
+        if len(set(names)) != len(names):
+            raise ValueError("rule names must be unique")
+        self._by_metric = {}
+        for rule in self.rules:
+            self._by_metric.setdefault(rule.metric, []).append(rule)
+        self._states = {}
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Loads rules from a JSON (or, with PyYAML installed, YAML) file holding a "rules"
+        list. Rules replace the built-in ones with the same name and are added to the
+        others, unless "replace_defaults" is true.
+        """
+        with open(path, encoding='utf-8') as f:
+            if path.endswith(('.yml', '.yaml')):
+                yaml = optional_module('yaml')
+                if yaml is None:
+                    raise ValueError("reading YAML rules requires PyYAML; use a JSON file instead")
+                config = yaml.safe_load(f)
+            else:
+                config = json.load(f)
+        if not isinstance(config, dict) or not isinstance(config.get('rules', []), list):
+            raise ValueError("the rules file must hold an object with a \"rules\" list")
+        custom = config.get('rules', [])
+        if config.get('replace_defaults'):
+            return cls(custom)
+        overridden = {rule.get('name') for rule in custom if isinstance(rule, dict)}
+        return cls([rule for rule in DEFAULT_RULES if rule['name'] not in overridden] + custom)
+
+    def evaluate(self, samples, store, now=None, providers=None):
+        """
+        Returns the Alerts raised by the (name, labels, value) samples of a check.
+        """
+        now = time.time() if now is None else now
+        alerts = []
+        # Highest penalty charged so far per (group, labels)
+        charged = {}
+        for name, labels, value in samples:
+            rules = self._by_metric.get(name)
+            if rules is None or value is None:
+                continue
+            for rule in rules:
+                key = (rule.name, labels)
+                state = self._states.get(key)
+                if state is None:
+                    # [level, time warn started to hold, time crit started to hold, last stat]
+                    state = self._states[key] = [0, None, None, None]
+                level = rule(store, labels, value, now, state)
+                if level:
+                    penalty = rule.penalties[level]
+                    if rule.group is not None:
+                        # Only the part above what the group already charged counts
+                        already = charged.get((rule.group, labels), 0)
+                        charged[(rule.group, labels)] = max(already, penalty)
+                        penalty = max(penalty - already, 0)
+                    fields = _AlertFields(providers or {}, value=value, stat=state[3],
+                                          severity=_SEVERITIES[level], **dict(labels))
+                    alerts.append(Alert(rule.message.format_map(fields), penalty, _SEVERITIES[level]))
+        return alerts
+
+    def state_keys(self, series):
+        """
+        Yields the keys of the per-series state kept for the (name, labels) series.
+        """
+        for name, labels in series:
+            for rule in self._by_metric.get(name, ()):
+                yield rule.name, labels
+
+    def forget(self, series):
+        """
+        Drops the alert state of the (name, labels) series, e.g. once they expired.
+        """
+        for key in self.state_keys(series):
+            self._states.pop(key, None)
+
+    def rules_for(self, samples):
+        """
+        Yields a (rule, labels, value) triple for every rule that applies to one of the
+        (name, labels, value) samples of a check.
+        """
+        for name, labels, value in samples:
+            if value is None:
+                continue
+            for rule in self._by_metric.get(name, ()):
+                if all(pair in labels for pair in rule.labels):
+                    yield rule, labels, value
+
+class HealthScoreModel:
+    """
+    Turns the penalty points of check results into per-subsystem sub-scores and an
+    overall health score.
+
+    Each subsystem keeps an exponentially time-decayed penalty that moves towards the
+    penalty of its newest result with the given half-life. A single bad sample only
+    dents the score, while a lasting problem converges to its full penalty. The score
+    is 100 minus the weighted sum of these penalties. It is updated in O(1) per result
+    and can be recomputed by replaying the (subsystem, penalty, timestamp) updates. A
+    half-life of 0 disables the decay: every subsystem then counts its latest penalty.
+
+    Other models can be passed to SystemHealthMonitor if they provide update(),
+    score and sub_scores().
+    """
+    def __init__(self, weights=None, half_life=SCORE_HALF_LIFE):
+        self.weights = dict(SCORE_WEIGHTS, **(weights or {}))
+        self.half_life = half_life
+        self._penalties = {}
+
+    def update(self, subsystem, penalty, timestamp=None):
+        """
+        Accounts for the penalty of a subsystem's newest result and returns the score.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        state = self._penalties.get(subsystem)
+        if state is None or self.half_life <= 0:
+            decayed = float(penalty)
+        else:
+            previous, last = state
+            decayed = penalty + (previous - penalty) * 0.5 ** (max(timestamp - last, 0.0) / self.half_life)
+        self._penalties[subsystem] = (decayed, timestamp)
+        return self.score
+
+    @property
+    def score(self):
+        weighted = sum(self.weights.get(name, 1.0) * penalty for name, (penalty, _) in self._penalties.items())
+        return min(max(100.0 - weighted, 0.0), 100.0)
+
+    def sub_scores(self):
+        """
+        Returns {subsystem: sub-score} for every subsystem that reported a result.
+        """
+        return {name: max(100.0 - penalty, 0.0) for name, (penalty, _) in self._penalties.items()}
+
+_CHECK_BUCKETS_NS = [int(bound * 1e9) for bound in CHECK_DURATION_BUCKETS]
+
+class CheckStats:
+    """
+    Duration histogram and outcome counters of one check.
+    """
+    __slots__ = ('buckets', 'count', 'total_ns', 'max_ns', 'errors', 'exceptions', 'timeouts', 'recent')
+
+    def __init__(self):
+        self.buckets = [0] * (len(_CHECK_BUCKETS_NS) + 1)
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.errors = 0
+        self.exceptions = 0
+        self.timeouts = 0
+        self.recent = deque(maxlen=CHECK_DURATION_WINDOW)
 
-# We'll use these libraries for system information
-REQUIRED_LIBRARIES = ['psutil', 'GPUtil', 'colorama', 'wmi', 'platform']
+    def observe(self, duration_ns):
+        self.buckets[bisect_left(_CHECK_BUCKETS_NS, duration_ns)] += 1
+        self.count += 1
+        self.total_ns += duration_ns
+        self.max_ns = max(self.max_ns, duration_ns)
+        self.recent.append(duration_ns)
 
-try:
-    for lib in REQUIRED_LIBRARIES:
-        install_and_import(lib)
-    import psutil
-    import GPUtil
-    from colorama import Fore, Style
-    import wmi
-    # Add a fallback for GPUtil on non-Windows systems
-    if platform.system() != 'Windows' and 'wmi' in sys.modules:
-        del sys.modules['wmi']
-except ImportError as e:
-    print(f"❌ Error importing a required library: {e}. Please ensure you have pip and an internet connection.")
-    sys.exit(1)
-except Exception as e:
-    print(f"An unexpected error occurred during library setup: {e}")
-    sys.exit(1)
-
-# Configure logging to save the report to a file
-log_file = f"system_health_report_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.log"
-logging.basicConfig(
-    filename=log_file,
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+    def summary(self):
+        """
+        Returns the counters and the duration statistics (in milliseconds) as a dict.
+        """
+        ordered = sorted(self.recent)
+        return {
+            'count': self.count,
+            'mean_ms': self.total_ns / self.count / 1e6 if self.count else None,
+            'p50_ms': interpolated_percentile(ordered, 50) / 1e6 if ordered else None,
+            'p95_ms': interpolated_percentile(ordered, 95) / 1e6 if ordered else None,
+            'max_ms': self.max_ns / 1e6,
+            'errors': self.errors,
+            'exceptions': self.exceptions,
+            'timeouts': self.timeouts,
+        }
 
-def print_section(title):
+class CheckInstrumentation:
     """
-    Prints a formatted section title to the console and log file.
+    Times every call of the wrapped checks with perf_counter_ns and counts their
+    outcomes: results carrying an error, raised exceptions and timeouts, both of the
+    check itself and of the probes within it (e.g. a hung mount).
     """
-    section_title = f"\n{Fore.CYAN}{'='*10} {title.upper()} {'='*10}{Style.RESET_ALL}"
-    print(section_title)
-    logging.info(f"--- {title} ---")
+    def __init__(self):
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def _stats(self, name):
+        with self._lock:
+            return self.stats.setdefault(name, CheckStats())
+
+    def wrap(self, check):
+        """
+        Returns `check` wrapped with the timing and outcome tracker.
+        """
+        stats = self._stats(check.__name__)
+        lock = self._lock
+
+        @functools.wraps(check)
+        def instrumented(*args, **kwargs):
+            start = time.perf_counter_ns()
+            try:
+                record = check(*args, **kwargs)
+            except Exception:
+                duration = time.perf_counter_ns() - start
+                with lock:
+                    stats.observe(duration)
+                    stats.exceptions += 1
+                raise
+            duration = time.perf_counter_ns() - start
+            with lock:
+                stats.observe(duration)
+                if record.error:
+                    stats.errors += 1
+                stats.timeouts += record.timeouts
+            return record
+        return instrumented
+
+    def timeout(self, name):
+        """
+        Counts a check that overran its timeout in a concurrent run.
+        """
+        stats = self._stats(name)
+        with self._lock:
+            stats.timeouts += 1
+
+    def summary(self):
+        """
+        Returns {check: summary} for every check that ran or timed out.
+        """
+        with self._lock:
+            return {name: stats.summary() for name, stats in self.stats.items() if stats.count or stats.timeouts}
+
+    def openmetrics(self, prefix=EXPORTER_PREFIX):
+        """
+        Returns the OpenMetrics lines of the duration histograms and outcome counters.
+        """
+        with self._lock:
+            stats = [(f'check="{_escape_label(name)}"', entry.buckets[:], entry.total_ns, entry.count,
+                      entry.errors, entry.exceptions, entry.timeouts)
+                     for name, entry in sorted(self.stats.items())]
+        family = f"{prefix}_check_duration_seconds"
+        lines = [f"# TYPE {family} histogram"]
+        for label, buckets, total_ns, count, *_ in stats:
+            cumulative = 0
+            for bound, hits in zip(CHECK_DURATION_BUCKETS, buckets):
+                cumulative += hits
+                lines.append(f'{family}_bucket{{{label},le="{bound!r}"}} {cumulative}')
+            lines.append(f'{family}_bucket{{{label},le="+Inf"}} {count}')
+            lines.append(f"{family}_sum{{{label}}} {total_ns / 1e9!r}")
+            lines.append(f"{family}_count{{{label}}} {count}")
+        for index, outcome in enumerate(('errors', 'exceptions', 'timeouts'), start=4):
+            family = f"{prefix}_check_{outcome}"
+            lines.append(f"# TYPE {family} counter")
+            lines.extend(f"{family}_total{{{entry[0]}}} {entry[index]}" for entry in stats)
+        return lines
 
 class SystemHealthMonitor:
     """
     A class to monitor and report on the health of a computer system.
     """
-    def __init__(self):
-        self.health_score = 100
-        print(f"{Fore.MAGENTA}🩺 Starting system health check...{Style.RESET_ALL}")
-        logging.info("Starting system health check...")
-        print(f"{Fore.YELLOW}{AUTHOR_INFO}{Style.RESET_ALL}")
+    def __init__(self, pipeline=None, cpu_sample_interval=CPU_SAMPLE_MIN_INTERVAL, history=None,
+                 inventory_cache=None, backend=None, mount_timeout=MOUNT_TIMEOUT, rules=None,
+                 score_model=None, gpu_backend=None, cpu_sample_window=CPU_SAMPLE_WINDOW):
+        self.score_model = score_model or HealthScoreModel()
+        self.backend = backend or PsutilBackend()
+        # Selected on the first GPU check unless given, so runs without one never load NVML
+        self.gpu_backend = gpu_backend
+        self.pipeline = pipeline or ResultPipeline([ConsoleSink(), LogSink()])
+        self.history = history if history is not None else MetricStore()
+        self.inventory_cache = inventory_cache or InventoryCache()
+        self.rules = rules or RuleEngine()
+        self._alert_fields = {
+            'top_cpu': lambda: self._top_consumer('cpu'),
+            'top_memory': lambda: self._top_consumer('memory'),
+        }
+        self.cpu_sampler = CpuSampler(cpu_sample_interval, self.backend)
+        self.cpu_sample_window = cpu_sample_window
+        self.partition_prober = PartitionProber(mount_timeout)
+        self.disk_io_sampler = DiskIoSampler(cpu_sample_interval)
+        self.disk_io_sampler.prime()
+        self.net_io_sampler = NetIoSampler(self.backend, cpu_sample_interval)
+        self.net_io_sampler.prime()
+        self.process_tracker = ProcessTracker()
+        self.cpu_sampler.prime()
+        self.instrumentation = CheckInstrumentation()
+        for check in self.checks():
+            setattr(self, check.__name__, self.instrumentation.wrap(check))
+        self.pipeline.emit(Notice("🩺 Starting system health check...", 'accent'))
+        self.pipeline.emit(Notice(AUTHOR_INFO, 'credit'))
+
+    @property
+    def health_score(self):
+        return round(self.score_model.score)
+
+    @property
+    def inventory(self):
+        """
+        The static hardware facts, collected once and shared by every check.
+        """
+        return self.inventory_cache.get()
 
     def get_system_info(self):
         """
-        Gathers and prints general system information.
+        Gathers general system information.
         """
-        print_section("System Information")
-        info = {
-            "Operating System": f"{platform.system()} {platform.release()}",
-            "Architecture": platform.machine(),
-            "Processor": platform.processor(),
-            "Hostname": platform.node(),
-            "Current Time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-        for key, value in info.items():
-            print(f"{key}: {value}")
-            logging.info(f"{key}: {value}")
+        inventory = self.inventory
+        return SystemInfo(
+            operating_system=f"{inventory.system} {inventory.release}",
+            architecture=inventory.architecture,
+            processor=inventory.processor,
+            hostname=inventory.hostname,
+            current_time=datetime.now(),
+        )
 
     def get_last_windows_update(self):
         """
-        Finds and prints the most recent Windows update information.
+        Finds the most recent Windows update information.
         This feature is exclusive to Windows.
         """
-        if platform.system() != "Windows":
-            print("❌ This feature is only available for Windows.")
-            return
+        if self.inventory.system != "Windows":
+            return WindowsUpdateInfo(supported=False)
 
-        print_section("Last Windows Update")
         try:
             result = subprocess.check_output(
                 'powershell "Get-HotFix | Sort-Object InstalledOn -Descending | Select-Object -First 1"',
@@ -109,223 +3486,182 @@ class SystemHealthMonitor:
                 text=True,
                 stderr=subprocess.STDOUT
             )
-            update_info = result.strip()
-            if update_info:
-                print(update_info)
-                logging.info(f"Last update info:\n{update_info}")
-            else:
-                print("✅ No update information found. Your system may be up-to-date.")
-                logging.info("No Windows update information found.")
+            return WindowsUpdateInfo(details=result.strip())
         except subprocess.CalledProcessError as e:
-            print(f"❌ Failed to get update info. Error: {e.output.strip()}")
-            logging.error(f"Failed to get Windows update info: {e.output.strip()}")
+            return WindowsUpdateInfo(error=e.output.strip())
         except Exception as e:
-            print(f"❌ An unexpected error occurred while getting update info: {e}")
-            logging.error(f"Failed to get Windows update info: {e}")
+            return WindowsUpdateInfo(error=str(e))
 
     def get_cpu_info(self):
         """
-        Gathers and prints detailed CPU information, including usage and temperature (if available).
+        Gathers detailed CPU information, including usage and temperature (if available).
         """
-        print_section("Processor (CPU) Information")
         try:
-            usage = psutil.cpu_percent(interval=1)
+            usage = self.cpu_sampler.sample()
             freq = psutil.cpu_freq()
-            print(f"Core Count: {psutil.cpu_count(logical=True)}")
-            print(f"Max Frequency: {freq.max:.2f} MHz")
-            print(f"Current Frequency: {freq.current:.2f} MHz")
-            print(f"CPU Usage: {usage}%")
+            inventory = self.inventory
+            info = CpuInfo(
+                core_count=inventory.cpu_count,
+                freq_max=inventory.cpu_freq_max,
+                freq_current=freq.current,
+                usage=usage,
+                per_core=list(self.cpu_sampler.per_core),
+            )
 
             # Check for CPU temperature
-            if hasattr(psutil, 'sensors_temperatures'):
-                temps = psutil.sensors_temperatures()
-                if 'coretemp' in temps:
-                    cpu_temp = temps['coretemp'][0].current
-                    print(f"CPU Temperature: {cpu_temp}°C")
-                    if cpu_temp > 85:
-                        self.health_score -= 15
-                        print(f"{Fore.RED}⚠️ WARNING: High CPU temperature detected ({cpu_temp}°C).{Style.RESET_ALL}")
-                        logging.warning(f"High CPU temperature: {cpu_temp}°C")
-                else:
-                    print("❕ CPU temperature information not available for this platform.")
-            else:
-                print("❌ psutil.sensors_temperatures() is not available on this system.")
-
-            if usage > 85:
-                self.health_score -= 10
-                print(f"{Fore.RED}⚠️ WARNING: High CPU usage detected ({usage}%).{Style.RESET_ALL}")
-                logging.warning(f"High CPU usage: {usage}%")
+            info.sensors_supported = self.backend.sensors_supported
+            info.temperature = self.backend.cpu_temperature()
+            return info
         except Exception as e:
-            print(f"❌ Failed to get CPU information: {e}")
-            logging.error(f"Failed to get CPU info: {e}")
+            return CpuInfo(error=str(e))
 
     def get_ram_info(self):
         """
-        Gathers and prints detailed RAM information.
+        Gathers detailed RAM information.
         """
-        print_section("Memory (RAM) Information")
         try:
-            mem = psutil.virtual_memory()
-            print(f"Total Memory: {mem.total / (1024**3):.2f} GB")
-            print(f"Used Memory: {mem.used / (1024**3):.2f} GB")
-            print(f"Memory Usage: {mem.percent}%")
-            if mem.percent > 85:
-                self.health_score -= 10
-                print(f"{Fore.RED}⚠️ WARNING: High RAM usage detected ({mem.percent}%).{Style.RESET_ALL}")
-                logging.warning(f"High RAM usage: {mem.percent}%")
+            total, used, percent = self.backend.virtual_memory()
+            return RamInfo(total=total, used=used, percent=percent)
         except Exception as e:
-            print(f"❌ Failed to get RAM information: {e}")
-            logging.error(f"Failed to get RAM info: {e}")
+            return RamInfo(error=str(e))
 
     def get_disk_info(self):
         """
-        Gathers and prints detailed disk partition information.
+        Gathers detailed disk partition information.
         """
-        print_section("Disk Information")
-        for partition in psutil.disk_partitions():
-            try:
-                usage = psutil.disk_usage(partition.mountpoint)
-                print(f"🔹 Drive: {partition.device}")
-                print(f"  Total Space: {usage.total / (1024**3):.2f} GB")
-                print(f"  Used Space: {usage.used / (1024**3):.2f} GB")
-                print(f"  Free Space: {usage.free / (1024**3):.2f} GB")
-                print(f"  Usage Percentage: {usage.percent}%")
-                if usage.percent > 90:
-                    self.health_score -= 10
-                    print(f"{Fore.RED}⚠️ WARNING: Drive is nearly full ({usage.percent}%).{Style.RESET_ALL}")
-                    logging.warning(f"High disk usage on {partition.device}: {usage.percent}%")
-            except PermissionError:
-                print(f"  ❌ Access denied for drive {partition.device}.")
-            except Exception as e:
-                print(f"  ❌ Failed to get disk information for {partition.device}: {e}")
-                logging.error(f"Failed to get disk info for {partition.device}: {e}")
+        info = DiskInfo()
+        errors = []
+        try:
+            info.partitions = self.partition_prober.probe()
+        except Exception as e:
+            errors.append(f"disk partitions unavailable: {e}")
+        try:
+            info.io = self.disk_io_sampler.sample()
+        except Exception as e:
+            errors.append(f"disk I/O counters unavailable: {e}")
+        info.error = "; ".join(errors) or None
+        return info
 
     def get_battery_info(self):
         """
-        Gathers and prints battery information (if available).
+        Gathers battery information (if available).
         """
-        print_section("Battery Information")
-        battery = psutil.sensors_battery()
+        try:
+            battery = psutil.sensors_battery()
+        except Exception as e:
+            return BatteryInfo(error=str(e))
         if battery:
-            print(f"Charge Level: {battery.percent}%")
-            print(f"Status: {'Plugged In' if battery.power_plugged else 'On Battery'}")
-            if battery.percent < 30 and not battery.power_plugged:
-                self.health_score -= 10
-                print(f"{Fore.RED}⚠️ WARNING: Low battery level and not plugged in.{Style.RESET_ALL}")
-                logging.warning("Low battery level and not plugged in.")
-        else:
-            print("❕ Battery information not available.")
+            return BatteryInfo(percent=battery.percent, power_plugged=battery.power_plugged)
+        return BatteryInfo()
 
     def get_gpu_info(self):
         """
-        Gathers and prints GPU information using GPUtil and WMI (as a fallback).
-        """
-        print_section("Graphics Card (GPU) Information")
-        try:
-            gpus = GPUtil.getGPUs()
-            if gpus:
-                for gpu in gpus:
-                    print(f"🔹 NVIDIA GPU: {gpu.name}")
-                    print(f"  Total Memory: {gpu.memoryTotal} MB")
-                    print(f"  Used Memory: {gpu.memoryUsed} MB")
-                    print(f"  Temperature: {gpu.temperature} °C")
-                    print(f"  Load: {gpu.load * 100:.1f}%")
-                    if gpu.load * 100 > 90 or gpu.temperature > 85:
-                        self.health_score -= 10
-                        print(f"{Fore.RED}⚠️ WARNING: High GPU temperature or load.{Style.RESET_ALL}")
-                        logging.warning("High GPU temperature or load.")
-            else:
-                print("❕ No NVIDIA GPU found using GPUtil.")
-                self._fallback_gpu_detection()
+        Gathers GPU information using the GPU backend (NVML or GPUtil) and WMI (as a fallback).
+        """
+        if self.gpu_backend is None:
+            self.gpu_backend = select_gpu_backend()
+        backend = self.gpu_backend.name
+        try:
+            devices = self.gpu_backend.devices()
+            if devices:
+                return GpuInfo(devices=devices, backend=backend)
+            return GpuInfo(fallback=self._fallback_gpu_detection(), backend=backend)
         except Exception as e:
-            print(f"❌ GPUtil failed. Error: {e}")
-            logging.error(f"GPUtil failed: {e}")
-            self._fallback_gpu_detection()
+            return GpuInfo(fallback=self._fallback_gpu_detection(), backend=backend, error=str(e))
 
     def _fallback_gpu_detection(self):
         """
-        A fallback method to detect GPUs and display info using WMI on Windows.
-        """
-        try:
-            if platform.system() == "Windows":
-                c = wmi.WMI()
-                gpu_list = c.Win32_VideoController()
-                display_list = c.Win32_DesktopMonitor()
-
-                if gpu_list:
-                    print("🔍 Identified Graphics Cards:")
-                    for gpu in gpu_list:
-                        print(f"  - {gpu.Name}")
-                        print(f"    Driver Version: {gpu.DriverVersion}")
-                        
-                if display_list:
-                    print("🔍 Connected Displays:")
-                    for monitor in display_list:
-                        print(f"  - {monitor.Name}")
-                        print(f"    Resolution: {monitor.ScreenWidth}x{monitor.ScreenHeight}")
-                
-                if not gpu_list and not display_list:
-                    print("🔍 No graphics cards or displays identified via WMI.")
-            else:
-                print("🔍 WMI is only available on Windows. No fallback detection available.")
+        A fallback method to detect GPUs and displays using WMI on Windows.
+        """
+        inventory = self.inventory
+        if inventory.system != "Windows":
+            return DisplayAdapters(supported=False)
+        if inventory.wmi_error:
+            return DisplayAdapters(error=inventory.wmi_error)
+        return DisplayAdapters(adapters=inventory.adapters, displays=inventory.displays)
+
+    def get_process_info(self):
+        """
+        Gathers the top resource consumers from the process table.
+        """
+        try:
+            top_cpu, top_memory, top_io = self.process_tracker.top()
+            return ProcessInfo(
+                process_count=self.process_tracker.process_count,
+                top_cpu=top_cpu,
+                top_memory=top_memory,
+                top_io=top_io,
+            )
         except Exception as e:
-            print(f"❌ GPU or display detection via WMI failed. Error: {e}")
+            return ProcessInfo(error=str(e))
+
+    def _top_consumer(self, by):
+        """
+        Describes the process using the most CPU ('cpu') or memory ('memory') in the
+        last process scan; alert messages never trigger a scan of their own.
+        """
+        try:
+            top_cpu, top_memory, _ = self.process_tracker.top(1, rescan=False)
+        except Exception:
+            return ""
+        if by == 'cpu' and top_cpu:
+            pid, name, cpu_percent, _, _ = top_cpu[0]
+            return f" Top consumer: {name} (PID {pid}, {cpu_percent}% CPU)."
+        if by == 'memory' and top_memory:
+            pid, name, _, rss, _ = top_memory[0]
+            return f" Top consumer: {name} (PID {pid}, {rss / (1024**3):.2f} GB)."
+        return ""
 
     def get_network_info(self):
         """
-        Gathers and prints network interface information.
+        Gathers network interface information.
         """
-        print_section("Network Information")
         try:
-            net = psutil.net_if_addrs()
-            for interface, addresses in net.items():
-                print(f"🔹 Interface: {interface}")
+            info = NetworkInfo()
+            rates = self.net_io_sampler.sample()
+            counters = self.net_io_sampler.counters
+            for interface, addresses in psutil.net_if_addrs().items():
+                entry = InterfaceInfo(interface, traffic=rates.get(interface))
+                if interface in counters:
+                    entry.bytes_sent, entry.bytes_recv = counters[interface][:2]
                 for addr in addresses:
                     if addr.family == -1:
-                        print(f"  MAC Address: {addr.address}")
+                        entry.mac = addr.address
                     elif addr.family == socket.AF_INET:
-                        print(f"  IP Address: {addr.address}")
+                        entry.ipv4.append(addr.address)
+                info.interfaces.append(entry)
+            return info
         except Exception as e:
-            print(f"❌ Failed to get network information: {e}")
-            logging.error(f"Failed to get network info: {e}")
+            return NetworkInfo(error=str(e))
 
     def get_advanced_hardware_info(self):
         """
-        Gathers and prints detailed motherboard and BIOS information.
+        Gathers detailed motherboard and BIOS information.
         """
-        if platform.system() != "Windows":
-            print_section("Advanced Hardware Information")
-            print("❌ This feature is only available for Windows.")
-            return
-            
-        print_section("Advanced Hardware Information")
-        try:
-            c = wmi.WMI()
-            
-            # Get Motherboard info
-            motherboard_info = c.Win32_BaseBoard()[0]
-            print(f"Motherboard Manufacturer: {motherboard_info.Manufacturer}")
-            print(f"Motherboard Model: {motherboard_info.Product}")
-            
-            # Get BIOS info
-            bios_info = c.Win32_BIOS()[0]
-            print(f"BIOS Manufacturer: {bios_info.Manufacturer}")
-            print(f"BIOS Version: {bios_info.SMBIOSBIOSVersion}")
-            
-        except Exception as e:
-            print(f"❌ Failed to get advanced hardware information: {e}")
-            logging.error(f"Failed to get advanced hardware info: {e}")
+        inventory = self.inventory
+        if inventory.system != "Windows":
+            return HardwareInfo(supported=False)
+        if inventory.wmi_error:
+            return HardwareInfo(error=inventory.wmi_error)
+        return HardwareInfo(
+            board_manufacturer=inventory.board_manufacturer,
+            board_model=inventory.board_model,
+            bios_manufacturer=inventory.bios_manufacturer,
+            bios_version=inventory.bios_version,
+        )
 
     def check_upgrade_compatibility(self):
         """
         Checks if the system meets the minimum requirements to upgrade to a newer Windows version.
         """
-        if platform.system() != "Windows":
-            print_section("Windows Upgrade Compatibility")
-            print("❌ This check is only applicable for Windows operating systems.")
-            return
+        inventory = self.inventory
+        if inventory.system != "Windows":
+            return UpgradeCompatibility(
+                notice="❌ This check is only applicable for Windows operating systems.",
+                notice_tone='fail',
+            )
 
-        current_version = platform.release()
+        current_version = inventory.release
         current_version_major = int(current_version.split('.')[0])
         upgrade_target = None
         upgrade_requirements = {}
@@ -348,12 +3684,13 @@ class SystemHealthMonitor:
             }
         elif current_version_major == 10: # This covers both Windows 10 and 11
             # Check if it's Windows 10 or 11 based on build number
-            build_number = int(platform.version().split('.')[2])
+            build_number = int(inventory.version.split('.')[2])
             if build_number >= 22000:
-                print_section("Windows Upgrade Compatibility")
-                print(f"{Fore.GREEN}✅ Your system is already running Windows 11 or a newer version. No upgrade check needed.{Style.RESET_ALL}")
-                return
-            
+                return UpgradeCompatibility(
+                    notice="✅ Your system is already running Windows 11 or a newer version. No upgrade check needed.",
+                    notice_tone='ok',
+                )
+
             upgrade_target = "Windows 11"
             upgrade_requirements = {
                 "CPU_CORES": 2,
@@ -364,125 +3701,1107 @@ class SystemHealthMonitor:
                 "SECURE_BOOT": True
             }
         else:
-            print_section("Windows Upgrade Compatibility")
-            print(f"❕ No specific upgrade path is defined for your current OS version: {current_version}.")
-            return
+            return UpgradeCompatibility(
+                notice=f"❕ No specific upgrade path is defined for your current OS version: {current_version}."
+            )
 
-        print_section(f"Upgrade Compatibility Check for {upgrade_target}")
-        compatible = True
+        result = UpgradeCompatibility(target=upgrade_target)
+        checks = result.requirements
 
         # Check CPU
         try:
-            cpu_cores = psutil.cpu_count(logical=True)
+            cpu_cores = inventory.cpu_count
+            # The current frequency changes all the time, so it is not part of the inventory
             cpu_freq = psutil.cpu_freq().current
-            print(f"CPU Cores: {cpu_cores} (Required: {upgrade_requirements['CPU_CORES']}+)")
-            print(f"CPU Frequency: {cpu_freq:.2f} MHz (Required: {upgrade_requirements['CPU_FREQ']}+ MHz)")
-            if cpu_cores < upgrade_requirements['CPU_CORES'] or cpu_freq < upgrade_requirements['CPU_FREQ']:
-                print(f"{Fore.RED}❌ FAILED: Processor does not meet minimum requirements.{Style.RESET_ALL}")
-                compatible = False
-            else:
-                print(f"{Fore.GREEN}✅ PASSED: Processor meets minimum requirements.{Style.RESET_ALL}")
+            passed = cpu_cores >= upgrade_requirements['CPU_CORES'] and cpu_freq >= upgrade_requirements['CPU_FREQ']
+            checks.append(RequirementCheck(
+                passed,
+                "Processor meets minimum requirements." if passed else "Processor does not meet minimum requirements.",
+                [
+                    f"CPU Cores: {cpu_cores} (Required: {upgrade_requirements['CPU_CORES']}+)",
+                    f"CPU Frequency: {cpu_freq:.2f} MHz (Required: {upgrade_requirements['CPU_FREQ']}+ MHz)",
+                ],
+            ))
         except Exception:
-            print(f"{Fore.RED}❌ FAILED: Could not check processor info.{Style.RESET_ALL}")
-            compatible = False
+            checks.append(RequirementCheck(False, "Could not check processor info."))
 
         # Check RAM
         try:
-            ram_gb = psutil.virtual_memory().total / (1024**3)
-            print(f"Total RAM: {ram_gb:.2f} GB (Required: {upgrade_requirements['RAM_GB']}+ GB)")
-            if ram_gb < upgrade_requirements['RAM_GB']:
-                print(f"{Fore.RED}❌ FAILED: Insufficient RAM.{Style.RESET_ALL}")
-                compatible = False
-            else:
-                print(f"{Fore.GREEN}✅ PASSED: RAM meets minimum requirements.{Style.RESET_ALL}")
+            ram_gb = inventory.total_memory / (1024**3)
+            passed = ram_gb >= upgrade_requirements['RAM_GB']
+            checks.append(RequirementCheck(
+                passed,
+                "RAM meets minimum requirements." if passed else "Insufficient RAM.",
+                [f"Total RAM: {ram_gb:.2f} GB (Required: {upgrade_requirements['RAM_GB']}+ GB)"],
+            ))
         except Exception:
-            print(f"{Fore.RED}❌ FAILED: Could not check RAM info.{Style.RESET_ALL}")
-            compatible = False
+            checks.append(RequirementCheck(False, "Could not check RAM info."))
 
         # Check Storage
         try:
-            disk_usage = psutil.disk_usage('C:\\')
-            disk_gb = disk_usage.total / (1024**3)
-            print(f"System Drive Storage: {disk_gb:.2f} GB (Required: {upgrade_requirements['DISK_GB']}+ GB)")
-            if disk_gb < upgrade_requirements['DISK_GB']:
-                print(f"{Fore.RED}❌ FAILED: Insufficient storage on system drive.{Style.RESET_ALL}")
-                compatible = False
-            else:
-                print(f"{Fore.GREEN}✅ PASSED: Storage meets minimum requirements.{Style.RESET_ALL}")
+            disk_gb = inventory.system_drive_total / (1024**3)
+            passed = disk_gb >= upgrade_requirements['DISK_GB']
+            checks.append(RequirementCheck(
+                passed,
+                "Storage meets minimum requirements." if passed else "Insufficient storage on system drive.",
+                [f"System Drive Storage: {disk_gb:.2f} GB (Required: {upgrade_requirements['DISK_GB']}+ GB)"],
+            ))
         except Exception:
-            print(f"{Fore.RED}❌ FAILED: Could not check storage info.{Style.RESET_ALL}")
-            compatible = False
-            
+            checks.append(RequirementCheck(False, "Could not check storage info."))
+
         # Check TPM and Secure Boot for Windows 11 only
         if upgrade_target == "Windows 11":
             try:
-                c = wmi.WMI()
+                if inventory.wmi_error or inventory.security_error:
+                    raise RuntimeError(inventory.wmi_error or inventory.security_error)
                 # Check Secure Boot
-                secure_boot = c.Win32_OperatingSystem()[0].SecureBoot
-                print(f"Secure Boot: {'Enabled' if secure_boot else 'Disabled'} (Required: Enabled)")
-                if not secure_boot:
-                    print(f"{Fore.RED}❌ FAILED: Secure Boot is not enabled.{Style.RESET_ALL}")
-                    compatible = False
-                else:
-                    print(f"{Fore.GREEN}✅ PASSED: Secure Boot is enabled.{Style.RESET_ALL}")
+                secure_boot = inventory.secure_boot
+                checks.append(RequirementCheck(
+                    bool(secure_boot),
+                    "Secure Boot is enabled." if secure_boot else "Secure Boot is not enabled.",
+                    [f"Secure Boot: {'Enabled' if secure_boot else 'Disabled'} (Required: Enabled)"],
+                ))
 
                 # Check TPM 2.0
-                tpm_status = c.Win32_Tpm()[0]
-                tpm_version = tpm_status.SpecVersion
+                tpm_version = inventory.tpm_version
                 is_tpm_2_0 = '2.0' in tpm_version if tpm_version else False
-                
-                print(f"TPM Version: {tpm_version} (Required: 2.0)")
-                if not is_tpm_2_0:
-                    print(f"{Fore.RED}❌ FAILED: TPM 2.0 is not detected or enabled.{Style.RESET_ALL}")
-                    compatible = False
-                else:
-                    print(f"{Fore.GREEN}✅ PASSED: TPM 2.0 is detected.{Style.RESET_ALL}")
+                checks.append(RequirementCheck(
+                    is_tpm_2_0,
+                    "TPM 2.0 is detected." if is_tpm_2_0 else "TPM 2.0 is not detected or enabled.",
+                    [f"TPM Version: {tpm_version} (Required: 2.0)"],
+                ))
             except Exception as e:
-                print(f"{Fore.RED}❌ FAILED: An error occurred while checking TPM/Secure Boot: {e}{Style.RESET_ALL}")
-                compatible = False
-                
-        # Final result
-        print("\n" + "="*30)
-        if compatible:
-            print(f"{Fore.GREEN}✅ Your PC can be upgraded to {upgrade_target}.{Style.RESET_ALL}")
+                checks.append(RequirementCheck(False, f"An error occurred while checking TPM/Secure Boot: {e}"))
+
+        return result
+
+    def assess(self, record):
+        """
+        Attaches the alerts the rule engine raises for a check result and returns their
+        total penalty.
+        """
+        record.alerts.extend(self.rules.evaluate(record.metrics(), self.history, providers=self._alert_fields))
+        return sum(alert.penalty for alert in record.alerts)
+
+    def observe(self, record):
+        """
+        Stores the metrics of a check result in the history and assesses it.
+        Returns the total penalty of its alerts.
+        """
+        self.history.ingest(record)
+        return self.assess(record)
+
+    def submit(self, record, pipeline=None):
+        """
+        Observes a check result, updates the score model and hands it to the sinks.
+        """
+        self.score_model.update(record.SUBSYSTEM, self.observe(record))
+        (pipeline or self.pipeline).emit(record)
+        return record
+
+    def run_check(self, check):
+        """
+        Runs a check and returns its result, or a CheckFailure when it raises; the
+        instrumentation has already counted the exception.
+        """
+        try:
+            return check()
+        except Exception as e:
+            return CheckFailure(check=check.__name__, error=str(e))
+
+    def checks(self):
+        """
+        Returns the independent checks of a full run, in report order.
+        """
+        return [
+            self.get_system_info,
+            self.get_last_windows_update,
+            self.get_cpu_info,
+            self.get_ram_info,
+            self.get_process_info,
+            self.get_disk_info,
+            self.get_battery_info,
+            self.get_gpu_info,
+            self.get_network_info,
+            self.get_advanced_hardware_info,
+            self.check_upgrade_compatibility,
+        ]
+
+    def run_all_checks(self, concurrent=False, max_workers=MAX_CHECK_WORKERS, timeout=CHECK_TIMEOUT):
+        """
+        Runs all system health checks, sequentially or on a bounded thread pool.
+        """
+        # Sampled before the first check, and before any worker starts, so the
+        # monitor's own work is not measured as system load
+        self.cpu_sampler.measure(self.cpu_sample_window)
+        if concurrent:
+            records = self._run_checks_concurrently(max_workers, timeout)
         else:
-            print(f"{Fore.RED}❌ Your PC does not meet the minimum requirements for {upgrade_target}.{Style.RESET_ALL}")
-        print("="*30)
-        logging.info(f"Upgrade compatibility for {upgrade_target} Result: {'Compatible' if compatible else 'Not Compatible'}")
-    
-    def run_all_checks(self):
-        """
-        Runs all system health checks sequentially.
-        """
-        self.get_system_info()
-        self.get_last_windows_update()
-        self.get_cpu_info()
-        self.get_ram_info()
-        self.get_disk_info()
-        self.get_battery_info()
-        self.get_gpu_info()
-        self.get_network_info()
-        self.get_advanced_hardware_info()
-        self.check_upgrade_compatibility()
+            records = (self.run_check(check) for check in self.checks())
+        for record in records:
+            self.submit(record)
         self.show_health_report()
         logging.info("System health check finished.")
 
+    def _run_checks_concurrently(self, max_workers, timeout):
+        """
+        Runs every check on a thread pool and yields their results in report order.
+
+        Each check gets `timeout` seconds from the moment a worker picks it up; checks
+        that overrun are reported as a CheckTimeout. The CPU usage must be measured
+        before the call (see CpuSampler.measure()): a window overlapping the other
+        checks would report the monitor's own load.
+        """
+        checks = self.checks()
+        pool = DaemonThreadPool(min(max_workers, len(checks)), name="check")
+        started = {}
+
+        def run(index, check):
+            started[index] = time.monotonic()
+            return check()
+
+        futures = [pool.submit(run, index, check) for index, check in enumerate(checks)]
+        for index, future in enumerate(futures):
+            while True:
+                now = time.monotonic()
+                # Queued checks have not started their clock yet
+                remaining = started[index] + timeout - now if index in started else timeout
+                try:
+                    yield future.result(timeout=max(remaining, 0))
+                    break
+                except FutureTimeoutError:
+                    if index in started and time.monotonic() >= started[index] + timeout:
+                        pool.abandon_worker()
+                        self.instrumentation.timeout(checks[index].__name__)
+                        yield CheckTimeout(check=checks[index].__name__, timeout=timeout)
+                        break
+                except Exception as e:
+                    yield CheckFailure(check=checks[index].__name__, error=str(e))
+                    break
+
+    def get_health_report(self):
+        """
+        Returns the final system health report.
+        """
+        report = HealthReport(score=self.health_score, sub_scores=self.score_model.sub_scores(),
+                              checks=self.instrumentation.summary())
+        for name, label in TREND_METRICS.items():
+            for labels, series in self.history.find(name):
+                if series.stats is not None and len(series.stats) > 1:
+                    suffix = f" ({', '.join(value for _, value in labels)})" if labels else ""
+                    report.trends.append((label + suffix, series.stats.summary()))
+        return report
+
     def show_health_report(self):
         """
-        Prints the final system health report and score.
+        Hands the final system health report and score to the sinks.
         """
-        print_section("System Health Report")
-        color = Fore.GREEN if self.health_score >= 80 else Fore.YELLOW if self.health_score >= 50 else Fore.RED
-        message = (
-            "✅ The system is in good condition." if self.health_score >= 80
-            else "⚠️ Some areas need attention." if self.health_score >= 50
-            else "❌ The system is in poor condition. Professional inspection is recommended."
-        )
-        report_line = f"{color}🩺 System Health Score: {self.health_score}%{Style.RESET_ALL}"
-        print(report_line)
-        print(message)
-        logging.info(f"Final health score: {self.health_score}% - {message}")
+        record = self.get_health_report()
+        self.pipeline.emit(record)
+        return record
+
+def _escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def render_openmetrics(store, gauges=None, instrumentation=None):
+    """
+    Renders the latest sample of every series in a MetricStore, plus extra
+    {name: value} gauges and the check instrumentation, in the OpenMetrics text format.
+    """
+    families = {}
+    for (name, labels), series in store.series.items():
+        latest = series.latest()
+        if latest is not None:
+            families.setdefault(name, []).append((labels, latest[1]))
+    for name, value in (gauges or {}).items():
+        if value is not None:
+            families.setdefault(name, []).append(((), value))
+
+    lines = []
+    for name in sorted(families):
+        family = f"{EXPORTER_PREFIX}_{name.replace('.', '_')}"
+        counter = name in EXPORTER_COUNTERS
+        lines.append(f"# TYPE {family} {'counter' if counter else 'gauge'}")
+        sample_name = f"{family}_total" if counter else family
+        for labels, value in families[name]:
+            if labels:
+                label_text = ",".join(f'{key}="{_escape_label(str(val))}"' for key, val in labels)
+                lines.append(f"{sample_name}{{{label_text}}} {value!r}")
+            else:
+                lines.append(f"{sample_name} {value!r}")
+    if instrumentation is not None:
+        lines.extend(instrumentation.openmetrics())
+    lines.append("# EOF\n")
+    return "\n".join(lines).encode('utf-8')
+
+class MetricsExporter:
+    """
+    Serves the sampled metrics at /metrics for Prometheus in the OpenMetrics format.
+
+    The response body is rendered by refresh(), once per daemon tick, into a bytes
+    buffer; a scrape only writes that buffer out and never triggers a collection.
+    """
+    CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+    def __init__(self, host="127.0.0.1", port=METRICS_PORT):
+        exporter = self
+        self._body = b"# EOF\n"
+        self.gauges = {}
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = exporter._body
+                self.send_response(200)
+                self.send_header("Content-Type", exporter.CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, name="metrics-exporter", daemon=True)
+
+    @property
+    def address(self):
+        return self.server.server_address
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def refresh(self, monitor):
+        """
+        Re-renders the response body from the monitor's history, health score and the
+        extra {name: callable} gauges.
+        """
+        gauges = {name: read() for name, read in self.gauges.items()}
+        gauges['score'] = monitor.health_score
+        for name, score in monitor.score_model.sub_scores().items():
+            gauges[f'score.{name}'] = score
+        self._body = render_openmetrics(monitor.history, gauges, monitor.instrumentation)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def fleet_snapshot(monitor, host=None):
+    """
+    Returns the JSON-serializable snapshot an agent sends to the fleet aggregator: the
+    health score and the latest value of every trend metric, taking the worst (highest)
+    value when a metric has several series (e.g. one per disk).
+    """
+    metrics = {}
+    for name in TREND_METRICS:
+        for _, series in monitor.history.find(name):
+            latest = series.latest()
+            if latest is not None and (name not in metrics or latest[1] > metrics[name]):
+                metrics[name] = latest[1]
+    return {
+        'host': host or socket.gethostname(),
+        'timestamp': time.time(),
+        'score': monitor.health_score,
+        'metrics': metrics,
+    }
+
+class FleetReporter:
+    """
+    Daemon tick hook that sends a fleet snapshot to an aggregator every `interval` seconds.
+
+    Snapshots are posted by a background thread so a slow or unreachable aggregator
+    never delays sampling; only the newest unsent snapshot is kept.
+    """
+    def __init__(self, url, interval=FLEET_REPORT_INTERVAL, host=None, timeout=5):
+        parts = urlsplit(url)
+        if parts.scheme != 'http' or not parts.hostname:
+            raise ValueError(f"invalid aggregator URL '{url}', expected http://HOST:PORT")
+        self.address = (parts.hostname, parts.port or FLEET_PORT)
+        self.path = (parts.path.rstrip('/') or '') + '/ingest'
+        self.interval = interval
+        self.host = host
+        self.timeout = timeout
+        self.sent = 0
+        self.failed = 0
+        self._due = time.monotonic()
+        self._pending = queue.Queue(maxsize=1)
+        self._thread = threading.Thread(target=self._send_loop, name="fleet-reporter", daemon=True)
+        self._thread.start()
+
+    def __call__(self, monitor):
+        now = time.monotonic()
+        if now < self._due:
+            return
+        self._due += self.interval
+        if self._due <= now:
+            self._due = now + self.interval
+        body = json.dumps(fleet_snapshot(monitor, self.host)).encode('utf-8')
+        try:
+            self._pending.put_nowait(body)
+        except queue.Full:
+            # The previous snapshot is still unsent; replace it with the newer one
+            try:
+                self._pending.get_nowait()
+            except queue.Empty:
+                pass
+            self._pending.put_nowait(body)
+
+    def _send_loop(self):
+        healthy = True
+        while True:
+            body = self._pending.get()
+            if body is None:
+                return
+            try:
+                self._post(body)
+                self.sent += 1
+                if not healthy:
+                    logging.info(f"Fleet aggregator at {self.address[0]}:{self.address[1]} is reachable again.")
+                healthy = True
+            except (OSError, http.client.HTTPException) as e:
+                self.failed += 1
+                if healthy:
+                    logging.warning(f"Could not send a snapshot to the fleet aggregator: {e}")
+                healthy = False
+
+    def _post(self, body):
+        connection = http.client.HTTPConnection(*self.address, timeout=self.timeout)
+        try:
+            connection.request('POST', self.path, body, {'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 300:
+                raise http.client.HTTPException(f"HTTP {response.status} {response.reason}")
+        finally:
+            connection.close()
+
+    def close(self):
+        try:
+            self._pending.put_nowait(None)
+        except queue.Full:
+            self._pending.get_nowait()
+            self._pending.put_nowait(None)
+        self._thread.join(self.timeout)
+
+class SnapshotRecorder:
+    """
+    Daemon tick hook that writes the health score and the latest value of every metric
+    series to a SnapshotWriter every `interval` seconds, and feeds the optional
+    SnapshotCompactor maintaining the rollup tiers.
+    """
+    def __init__(self, writer, interval=SNAPSHOT_INTERVAL, compactor=None):
+        self.writer = writer
+        self.interval = interval
+        self.compactor = compactor
+        self._due = time.monotonic()
+        self._columns = ()
+        self._series = ()
+        self._generation = None
+
+    def __call__(self, monitor):
+        now = time.monotonic()
+        if now < self._due:
+            return
+        self._due += self.interval
+        if self._due <= now:
+            self._due = now + self.interval
+        self.record(monitor)
+
+    def record(self, monitor, timestamp=None):
+        """
+        Writes one snapshot of the monitor right away.
+        """
+        history = monitor.history
+        store = history.series
+        if history.generation != self._generation:
+            self._generation = history.generation
+            self._series = tuple(store.values())
+            self._columns = (('score', ()),) + tuple(store)
+        values = [monitor.health_score]
+        for series in self._series:
+            latest = series.latest()
+            values.append(latest[1] if latest is not None else None)
+        timestamp = time.time() if timestamp is None else timestamp
+        self.writer.append(timestamp, self._columns, values)
+        if self.compactor is not None:
+            self.compactor.add(timestamp, self._columns, values)
+
+    def close(self):
+        self.writer.close()
+        if self.compactor is not None:
+            self.compactor.close()
+
+class FleetHost:
+    """
+    The time series and latest snapshot of a single host of the fleet.
+    """
+    __slots__ = ('store', 'score', 'latest', 'last_seen')
+
+    def __init__(self, capacity):
+        self.store = MetricStore(capacity, stats_window=0)
+        self.score = None
+        self.latest = {}
+        self.last_seen = 0.0
+
+class FleetAggregator:
+    """
+    Merges the snapshots sent by many agents into per-host time series and computes
+    fleet-wide percentiles and the hosts with the lowest health score.
+
+    Ingesting a snapshot appends one sample per metric to preallocated ring buffers;
+    the fleet summary sorts one value per host and metric, so thousands of hosts at
+    a 10 s cadence cost a few milliseconds per summary.
+    """
+    def __init__(self, capacity=FLEET_HISTORY_CAPACITY, stale_after=FLEET_STALE_AFTER):
+        self.capacity = capacity
+        self.stale_after = stale_after
+        self.hosts = {}
+        self._lock = threading.Lock()
+
+    def ingest(self, snapshot):
+        """
+        Stores a snapshot; raises ValueError when it is malformed.
+        """
+        if not isinstance(snapshot, dict):
+            raise ValueError("snapshot must be a JSON object")
+        name = snapshot.get('host')
+        score = snapshot.get('score')
+        metrics = snapshot.get('metrics', {})
+        timestamp = snapshot.get('timestamp')
+        if not isinstance(name, str) or not name:
+            raise ValueError("snapshot has no host name")
+        if not isinstance(score, (int, float)) or isinstance(score, bool):
+            raise ValueError("snapshot has no numeric score")
+        if not isinstance(metrics, dict):
+            raise ValueError("snapshot metrics must be an object")
+        received = time.time()
+        if not isinstance(timestamp, (int, float)):
+            timestamp = received
+        values = {}
+        for metric, value in metrics.items():
+            if metric in TREND_METRICS and isinstance(value, (int, float)) and not isinstance(value, bool):
+                values[metric] = float(value)
+
+        with self._lock:
+            host = self.hosts.get(name)
+            if host is None:
+                host = self.hosts[name] = FleetHost(self.capacity)
+            host.score = float(score)
+            host.latest = values
+            host.last_seen = received
+            host.store.append('score', host.score, timestamp)
+            for metric, value in values.items():
+                host.store.append(metric, value, timestamp)
+
+    def summary(self, worst=FLEET_WORST_HOSTS):
+        """
+        Returns a FleetReport over the hosts that reported within stale_after seconds.
+        """
+        now = time.time()
+        with self._lock:
+            active = [(name, host.score, host.latest, now - host.last_seen)
+                      for name, host in self.hosts.items() if now - host.last_seen <= self.stale_after]
+            stale = len(self.hosts) - len(active)
+
+        columns = {'score': [score for _, score, _, _ in active]}
+        for _, _, latest, _ in active:
+            for metric, value in latest.items():
+                columns.setdefault(metric, []).append(value)
+        report = FleetReport(hosts=len(active), stale=stale)
+        for metric in ('score', *TREND_METRICS):
+            values = columns.get(metric)
+            if values:
+                values.sort()
+                report.distributions[metric] = {
+                    'hosts': len(values),
+                    'min': values[0],
+                    'p50': interpolated_percentile(values, 50),
+                    'p90': interpolated_percentile(values, 90),
+                    'p99': interpolated_percentile(values, 99),
+                    'max': values[-1],
+                }
+        report.worst = [
+            {'host': name, 'score': score, 'age': age}
+            for name, score, _, age in heapq.nsmallest(worst, active, key=lambda host: host[1])
+        ]
+        return report
+
+    def host_history(self, name):
+        """
+        Returns {metric: [[timestamp, value], ...]} for one host, or None if it never reported.
+        """
+        with self._lock:
+            host = self.hosts.get(name)
+            if host is None:
+                return None
+            return {
+                metric: [[timestamp, value] for segments in zip(series.timestamp_window(), series.window())
+                         for timestamp, value in zip(*segments)]
+                for (metric, _), series in host.store.series.items()
+            }
+
+class FleetServer:
+    """
+    HTTP front end of a FleetAggregator.
+
+    POST /ingest accepts a JSON snapshot from an agent, GET /fleet returns the fleet
+    summary and GET /hosts/NAME the time series of one host.
+    """
+    def __init__(self, aggregator, host="127.0.0.1", port=FLEET_PORT):
+        self.aggregator = aggregator
+        server = self
+        self._stop = threading.Event()
+
+        class Handler(BaseHTTPRequestHandler):
+            timeout = FLEET_REQUEST_TIMEOUT
+
+            def do_POST(self):
+                if self.path.split('?', 1)[0] != '/ingest':
+                    self.send_error(404)
+                    return
+                try:
+                    length = int(self.headers.get('Content-Length', ''))
+                except ValueError:
+                    self.send_error(411)
+                    return
+                if length < 0:
+                    self.send_error(400, "negative Content-Length")
+                    return
+                if length > FLEET_MAX_SNAPSHOT_BYTES:
+                    self.send_error(413)
+                    return
+                try:
+                    server.aggregator.ingest(json.loads(self.rfile.read(length)))
+                except ValueError as e:
+                    self.send_error(400, str(e))
+                    return
+                self.send_response(204)
+                self.end_headers()
+
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                if path == '/fleet':
+                    self._send_json(asdict(server.aggregator.summary()))
+                elif path.startswith('/hosts/'):
+                    history = server.aggregator.host_history(unquote(path[len('/hosts/'):]))
+                    if history is None:
+                        self.send_error(404)
+                    else:
+                        self._send_json(history)
+                else:
+                    self.send_error(404)
+
+            def _send_json(self, payload):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.server.request_queue_size = 128
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fleet-server", daemon=True)
+
+    @property
+    def address(self):
+        return self.server.server_address
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, *_):
+        """
+        Asks run() to return.
+        """
+        self._stop.set()
+
+    def run(self, pipeline, interval=DAEMON_INTERVALS['report']):
+        """
+        Hands a fleet report to the pipeline every `interval` seconds until stop() is
+        called or the process is interrupted.
+        """
+        signal.signal(signal.SIGTERM, self.stop)
+        try:
+            while not self._stop.wait(interval):
+                pipeline.emit(self.aggregator.summary())
+        except KeyboardInterrupt:
+            pass
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+class AdaptiveScheduler:
+    """
+    Picks the next sampling interval of a daemon collector from its latest result.
+
+    The urgency (0 to 1) of an adaptive collector is the larger of how close its
+    metrics are to the nearest alert level and how volatile they are: the
+    exponentially weighted standard deviation of each metric, as a fraction of its
+    alert level. Urgency rises at once, decays by ADAPTIVE_DECAY per sample and maps
+    the configured interval onto [interval / range, interval * range]. Separately,
+    the process CPU time is measured every ADAPTIVE_BUDGET_WINDOW seconds; while it
+    exceeds the budget, the interval of every collector is stretched by the overrun.
+    The first window starts once every collector has run, so one-off startup work
+    (the GPU library import, the first process scan) is not counted.
+    """
+    def __init__(self, intervals, rules, cpu_budget=ADAPTIVE_CPU_BUDGET, adaptive=ADAPTIVE_COLLECTORS,
+                 interval_range=ADAPTIVE_RANGE):
+        self.base = dict(intervals)
+        self.rules = rules
+        self.cpu_budget = cpu_budget
+        self.range = interval_range
+        self.intervals = dict(intervals)
+        self.urgency = {name: 0.0 for name in adaptive if name in intervals}
+        self.throttle = 1.0
+        self.cpu_share = 0.0
+        self._moments = {}
+        self._unsampled = set(intervals)
+        self._window_start = None
+
+    def interval(self, name, record):
+        """
+        Accounts for a collector's newest result and returns its next interval.
+        """
+        self._unsampled.discard(name)
+        self._check_budget()
+        if name not in self.urgency:
+            self.intervals[name] = interval = self.base[name] * self.throttle
+            return interval
+        urgency = 0.0
+        for rule, labels, value in self.rules.rules_for(record.metrics()):
+            level = next(threshold for threshold in rule.thresholds if threshold is not None)
+            scale = max(abs(level), 1.0)
+            # Proximity: 0 at half the alert level or further away, 1 once it is reached
+            urgency = max(urgency, min(max(1 - 2 * (level - rule.sign * value) / scale, 0.0), 1.0))
+            moments = self._moments.get((rule.name, labels))
+            if moments is None:
+                self._moments[(rule.name, labels)] = [value, 0.0]
+                continue
+            difference = value - moments[0]
+            moments[0] += EWMA_ALPHA * difference
+            moments[1] = (1 - EWMA_ALPHA) * (moments[1] + EWMA_ALPHA * difference * difference)
+            urgency = max(urgency, min(moments[1] ** 0.5 / (ADAPTIVE_VOLATILITY * scale), 1.0))
+        urgency = self.urgency[name] = max(urgency, self.urgency[name] * ADAPTIVE_DECAY)
+        base = self.base[name]
+        interval = base * self.range ** (1 - 2 * urgency) * self.throttle
+        self.intervals[name] = interval = max(interval, base / self.range)
+        return interval
+
+    def forget(self, series):
+        """
+        Drops the volatility estimates of the (name, labels) series.
+        """
+        for key in self.rules.state_keys(series):
+            self._moments.pop(key, None)
+
+    def _check_budget(self):
+        now = time.monotonic()
+        cpu = time.process_time()
+        if self._window_start is None:
+            # Start measuring once every collector did its one-off startup work
+            if not self._unsampled:
+                self._window_start = (now, cpu)
+            return
+        started, cpu_started = self._window_start
+        if now - started < ADAPTIVE_BUDGET_WINDOW:
+            return
+        self.cpu_share = (cpu - cpu_started) / (now - started)
+        # Stretch the intervals by the overrun, and relax them by at most half per window
+        self.throttle = min(max(self.throttle * max(self.cpu_share / self.cpu_budget, 0.5), 1.0),
+                            self.range * self.range)
+        self._window_start = (now, cpu)
+
+class MonitorDaemon:
+    """
+    Keeps a SystemHealthMonitor running and re-samples each collector on its own interval.
+
+    Static facts (system, hardware and upgrade information) are collected once at
+    startup. Volatile metrics are sampled on a drift-free schedule: every deadline is
+    derived from the previous one rather than from the time a sample finished, and
+    missed deadlines are skipped instead of being run in a burst. Samples go to every
+    sink except the console, which only receives the periodic health report.
+
+    Tick hooks are called with the monitor once per scheduler tick, after every
+    collector that was due has run. With a `cpu_budget` (a fraction of one core), the
+    intervals of the CPU, RAM, disk and network collectors adapt to their results,
+    and every collector backs off while the budget is exceeded (see AdaptiveScheduler).
+    """
+    def __init__(self, monitor, intervals=None, tick_hooks=(), cpu_budget=None):
+        self.monitor = monitor
+        self.tick_hooks = list(tick_hooks)
+        self.intervals = dict(DAEMON_INTERVALS, **(intervals or {}))
+        self.collectors = {
+            'cpu': monitor.get_cpu_info,
+            'ram': monitor.get_ram_info,
+            'network': monitor.get_network_info,
+            'gpu': monitor.get_gpu_info,
+            'battery': monitor.get_battery_info,
+            'disk': monitor.get_disk_info,
+            'processes': monitor.get_process_info,
+        }
+        self.scheduler = None
+        if cpu_budget is not None:
+            self.scheduler = AdaptiveScheduler({name: self.intervals[name] for name in self.collectors},
+                                               monitor.rules, cpu_budget)
+        self.sample_pipeline = monitor.pipeline.without(ConsoleSink)
+        self._stop = threading.Event()
+
+    def stop(self, *_):
+        """
+        Asks the scheduler loop to exit after the current sample.
+        """
+        self._stop.set()
+
+    def collect_static(self):
+        """
+        Collects the facts that do not change while the process runs.
+        """
+        monitor = self.monitor
+        for check in (monitor.get_system_info, monitor.get_last_windows_update,
+                      monitor.get_advanced_hardware_info, monitor.check_upgrade_compatibility):
+            monitor.submit(monitor.run_check(check))
+
+    def expire_series(self, now=None):
+        """
+        Drops the history series that missed SERIES_EXPIRY_INTERVALS samples of their
+        collector, e.g. those of removed or idle interfaces, along with their alert
+        and scheduler state. Returns the dropped (name, labels) keys.
+        """
+        now = time.time() if now is None else now
+        intervals = self.scheduler.intervals if self.scheduler is not None else self.intervals
+        cutoffs = {}
+        for name in self.monitor.history.series_names():
+            collector = METRIC_COLLECTORS.get(name.partition('.')[0])
+            if collector is not None:
+                cutoffs[name] = now - SERIES_EXPIRY_INTERVALS * intervals[collector]
+        expired = self.monitor.history.evict(cutoffs)
+        if expired:
+            self.monitor.rules.forget(expired)
+            if self.scheduler is not None:
+                self.scheduler.forget(expired)
+        return expired
+
+    def sample(self, name):
+        """
+        Runs one collector and refreshes the health score. A collector that raises
+        yields a CheckFailure and stays scheduled.
+        """
+        monitor = self.monitor
+        record = monitor.run_check(self.collectors[name])
+        monitor.score_model.update(record.SUBSYSTEM, monitor.observe(record))
+        self.sample_pipeline.emit(record)
+        return record
+
+    def run(self):
+        """
+        Runs the scheduler loop until stop() is called or the process is interrupted.
+        """
+        signal.signal(signal.SIGTERM, self.stop)
+        self.collect_static()
+        self.monitor.pipeline.emit(Notice("🔁 Daemon mode started. Press Ctrl+C to stop.", 'accent'))
+        logging.info(f"Daemon mode started with intervals: {self.intervals}")
+
+        start = time.monotonic()
+        schedule = [(start, name) for name in self.collectors]
+        schedule.append((start + self.intervals['report'], 'report'))
+        heapq.heapify(schedule)
+        try:
+            while not self._stop.is_set():
+                deadline, name = schedule[0]
+                delay = deadline - time.monotonic()
+                if delay > 0 and self._stop.wait(delay):
+                    break
+                interval = self.intervals[name]
+                if name == 'report':
+                    self.expire_series()
+                    self.monitor.show_health_report()
+                else:
+                    record = self.sample(name)
+                    if self.scheduler is not None and name in self.scheduler.base:
+                        interval = self.scheduler.interval(name, record)
+
+                deadline += interval
+                now = time.monotonic()
+                if deadline <= now:
+                    # Skip the deadlines missed while this sample was running
+                    deadline += interval * ((now - deadline) // interval + 1)
+                heapq.heapreplace(schedule, (deadline, name))
+                if schedule[0][0] > now:
+                    for hook in self.tick_hooks:
+                        hook(self.monitor)
+        except KeyboardInterrupt:
+            pass
+        self.monitor.pipeline.emit(Notice("⏹️ Daemon mode stopped.", 'accent'))
+
+def parse_interval(value):
+    """
+    Parses a NAME=SECONDS daemon interval override.
+    """
+    name, _, seconds = value.partition('=')
+    if name not in DAEMON_INTERVALS:
+        raise argparse.ArgumentTypeError(f"unknown collector '{name}' (choose from {', '.join(DAEMON_INTERVALS)})")
+    try:
+        seconds = float(seconds)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid interval '{value}', expected NAME=SECONDS")
+    if seconds <= 0:
+        raise argparse.ArgumentTypeError(f"interval for '{name}' must be positive")
+    return name, seconds
+
+def parse_score_weight(value):
+    """
+    Parses a SUBSYSTEM=WEIGHT health score weight override.
+    """
+    name, _, weight = value.partition('=')
+    if name not in SCORE_WEIGHTS:
+        raise argparse.ArgumentTypeError(f"unknown subsystem '{name}' (choose from {', '.join(SCORE_WEIGHTS)})")
+    try:
+        weight = float(weight)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid weight '{value}', expected SUBSYSTEM=WEIGHT")
+    if weight < 0:
+        raise argparse.ArgumentTypeError(f"weight of '{name}' must not be negative")
+    return name, weight
+
+def parse_args(argv=None):
+    """
+    Parses the command line options.
+    """
+    parser = argparse.ArgumentParser(description="Monitor and report on the health of this computer.")
+    parser.add_argument("--concurrent", action="store_true",
+                        help="run independent checks in parallel on a thread pool")
+    parser.add_argument("--workers", type=int, default=MAX_CHECK_WORKERS,
+                        help=f"maximum number of concurrent checks (default: {MAX_CHECK_WORKERS})")
+    parser.add_argument("--timeout", type=float, default=CHECK_TIMEOUT,
+                        help=f"per-check timeout in seconds for concurrent runs (default: {CHECK_TIMEOUT})")
+    parser.add_argument("--mount-timeout", type=float, default=MOUNT_TIMEOUT, metavar="SECONDS",
+                        help=f"give up on a disk partition that does not answer in time (default: {MOUNT_TIMEOUT})")
+    parser.add_argument("--daemon", action="store_true",
+                        help="keep running and re-sample the volatile metrics on a fixed schedule")
+    parser.add_argument("--interval", type=parse_interval, action="append", default=[], metavar="NAME=SECONDS",
+                        help="override a daemon sampling interval, e.g. cpu=0.25 (repeatable)")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="in daemon mode, adapt the CPU/RAM/disk/network intervals to metric volatility, "
+                             "alert proximity and --cpu-budget")
+    parser.add_argument("--cpu-budget", type=float, default=ADAPTIVE_CPU_BUDGET * 100, metavar="PERCENT",
+                        help=f"CPU share of one core the adaptive daemon may use "
+                             f"(default: {ADAPTIVE_CPU_BUDGET * 100:g})")
+    parser.add_argument("--history-capacity", type=int, default=HISTORY_CAPACITY, metavar="SAMPLES",
+                        help=f"samples kept per metric series in memory (default: {HISTORY_CAPACITY})")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help=f"serve OpenMetrics at http://HOST:PORT/metrics in daemon mode (e.g. {METRICS_PORT})")
+    parser.add_argument("--metrics-host", default="127.0.0.1",
+                        help="address the metrics endpoint listens on (default: 127.0.0.1)")
+    parser.add_argument("--snapshot-dir", metavar="DIR",
+                        help="write binary health snapshots to DIR (every --snapshot-interval in daemon mode)")
+    parser.add_argument("--snapshot-interval", type=float, default=SNAPSHOT_INTERVAL, metavar="SECONDS",
+                        help=f"seconds between two daemon snapshots (default: {SNAPSHOT_INTERVAL:g})")
+    parser.add_argument("--query", metavar="QUERY",
+                        help="query the snapshots in --snapshot-dir and exit, "
+                             "e.g. \"cpu.usage p95 last 6h by 1m\"")
+    parser.add_argument("--report-to", metavar="URL",
+                        help="in daemon mode, send health snapshots to a fleet aggregator at URL "
+                             f"(e.g. http://aggregator:{FLEET_PORT})")
+    parser.add_argument("--report-interval", type=float, default=FLEET_REPORT_INTERVAL, metavar="SECONDS",
+                        help=f"seconds between two snapshots sent with --report-to (default: {FLEET_REPORT_INTERVAL})")
+    parser.add_argument("--aggregate", action="store_true",
+                        help="run as a fleet aggregator receiving snapshots from --report-to agents")
+    parser.add_argument("--fleet-port", type=int, default=FLEET_PORT, metavar="PORT",
+                        help=f"port the fleet aggregator listens on (default: {FLEET_PORT})")
+    parser.add_argument("--fleet-host", default="127.0.0.1",
+                        help="address the fleet aggregator listens on (default: 127.0.0.1)")
+    parser.add_argument("--rules", metavar="PATH",
+                        help="load alert rules (warn/crit levels, hysteresis, for durations, windows) "
+                             "from a JSON file")
+    parser.add_argument("--score-weight", type=parse_score_weight, action="append", default=[],
+                        metavar="SUBSYSTEM=WEIGHT",
+                        help="scale the penalties of a subsystem in the health score, e.g. disk=2 (repeatable)")
+    parser.add_argument("--score-half-life", type=float, default=SCORE_HALF_LIFE, metavar="SECONDS",
+                        help="half-life of the decay of penalties in daemon mode, 0 to disable "
+                             f"(default: {SCORE_HALF_LIFE})")
+    parser.add_argument("--inventory-cache", metavar="PATH",
+                        help="persist the static hardware inventory to PATH and reuse it until reboot")
+    parser.add_argument("--inventory-ttl", type=float, default=INVENTORY_TTL, metavar="SECONDS",
+                        help=f"maximum age of a persisted inventory (default: {INVENTORY_TTL})")
+    parser.add_argument("--backend", choices=("psutil", "procfs", "auto"), default="psutil",
+                        help="source of the CPU/RAM/network/temperature counters; procfs reads /proc and "
+                             "/sys directly on Linux, auto uses it when available (default: psutil)")
+    parser.add_argument("--gpu-backend", choices=("auto", "nvml", "gputil"), default="auto",
+                        help="source of the GPU readings; nvml keeps an NVML session open through pynvml, "
+                             "gputil runs nvidia-smi on every check, auto uses NVML when available (default: auto)")
+    parser.add_argument("--benchmark-backends", type=int, nargs='?', const=1000, metavar="ITERATIONS",
+                        help="compare the latency of the psutil and procfs backends and exit")
+    parser.add_argument("--log-queue-size", type=int, default=LOG_QUEUE_SIZE, metavar="RECORDS",
+                        help=f"log records buffered before new ones are dropped (default: {LOG_QUEUE_SIZE})")
+    parser.add_argument("--log-max-bytes", type=int, default=LOG_MAX_BYTES, metavar="BYTES",
+                        help=f"rotate the report log at this size, 0 to disable (default: {LOG_MAX_BYTES})")
+    parser.add_argument("--log-rotate-interval", type=float, default=LOG_ROTATE_INTERVAL, metavar="SECONDS",
+                        help="also rotate the report log after this many seconds (default: disabled)")
+    parser.add_argument("--log-backups", type=int, default=LOG_BACKUP_COUNT, metavar="COUNT",
+                        help=f"rotated report logs to keep (default: {LOG_BACKUP_COUNT})")
+    parser.add_argument("--export", metavar="PATH",
+                        help="append every check result to a JSON Lines file")
+    parser.add_argument("--install-deps", action="store_true",
+                        help="install the missing required libraries with pip and exit")
+    parser.add_argument("--benchmark-startup", type=int, nargs='?', const=5, metavar="RUNS",
+                        help="measure the cold-start time of the module import and exit")
+    parser.add_argument("--startup-budget", type=float, default=COLD_START_BUDGET_MS, metavar="MS",
+                        help=f"fail --benchmark-startup above this median in ms (default: {COLD_START_BUDGET_MS})")
+    args = parser.parse_args(argv)
+    if args.metrics_port is not None and not args.daemon:
+        parser.error("--metrics-port requires --daemon")
+    if args.report_to is not None and not args.daemon:
+        parser.error("--report-to requires --daemon")
+    if args.report_to is not None and (urlsplit(args.report_to).scheme != 'http'
+                                       or not urlsplit(args.report_to).hostname):
+        parser.error(f"invalid --report-to URL '{args.report_to}', expected http://HOST:PORT")
+    if args.adaptive and not args.daemon:
+        parser.error("--adaptive requires --daemon")
+    if args.cpu_budget <= 0:
+        parser.error("--cpu-budget must be positive")
+    if args.aggregate and args.daemon:
+        parser.error("--aggregate cannot be combined with --daemon")
+    if args.query is not None:
+        if args.snapshot_dir is None:
+            parser.error("--query requires --snapshot-dir")
+        try:
+            args.query = parse_query(args.query)
+        except ValueError as e:
+            parser.error(f"invalid --query: {e}")
+    return args
+
+def main(argv=None):
+    """
+    Runs the command line interface and returns the process exit code.
+    """
+    args = parse_args(argv)
+    if args.install_deps:
+        return 0 if install_dependencies() else 1
+    if args.benchmark_startup:
+        timings = measure_cold_start(args.benchmark_startup)
+        median = statistics.median(timings)
+        print(f"Cold start: median {median:.1f} ms, min {min(timings):.1f} ms, max {max(timings):.1f} ms "
+              f"over {len(timings)} runs (budget: {args.startup_budget:.0f} ms)")
+        if median > args.startup_budget:
+            print(f"{Fore.RED}❌ Cold start exceeds the budget.{Style.RESET_ALL}")
+            return 1
+        return 0
+    if args.query is not None:
+        results = run_query(SnapshotStore(args.snapshot_dir), args.query)
+        print(f"{args.query}:")
+        if not results:
+            print("No matching samples.")
+        for labels, rows in results.items():
+            if labels:
+                print(f"{', '.join(f'{key}={value}' for key, value in labels)}:")
+            for started, value in rows:
+                print(f"  {datetime.fromtimestamp(started):%Y-%m-%d %H:%M:%S}  {value:.2f}")
+        return 0
+    if psutil is None:
+        print("❌ psutil is not installed. Run this script with --install-deps first.")
+        return 1
+    if args.benchmark_backends:
+        if not ProcfsBackend.available():
+            print("❌ The procfs backend is only available on Linux.")
+            return 1
+        print(f"{'Operation':<18}{'psutil':>12}{'procfs':>12}{'speedup':>10}")
+        for operation, timings in benchmark_backends(args.benchmark_backends).items():
+            print(f"{operation:<18}{timings['psutil']:>10.1f}µs{timings['procfs']:>10.1f}µs"
+                  f"{timings['psutil'] / timings['procfs']:>9.1f}x")
+        return 0
+
+    rules = None
+    if args.rules is not None:
+        try:
+            rules = RuleEngine.from_file(args.rules)
+        except (OSError, ValueError) as e:
+            print(f"❌ Could not load the alert rules from {args.rules}: {e}")
+            return 1
+    gpu_backend = None
+    if not args.aggregate:
+        try:
+            gpu_backend = select_gpu_backend(args.gpu_backend)
+        except Exception as e:
+            print(f"❌ Could not open the {args.gpu_backend} GPU backend: {e}")
+            return 1
+
+    log_writer = configure_logging(args.log_queue_size, args.log_max_bytes, args.log_backups,
+                                   args.log_rotate_interval)
+    sinks = [ConsoleSink(), LogSink()]
+    if args.export:
+        sinks.append(JsonExportSink(args.export))
+    pipeline = ResultPipeline(sinks)
+    history = MetricStore(args.history_capacity)
+    inventory_cache = InventoryCache(args.inventory_cache, args.inventory_ttl)
+    backend = select_backend(args.backend)
+    score_model = HealthScoreModel(dict(args.score_weight), args.score_half_life)
+    closers = [log_writer, backend, pipeline]
+    if gpu_backend is not None:
+        closers.append(gpu_backend)
+    try:
+        if args.aggregate:
+            server = FleetServer(FleetAggregator(), args.fleet_host, args.fleet_port).start()
+            closers.append(server)
+            host, port = server.address[:2]
+            pipeline.emit(Notice(f"🛰️ Receiving fleet snapshots at http://{host}:{port}/ingest", 'accent'))
+            server.run(pipeline, dict(args.interval).get('report', DAEMON_INTERVALS['report']))
+        elif args.daemon:
+            intervals = dict(args.interval)
+            cpu_interval = min(CPU_SAMPLE_MIN_INTERVAL, intervals.get('cpu', DAEMON_INTERVALS['cpu']))
+            monitor = SystemHealthMonitor(pipeline, cpu_sample_interval=cpu_interval, history=history,
+                                          inventory_cache=inventory_cache, backend=backend,
+                                          mount_timeout=args.mount_timeout, rules=rules, score_model=score_model,
+                                          gpu_backend=gpu_backend)
+            tick_hooks = []
+            if args.metrics_port is not None:
+                exporter = MetricsExporter(args.metrics_host, args.metrics_port).start()
+                closers.append(exporter)
+                exporter.gauges['log.dropped'] = lambda: log_writer.dropped
+                tick_hooks.append(exporter.refresh)
+                host, port = exporter.address[:2]
+                pipeline.emit(Notice(f"📡 Serving metrics at http://{host}:{port}/metrics", 'accent'))
+            if args.snapshot_dir is not None:
+                store = SnapshotStore(args.snapshot_dir)
+                recorder = SnapshotRecorder(store.writer(), args.snapshot_interval, SnapshotCompactor(store))
+                closers.append(recorder)
+                tick_hooks.append(recorder)
+            if args.report_to is not None:
+                reporter = FleetReporter(args.report_to, args.report_interval)
+                closers.append(reporter)
+                tick_hooks.append(reporter)
+            daemon = MonitorDaemon(monitor, intervals, tick_hooks,
+                                   cpu_budget=args.cpu_budget / 100 if args.adaptive else None)
+            if daemon.scheduler is not None and args.metrics_port is not None:
+                exporter.gauges['daemon.cpu_share'] = lambda: daemon.scheduler.cpu_share
+                exporter.gauges['daemon.throttle'] = lambda: daemon.scheduler.throttle
+                for name in daemon.scheduler.intervals:
+                    exporter.gauges[f'daemon.interval.{name}'] = lambda name=name: daemon.scheduler.intervals[name]
+            daemon.run()
+        else:
+            monitor = SystemHealthMonitor(pipeline, history=history, inventory_cache=inventory_cache,
+                                          backend=backend, mount_timeout=args.mount_timeout, rules=rules,
+                                          score_model=score_model, gpu_backend=gpu_backend)
+            monitor.run_all_checks(concurrent=args.concurrent, max_workers=args.workers, timeout=args.timeout)
+            if args.snapshot_dir is not None:
+                store = SnapshotStore(args.snapshot_dir)
+                recorder = SnapshotRecorder(store.writer(), compactor=SnapshotCompactor(store))
+                closers.append(recorder)
+                recorder.record(monitor)
+    finally:
+        for closer in reversed(closers):
+            closer.close()
+    return 0
 
 if __name__ == "__main__":
-    monitor = SystemHealthMonitor()
-    monitor.run_all_checks()
\ No newline at end of file
+    sys.exit(main())
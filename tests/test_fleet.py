@@ -0,0 +1,35 @@
+import socket
+
+import pytest
+
+import system_health_monitor as shm
+
+
+@pytest.fixture
+def server():
+    server = shm.FleetServer(shm.FleetAggregator(), port=0).start()
+    yield server
+    server.close()
+
+
+def post_ingest(server, content_length, body=b""):
+    with socket.create_connection(server.address[:2], timeout=5) as connection:
+        connection.sendall(
+            f"POST /ingest HTTP/1.1\r\nHost: test\r\nContent-Length: {content_length}\r\n\r\n".encode() + body
+        )
+        response = b""
+        while chunk := connection.recv(4096):
+            response += chunk
+        return response.split(b" ", 2)[1]
+
+
+def test_negative_content_length_is_rejected(server):
+    assert post_ingest(server, -1) == b"400"
+
+
+def test_oversized_snapshot_is_rejected(server):
+    assert post_ingest(server, shm.FLEET_MAX_SNAPSHOT_BYTES + 1) == b"413"
+
+
+def test_invalid_snapshot_is_rejected(server):
+    assert post_ingest(server, 8, b"not json") == b"400"
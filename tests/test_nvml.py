@@ -0,0 +1,103 @@
+from collections import namedtuple
+
+import pytest
+
+import system_health_monitor as shm
+
+Utilization = namedtuple('Utilization', 'gpu memory')
+Memory = namedtuple('Memory', 'total free used')
+
+
+class FakeNvml:
+    """
+    A pynvml stand-in with two A100s; GPU 1 has no clock readings.
+    """
+    class NVMLError(Exception):
+        pass
+
+    class NVMLError_NotSupported(NVMLError):
+        pass
+
+    class NVMLError_GpuIsLost(NVMLError):
+        pass
+
+    NVML_TEMPERATURE_GPU = 0
+    NVML_CLOCK_GRAPHICS = 0
+    NVML_CLOCK_MEM = 2
+
+    def __init__(self):
+        self.initialized = 0
+        self.lost = set()
+        self.clock_calls = 0
+
+    def nvmlInit(self):
+        self.initialized += 1
+
+    def nvmlShutdown(self):
+        pass
+
+    def nvmlDeviceGetCount(self):
+        return 2
+
+    def nvmlDeviceGetHandleByIndex(self, index):
+        return index
+
+    def nvmlDeviceGetName(self, handle):
+        return b"NVIDIA A100"
+
+    def nvmlDeviceGetUtilizationRates(self, handle):
+        if handle in self.lost:
+            raise self.NVMLError_GpuIsLost("GPU is lost")
+        return Utilization(35, 10)
+
+    def nvmlDeviceGetMemoryInfo(self, handle):
+        return Memory(8 << 30, 6 << 30, 2 << 30)
+
+    def nvmlDeviceGetTemperature(self, handle, sensor):
+        return 60
+
+    def nvmlDeviceGetPowerUsage(self, handle):
+        return 120000
+
+    def nvmlDeviceGetClockInfo(self, handle, clock):
+        self.clock_calls += 1
+        if handle == 1:
+            raise self.NVMLError_NotSupported("Not Supported")
+        return 1800 if clock == self.NVML_CLOCK_GRAPHICS else 7000
+
+
+def test_not_supported_readings_are_skipped():
+    nvml = FakeNvml()
+    backend = shm.NvmlGpuBackend(nvml)
+    first = backend.devices()
+    assert [(device.index, device.name) for device in first] == [(0, "NVIDIA A100"), (1, "NVIDIA A100")]
+    assert first[0].clock == 1800 and first[1].clock is None
+    assert first[1].load == 35.0 and first[1].power == 120.0
+    calls = nvml.clock_calls
+    backend.devices()
+    # GPU 0 reads both clocks again; GPU 1 is not asked any more
+    assert nvml.clock_calls == calls + 2
+
+
+def test_failing_device_is_reported():
+    nvml = FakeNvml()
+    backend = shm.NvmlGpuBackend(nvml)
+    nvml.lost.add(1)
+    with pytest.raises(RuntimeError, match=r"GPU 1 \(NVIDIA A100\): GPU is lost"):
+        backend.devices()
+    monitor = shm.SystemHealthMonitor(shm.ResultPipeline([]), gpu_backend=backend)
+    info = monitor.get_gpu_info()
+    assert info.backend == "NVML" and "GPU is lost" in info.error
+    assert monitor.instrumentation.summary()['get_gpu_info']['errors'] == 1
+
+
+def test_session_is_reinitialized_after_an_error():
+    nvml = FakeNvml()
+    backend = shm.NvmlGpuBackend(nvml)
+    nvml.lost.add(0)
+    with pytest.raises(RuntimeError):
+        backend.devices()
+    nvml.lost.clear()
+    devices = backend.devices()
+    assert nvml.initialized == 2
+    assert [device.load for device in devices] == [35.0, 35.0]
@@ -0,0 +1,42 @@
+import sys
+
+import pytest
+
+import system_health_monitor as shm
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith('linux'), reason="procfs is Linux only")
+
+STAT = (
+    b"cpu  100 0 50 800 50 0 0 0 0 0\n"
+    b"cpu0 50 0 25 400 25 0 0 0 0 0\n"
+    b"cpu1 50 0 25 400 25 0 0 0 0 0\n"
+    b"intr 123456" + b" 0" * 2000 + b"\n"
+    b"ctxt 42\n"
+)
+
+
+def backend_reading(tmp_path, size):
+    path = tmp_path / 'stat'
+    path.write_bytes(STAT)
+    backend = shm.ProcfsBackend()
+    backend._stat.close()
+    backend._stat = shm._ProcFile(str(path), size, whole=False)
+    return backend
+
+
+def test_stat_read_cut_inside_intr_stays_bounded(tmp_path):
+    backend = backend_reading(tmp_path, 160)
+    overall, per_core = backend.cpu_times()
+    assert overall == (150, 1000)
+    assert per_core == [(75, 500), (75, 500)]
+    assert len(backend._stat.buffer) == 160
+    backend.close()
+
+
+def test_stat_read_cut_inside_cpu_line_grows(tmp_path):
+    backend = backend_reading(tmp_path, 48)
+    overall, per_core = backend.cpu_times()
+    assert overall == (150, 1000)
+    assert len(per_core) == 2
+    assert len(backend._stat.buffer) == 96
+    backend.close()
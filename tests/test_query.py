@@ -0,0 +1,54 @@
+import pytest
+
+import system_health_monitor as shm
+
+
+def test_parse_query_defaults():
+    query = shm.parse_query("cpu.usage")
+    assert (query.metric, query.labels, query.stat, query.window, query.bucket) == ('cpu.usage', (), 'mean', 3600.0, None)
+
+
+def test_parse_query_with_labels_stat_and_clauses():
+    query = shm.parse_query("disk.utilization{device=sda, host = web1} p95 last 6h by 1m")
+    assert query.metric == 'disk.utilization'
+    assert query.labels == (('device', 'sda'), ('host', 'web1'))
+    assert query.stat == 'p95'
+    assert query.window == 6 * 3600
+    assert query.bucket == 60
+
+
+def test_parse_query_clauses_in_any_order():
+    query = shm.parse_query("ram.percent max by 15m last 2d")
+    assert (query.window, query.bucket) == (2 * 86400, 900)
+
+
+@pytest.mark.parametrize('text, message', [
+    ("", "empty query"),
+    ("cpu usage", "unexpected 'usage'"),
+    ("cpu.usage{device} mean", "invalid label filter"),
+    ("cpu.usage mean last", "unexpected 'last'"),
+    ("cpu.usage mean last 0m", "invalid duration"),
+    ("cpu.usage mean last 5y", "invalid duration"),
+    ("cpu.usage{a=b mean", "invalid metric"),
+])
+def test_parse_query_rejects_malformed_queries(text, message):
+    with pytest.raises(ValueError, match=message):
+        shm.parse_query(text)
+
+
+@pytest.mark.parametrize('text, seconds', [("90s", 90), ("1.5m", 90), ("6h", 21600), ("2w", 1209600)])
+def test_parse_duration(text, seconds):
+    assert shm.parse_duration(text) == seconds
+
+
+def test_query_filters_by_label(tmp_path):
+    store = shm.SnapshotStore(str(tmp_path))
+    writer = store.writer()
+    columns = (('disk.utilization', (('device', 'sda'),)), ('disk.utilization', (('device', 'sdb'),)))
+    now = 1_700_000_000.0
+    for offset, values in ((0, [10.0, 50.0]), (30, [30.0, 70.0])):
+        writer.append(now + offset, columns, values)
+    writer.close()
+    results = shm.run_query(store, shm.parse_query("disk.utilization{device=sdb} max last 1h"), now=now + 60)
+    assert list(results) == [(('device', 'sdb'),)]
+    assert [value for _, value in results[(('device', 'sdb'),)]] == [70.0]
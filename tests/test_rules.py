@@ -0,0 +1,96 @@
+import pytest
+
+import system_health_monitor as shm
+
+GPU = (('gpu', '0'), ('name', 'A100'))
+
+
+def evaluate(samples, rules=None, store=None, now=1000.0):
+    engine = shm.RuleEngine(rules)
+    return engine.evaluate(samples, store if store is not None else shm.MetricStore(), now=now)
+
+
+@pytest.mark.parametrize('load, temperature, penalty', [
+    (95.0, 90.0, 10),
+    (95.0, 40.0, 10),
+    (50.0, 90.0, 10),
+    (90.0, 85.0, 0),
+])
+def test_gpu_rules_charge_one_penalty(load, temperature, penalty):
+    alerts = evaluate([('gpu.load', GPU, load), ('gpu.temperature', GPU, temperature)])
+    assert sum(alert.penalty for alert in alerts) == penalty
+
+
+def test_levels_compare_strictly():
+    assert evaluate([('cpu.usage', (), 85.0)]) == []
+    assert len(evaluate([('cpu.usage', (), 85.1)])) == 1
+
+
+def test_below_rules_compare_strictly():
+    rules = [{'name': 'battery-low', 'metric': 'battery.percent', 'below': True, 'warn': 30, 'stat': 'value'}]
+    assert evaluate([('battery.percent', (), 30.0)], rules) == []
+    assert len(evaluate([('battery.percent', (), 29.0)], rules)) == 1
+
+
+@pytest.mark.parametrize('override', [
+    {'penalty': "10"},
+    {'penalty': {'warn': 5, 'crit': "15"}},
+    {'penalty': {'warm': 5}},
+    {'message': "bad {"},
+    {'message': "{0} is high"},
+    {'message': "{stat:.1q}"},
+    {'labels': ["mountpoint", "/"]},
+    {'when': {'battery.plugged': "no"}},
+    {'hysteresis': "5"},
+    {'group': 1},
+])
+def test_invalid_rules_fail_to_compile(override):
+    spec = dict({'name': 'cpu-usage', 'metric': 'cpu.usage', 'warn': 85}, **override)
+    with pytest.raises(ValueError):
+        shm.compile_rule(spec)
+
+
+def test_default_rules_compile():
+    assert len(shm.RuleEngine().rules) == len(shm.DEFAULT_RULES)
+
+
+def run_series(spec, values, start=1000.0, step=1.0, labels=()):
+    engine = shm.RuleEngine([spec])
+    store = shm.MetricStore()
+    levels = []
+    for index, value in enumerate(values):
+        now = start + index * step
+        store.append(spec['metric'], value, now, labels)
+        alerts = engine.evaluate([(spec['metric'], labels, value)], store, now=now)
+        levels.append(alerts[0].severity if alerts else None)
+    return levels
+
+
+def test_hysteresis_keeps_the_alert_until_the_band_is_left():
+    spec = {'name': 'cpu', 'metric': 'cpu.usage', 'warn': 85, 'hysteresis': 5, 'stat': 'value'}
+    assert run_series(spec, [90.0, 82.0, 80.0, 86.0]) == ['warning', 'warning', None, 'warning']
+
+
+def test_for_delays_the_alert():
+    spec = {'name': 'cpu', 'metric': 'cpu.usage', 'warn': 85, 'crit': 95, 'stat': 'value', 'for': 2}
+    assert run_series(spec, [99.0, 99.0, 99.0, 90.0]) == [None, None, 'critical', 'warning']
+
+
+def test_window_median_ignores_a_single_spike():
+    spec = {'name': 'cpu', 'metric': 'cpu.usage', 'warn': 85, 'window': '1m'}
+    assert run_series(spec, [10.0, 10.0, 99.0, 10.0]) == [None, None, None, None]
+    assert run_series(spec, [10.0, 99.0, 99.0, 99.0], step=10.0) == [None, None, 'warning', 'warning']
+
+
+def test_when_conditions_and_label_filters():
+    engine = shm.RuleEngine()
+    store = shm.MetricStore()
+    store.append('battery.plugged', 1.0, 1000.0)
+    assert engine.evaluate([('battery.percent', (), 10.0)], store, now=1000.0) == []
+    store.append('battery.plugged', 0.0, 1001.0)
+    assert len(engine.evaluate([('battery.percent', (), 10.0)], store, now=1001.0)) == 1
+
+    rules = [{'name': 'root-full', 'metric': 'disk.percent', 'warn': 90, 'stat': 'value',
+              'labels': {'mountpoint': '/'}, 'message': "{mountpoint} at {stat:.0f}%"}]
+    samples = [('disk.percent', (('mountpoint', '/'),), 95.0), ('disk.percent', (('mountpoint', '/boot'),), 95.0)]
+    assert [alert.message for alert in evaluate(samples, rules)] == ["/ at 95%"]
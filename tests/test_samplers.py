@@ -0,0 +1,99 @@
+from collections import namedtuple
+
+import pytest
+
+import system_health_monitor as shm
+
+
+def test_counter_delta_counts_increases():
+    assert shm._counter_delta(1500, 1000) == 500
+    assert shm._counter_delta(1000, 1000) == 0
+
+
+def test_counter_delta_allows_for_32_bit_wrap():
+    assert shm._counter_delta(5, 2**32 - 10) == 15
+
+
+def test_counter_delta_treats_other_decreases_as_reset():
+    assert shm._counter_delta(100, 10**9) == 100
+    assert shm._counter_delta(100, 2**40) == 100
+
+
+class FakeNetBackend:
+    def __init__(self):
+        self.counters = {'eth0': (0,) * 8, 'veth1': (0,) * 8}
+
+    def net_io_counters(self):
+        return dict(self.counters)
+
+
+def test_quiet_interface_gets_one_sample_before_turning_idle(monkeypatch):
+    monkeypatch.setattr(shm.psutil, 'net_if_stats', lambda: {})
+    backend = FakeNetBackend()
+    sampler = shm.NetIoSampler(backend, min_interval=0)
+    sampler.prime()
+    backend.counters['eth0'] = (100, 100, 1, 1, 0, 0, 0, 0)
+    first = sampler.sample()
+    assert not first['eth0'].idle and not first['veth1'].idle
+    backend.counters['eth0'] = (200, 200, 2, 2, 0, 0, 0, 0)
+    second = sampler.sample()
+    assert not second['eth0'].idle and second['veth1'].idle
+    backend.counters['veth1'] = (10, 0, 1, 0, 0, 0, 0, 0)
+    assert not sampler.sample()['veth1'].idle
+
+
+def test_expired_series_drop_their_rule_state():
+    store = shm.MetricStore()
+    engine = shm.RuleEngine()
+    labels = (('interface', 'veth1'),)
+    store.append('net.utilization', 95.0, 1000.0, labels)
+    engine.evaluate([('net.utilization', labels, 95.0)], store, now=1000.0)
+    assert ('net-saturated', labels) in engine._states
+    expired = store.evict({'net.utilization': 2000.0})
+    assert expired == [('net.utilization', labels)]
+    engine.forget(expired)
+    assert ('net-saturated', labels) not in engine._states
+
+
+DiskIo = namedtuple('sdiskio', 'read_count write_count read_bytes write_bytes read_time write_time busy_time')
+
+
+@pytest.fixture
+def sysfs(tmp_path, monkeypatch):
+    for device, files in (('sda', ('device',)), ('sda1', ('partition',)), ('dm-0', ()), ('loop0', ('device',))):
+        (tmp_path / device).mkdir()
+        for name in files:
+            (tmp_path / device / name).mkdir()
+    monkeypatch.setattr(shm.DiskIoSampler, 'SYSFS_BLOCK', str(tmp_path))
+    return tmp_path
+
+
+def test_only_whole_disks_are_kept(sysfs, monkeypatch):
+    assert shm.DiskIoSampler.is_whole_disk('sda')
+    assert not shm.DiskIoSampler.is_whole_disk('sda1')
+    assert not shm.DiskIoSampler.is_whole_disk('dm-0')
+    assert not shm.DiskIoSampler.is_whole_disk('loop0')
+    # Devices missing from sysfs fall back to the Linux naming scheme
+    monkeypatch.setattr(shm.sys, 'platform', 'linux')
+    assert shm.DiskIoSampler.is_whole_disk('nvme0n1')
+    assert not shm.DiskIoSampler.is_whole_disk('nvme0n1p2')
+
+
+def test_disk_rates_cover_whole_disks_only(sysfs, monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(shm.time, 'monotonic', lambda: clock[0])
+    counters = {
+        'sda': DiskIo(100, 100, 1 << 20, 1 << 20, 50, 50, 100),
+        'sda1': DiskIo(100, 100, 1 << 20, 1 << 20, 50, 50, 100),
+    }
+    monkeypatch.setattr(shm.psutil, 'disk_io_counters', lambda perdisk=False: dict(counters))
+    sampler = shm.DiskIoSampler(min_interval=0)
+    sampler.prime()
+    clock[0] += 2.0
+    counters['sda'] = counters['sda1'] = DiskIo(140, 160, 3 << 20, 1 << 20, 250, 350, 600)
+    [rate] = sampler.sample()
+    assert rate.device == 'sda'
+    assert rate.read_bytes_per_sec == 1 << 20
+    assert rate.iops == 50.0
+    assert rate.await_ms == 5.0
+    assert rate.utilization == 25.0
@@ -0,0 +1,12 @@
+import system_health_monitor as shm
+
+
+def test_budget_window_starts_after_every_collector_ran():
+    scheduler = shm.AdaptiveScheduler({'cpu': 0.5, 'gpu': 5.0}, shm.RuleEngine())
+    record = shm.CheckFailure(check='get_cpu_info', error="")
+    scheduler.interval('cpu', record)
+    scheduler.interval('cpu', record)
+    assert scheduler._window_start is None
+    scheduler.interval('gpu', record)
+    assert scheduler._window_start is not None
+    assert scheduler.throttle == 1.0
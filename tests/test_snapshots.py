@@ -0,0 +1,37 @@
+import os
+import time
+from datetime import datetime
+
+import system_health_monitor as shm
+
+
+def record_run(directory, timestamp, columns, values):
+    store = shm.SnapshotStore(directory)
+    recorder = shm.SnapshotRecorder(store.writer(), compactor=shm.SnapshotCompactor(store))
+    recorder.writer.append(timestamp, columns, values)
+    recorder.compactor.add(timestamp, columns, values)
+    recorder.close()
+
+
+def test_two_runs_in_one_rollup_bucket_stay_readable(tmp_path):
+    now = time.time()
+    bucket = now - now % 60
+    # The second run reports an extra series, so the two segments have different layouts
+    record_run(str(tmp_path), bucket + 5, (('cpu.usage', ()),), [10.0])
+    record_run(str(tmp_path), bucket + 20, (('cpu.usage', ()), ('ram.percent', ())), [30.0, 50.0])
+
+    store = shm.SnapshotStore(str(tmp_path))
+    for tier in ('1m', '1h'):
+        paths = store.tier(tier).paths()
+        assert len(paths) == 2
+        for _, path in paths:
+            with shm.SnapshotSegment(path) as segment:
+                assert segment.count == 1
+                assert list(segment.timestamps) == [bucket - bucket % (60 if tier == '1m' else 3600)]
+
+    results = shm.run_query(store, shm.parse_query("cpu.usage mean last 3d by 1h"), now=bucket + 30)
+    assert [value for _, value in results[()]] == [20.0]
+    raw = shm.run_query(store, shm.parse_query("cpu.usage max last 1h"), now=bucket + 30)
+    assert [value for _, value in raw[()]] == [30.0]
+    stamp = datetime.fromtimestamp(bucket).strftime('%Y%m%dT%H%M%S%f')
+    assert sorted(os.listdir(tmp_path / '1m')) == [stamp + '-1.snap', stamp + '.snap']